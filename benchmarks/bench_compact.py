@@ -0,0 +1,83 @@
+"""
+Compare parsing a TrackedTimeReport into pydantic models against
+`CompactTrackedTime`, built either from the whole body or from members
+streamed off it one at a time, in time and in traced memory, both retained
+and peak.
+
+    uv run python benchmarks/bench_compact.py --members 1000 --days 365
+"""
+
+from argparse import ArgumentParser
+from datetime import date, timedelta
+from functools import partial
+import io
+import json
+import time
+import tracemalloc
+
+import pandas as pd
+
+from jibble_export.frames import build_attendance_frames
+from jibble_export.models.compact import CompactTrackedTime
+from jibble_export.models.duration import Duration
+from jibble_export.models.responses import (
+    Holidays,
+    MemberValue,
+    Timeoffs,
+    TrackedTimeReport,
+)
+from jibble_export.streaming import iter_array_items
+
+from synthetic import synthetic_org
+
+
+def from_stream(raw: bytes, chunk_size: int = 2**16) -> CompactTrackedTime:
+    body = io.BytesIO(raw)
+    items = iter_array_items(iter(partial(body.read, chunk_size), b""))
+    return CompactTrackedTime.from_members(map(MemberValue.model_validate, items))
+
+
+def measure(func, raw: bytes):
+    start = time.perf_counter()
+    func(raw)
+    seconds = time.perf_counter() - start
+    tracemalloc.start()
+    result = func(raw)
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, seconds, retained, peak
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument("--members", type=int, default=1000)
+    parser.add_argument("--days", type=int, default=365)
+    args = parser.parse_args()
+
+    start = date(2025, 1, 1)
+    duration = Duration(start, start + timedelta(days=args.days - 1))
+    payloads = synthetic_org(args.members, duration.start_date, duration.end_date)
+    raw = json.dumps(payloads["attendance"]).encode()
+    holidays = Holidays.model_validate(payloads["holidays"])
+    timeoffs = Timeoffs.model_validate(payloads["timeoffs"])
+
+    print(f"{len(raw) / 2**20:.1f} MiB TrackedTimeReport")
+    frames = []
+    for name, parse in (
+        ("models", TrackedTimeReport.model_validate_json),
+        ("compact", CompactTrackedTime.from_json),
+        ("stream", from_stream),
+    ):
+        report, seconds, retained, peak = measure(parse, raw)
+        frames.append(build_attendance_frames(duration, report, holidays, timeoffs)[0])
+        print(
+            f"  {name:<8} {seconds * 1000:8.1f} ms"
+            f"  retained {retained / 2**20:7.1f} MiB  peak {peak / 2**20:7.1f} MiB"
+        )
+        del report
+    for frame in frames[1:]:
+        pd.testing.assert_frame_equal(frames[0], frame)
+
+
+if __name__ == "__main__":
+    main()
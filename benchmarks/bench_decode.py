@@ -0,0 +1,118 @@
+"""
+Compare decoding a TrackedTimeReport body the previous way (str, dict,
+`Model(**obj)` with the UUID based discriminator and strptime dates) against
+`TypeAdapter.validate_json` on the raw bytes, as `decode_response` does.
+
+    uv run python benchmarks/bench_decode.py --members 1300 --days 365
+"""
+
+from argparse import ArgumentParser
+from datetime import date, datetime, timedelta
+from typing import Annotated, Any
+from uuid import UUID
+import json
+import time
+import tracemalloc
+
+from pydantic import BaseModel, BeforeValidator, Discriminator, Field, Tag, TypeAdapter
+
+from jibble_export.models.responses import Subject, TrackedTimeReport
+
+from synthetic import synthetic_org
+
+
+class LegacyMemberValue(BaseModel):
+    billableAmount: int
+    id: UUID
+    items: list[LegacyValue] | None = None
+    subject: Subject
+    time: timedelta
+    trackedTime: timedelta
+
+
+def legacy_parse_custom_date(v: Any) -> date:
+    if isinstance(v, str):
+        return datetime.strptime(v, "%d %B %Y").date()
+    return v
+
+
+class LegacyDateValue(BaseModel):
+    billableAmount: int
+    id: Annotated[date, BeforeValidator(legacy_parse_custom_date)]
+    items: list[LegacyValue] | None = None
+    subject: Subject
+    time: timedelta
+    trackedTime: timedelta
+
+
+def legacy_get_entity_type(d: dict) -> str:
+    try:
+        UUID(str(d["id"]))
+        return "Member"
+    except Exception:
+        return "Date"
+
+
+LegacyValue = Annotated[
+    Annotated[LegacyMemberValue, Tag("Member")]
+    | Annotated[LegacyDateValue, Tag("Date")],
+    Discriminator(legacy_get_entity_type),
+]
+
+
+class LegacyTrackedTimeReport(BaseModel):
+    odata_context: str = Field(alias="@odata.context")
+    value: list[LegacyValue]
+
+
+def legacy_decode(raw: bytes) -> LegacyTrackedTimeReport:
+    return LegacyTrackedTimeReport(**json.loads(raw.decode()))
+
+
+def measure(repeat: int, func, raw: bytes) -> tuple[float, int]:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(raw)
+        timings.append(time.perf_counter() - start)
+    tracemalloc.start()
+    func(raw)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return min(timings), peak
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument("--members", type=int, default=1300)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    start = date(2025, 1, 1)
+    payload = synthetic_org(args.members, start, start + timedelta(days=args.days - 1))[
+        "attendance"
+    ]
+    raw = json.dumps(payload).encode()
+    del payload
+
+    adapter = TypeAdapter(TrackedTimeReport)
+    legacy_seconds, legacy_peak = measure(args.repeat, legacy_decode, raw)
+    seconds, peak = measure(args.repeat, adapter.validate_json, raw)
+    # the legacy discriminator cannot tell model instances apart when dumping
+    legacy = legacy_decode(raw).model_dump(warnings=False)
+    assert adapter.validate_json(raw).model_dump() == legacy
+
+    print(f"{len(raw) / 2**20:.1f} MiB TrackedTimeReport")
+    print(
+        f"  legacy        {legacy_seconds * 1000:8.1f} ms  peak {legacy_peak / 2**20:7.1f} MiB"
+    )
+    print(f"  validate_json {seconds * 1000:8.1f} ms  peak {peak / 2**20:7.1f} MiB")
+    print(
+        f"  {legacy_seconds / seconds:.1f}x faster, "
+        f"{legacy_peak / peak:.1f}x lower peak memory"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Compare the write-only Excel writer against the `DataFrame.to_excel` based
+one, in wall time and peak traced memory.
+
+    uv run python benchmarks/bench_excel_writer.py --members 1000 --days 365
+"""
+
+from argparse import ArgumentParser
+from datetime import date, timedelta
+from pathlib import Path
+import tempfile
+import time
+import tracemalloc
+
+from jibble_export.formatter import write_attendance_sheet, write_attendance_sheet_fast
+from jibble_export.frames import attendance_status_grid, build_attendance_frames
+from jibble_export.models.duration import Duration
+from jibble_export.models.responses import Holidays, Timeoffs, TrackedTimeReport
+
+from synthetic import synthetic_org
+
+
+def measure(func, *args) -> tuple[float, int]:
+    # tracing slows allocations down, so time and memory are separate runs
+    start = time.perf_counter()
+    func(*args)
+    seconds = time.perf_counter() - start
+    tracemalloc.start()
+    func(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return seconds, peak
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument("--members", type=int, default=1000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--timeoff-density", type=float, default=0.02)
+    args = parser.parse_args()
+
+    start = date(2025, 1, 1)
+    duration = Duration(start, start + timedelta(days=args.days - 1))
+    payloads = synthetic_org(
+        args.members,
+        duration.start_date,
+        duration.end_date,
+        timeoff_density=args.timeoff_density,
+    )
+    tracked, holidays, timeoffs, id_to_name = build_attendance_frames(
+        duration,
+        TrackedTimeReport.model_validate(payloads["attendance"]),
+        Holidays.model_validate(payloads["holidays"]),
+        Timeoffs.model_validate(payloads["timeoffs"]),
+    )
+    grid = attendance_status_grid(tracked, holidays, timeoffs, id_to_name)
+
+    print(f"{args.members} members x {args.days} days")
+    with tempfile.TemporaryDirectory() as directory:
+        results = {}
+        for name, writer in (
+            ("standard", write_attendance_sheet),
+            ("fast", write_attendance_sheet_fast),
+        ):
+            filename = str(Path(directory) / f"{name}.xlsx")
+            results[name] = measure(writer, grid, id_to_name, filename)
+            seconds, peak = results[name]
+            size = Path(filename).stat().st_size
+            print(
+                f"  {name:<9} {seconds * 1000:10.1f} ms"
+                f"  peak {peak / 2**20:8.1f} MiB  file {size / 2**10:8.1f} KiB"
+            )
+    (standard_seconds, standard_peak), (seconds, peak) = results.values()
+    print(
+        f"  speedup {standard_seconds / seconds:.1f}x,"
+        f" peak memory {standard_peak / peak:.1f}x lower"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""
+End to end export benchmark against the local mock server.
+
+Each scale runs `prepare_attendance_report` and `export_attendance_report`
+in a fresh process pointed at `mock_server.py`, and records its time,
+throughput (member-days per second) and peak RSS.
+
+    uv run python benchmarks/bench_export.py --save baseline.json
+    uv run python benchmarks/bench_export.py --baseline baseline.json
+
+With --baseline, a scale slower or bigger than the baseline by more than
+--tolerance fails the run.
+"""
+
+from argparse import SUPPRESS, ArgumentParser
+from datetime import date, timedelta
+from pathlib import Path
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+DEFAULT_SCALES = "50x31,500x90,1300x365"
+START = date(2025, 1, 1)
+
+
+def peak_rss() -> int | None:
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def run_export(members: int, days: int, outdir: str) -> dict:
+    """
+    Child side: export from the server named by JIBBLE_API_URL.
+    """
+    from jibble_export.features.reports import prepare_attendance_report
+    from jibble_export.formatter import export_attendance_report
+    from jibble_export.models.duration import Duration
+
+    duration = Duration(START, START + timedelta(days=days - 1))
+    start = time.perf_counter()
+    frames = prepare_attendance_report(duration, "Droplet")
+    prepared = time.perf_counter()
+    export_attendance_report(*frames, str(Path(outdir) / "report.xlsx"))
+    exported = time.perf_counter()
+    return {
+        "members": members,
+        "days": days,
+        "prepare_seconds": prepared - start,
+        "export_seconds": exported - prepared,
+        "seconds": exported - start,
+        "member_days_per_second": members * days / (exported - start),
+        "peak_rss": peak_rss(),
+    }
+
+
+def run_scale(members: int, days: int, latency: float) -> dict:
+    from mock_server import MockJibbleServer, MockOrg
+
+    org = MockOrg(members, START, START + timedelta(days=days - 1))
+    server = MockJibbleServer(org, latency=latency)
+    server.start()
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            env = os.environ | {
+                "JIBBLE_API_URL": server.url,
+                "JIBBLE_CLIENT_ID": "benchmark",
+                "JIBBLE_CLIENT_SECRET": "benchmark",
+                "JIBBLE_TOKEN_CACHE": "false",
+                "JIBBLE_RESPONSE_CACHE": "false",
+                "JIBBLE_CACHE_DIR": tmp,
+            }
+            child = subprocess.run(
+                [sys.executable, __file__, "--child", f"{members}x{days}", tmp],
+                env=env,
+                check=True,
+                stdout=subprocess.PIPE,
+                text=True,
+            )
+    finally:
+        server.shutdown()
+        server.server_close()
+    return json.loads(child.stdout.splitlines()[-1])
+
+
+def compare(result: dict, baseline: dict | None, tolerance: float) -> tuple[str, bool]:
+    if baseline is None:
+        return "", True
+    time_ratio = result["seconds"] / baseline["seconds"]
+    rss_ratio = (
+        result["peak_rss"] / baseline["peak_rss"]
+        if result["peak_rss"] and baseline.get("peak_rss")
+        else 1.0
+    )
+    ok = time_ratio <= 1 + tolerance and rss_ratio <= 1 + tolerance
+    return (
+        f"  time {time_ratio:5.2f}x  rss {rss_ratio:5.2f}x{'' if ok else '  REGRESSED'}",
+        ok,
+    )
+
+
+def parse_scale(scale: str) -> tuple[int, int]:
+    members, days = scale.lower().split("x")
+    return int(members), int(days)
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument(
+        "--scales",
+        default=DEFAULT_SCALES,
+        help=f"Comma separated MEMBERSxDAYS (default: {DEFAULT_SCALES}).",
+    )
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--save", type=Path, help="Write the results as a baseline.")
+    parser.add_argument(
+        "--baseline", type=Path, help="Compare against a saved baseline."
+    )
+    parser.add_argument("--tolerance", type=float, default=0.15)
+    parser.add_argument("--child", nargs=2, metavar=("SCALE", "OUTDIR"), help=SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        scale, outdir = args.child
+        print(json.dumps(run_export(*parse_scale(scale), outdir)))
+        return
+
+    baseline = {}
+    if args.baseline:
+        baseline = {
+            (entry["members"], entry["days"]): entry
+            for entry in json.loads(args.baseline.read_text())
+        }
+    results, regressed = [], False
+    for scale in args.scales.split(","):
+        members, days = parse_scale(scale)
+        result = run_scale(members, days, args.latency)
+        results.append(result)
+        summary, ok = compare(result, baseline.get((members, days)), args.tolerance)
+        regressed |= not ok
+        rss = result["peak_rss"]
+        print(
+            f"{members:>6} x {days:<4}"
+            f"  prepare {result['prepare_seconds']:7.2f}s"
+            f"  export {result['export_seconds']:7.2f}s"
+            f"  {result['member_days_per_second']:10.0f} member-days/s"
+            f"  peak rss {rss / 2**20 if rss else float('nan'):7.1f} MiB" + summary
+        )
+    if args.save:
+        args.save.write_text(json.dumps(results, indent=2))
+    if regressed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
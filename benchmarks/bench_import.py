@@ -0,0 +1,173 @@
+"""
+Startup benchmark of the `jibble` command line, per subcommand.
+
+Each subcommand runs in a fresh interpreter against the local mock
+server, once plainly to time it end to end and once under
+`-X importtime` to add up what its imports cost.
+
+    uv run python benchmarks/bench_import.py
+    uv run python benchmarks/bench_import.py --budget clockin=80 --repeat 10
+
+A subcommand over its import budget, or a quick one (help, clockin,
+clockout) that imports pandas, pydantic, openpyxl or the like, fails the
+run.
+"""
+
+from argparse import ArgumentParser
+from collections import defaultdict
+from datetime import date, timedelta
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+START = date(2025, 1, 1)
+ENTRYPOINT = "from jibble_export.cli.entrypoint import main; main()"
+HEAVY = ("pandas", "numpy", "pydantic", "pydantic_core", "openpyxl", "pyarrow")
+QUICK = ("help", "clockin", "clockout")
+# milliseconds spent importing
+BUDGETS = {"help": 100.0, "clockin": 100.0, "clockout": 100.0, "export": 2000.0}
+
+
+def commands(outdir: str) -> dict[str, list[str]]:
+    return {
+        "help": ["--help"],
+        "clockin": ["clockin", "--autoout", "PT9H"],
+        "clockout": ["clockout"],
+        "export": [
+            "export",
+            "--duration",
+            f"{START:%b},{START.year}",
+            "--outfile",
+            str(os.path.join(outdir, "report.xlsx")),
+        ],
+    }
+
+
+def parse_importtime(stderr: str) -> tuple[float, dict[str, float], set[str]]:
+    """
+    Total self time of all imports in milliseconds, the cumulative time of
+    the imports that were not nested in another one, by package, and the
+    packages imported at all.
+    """
+    total, packages, imported = 0.0, defaultdict(float), set()
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line.removeprefix("import time:").split("|")
+        # nested imports are indented under the one importing them
+        name = name.removeprefix(" ")
+        package = name.strip().split(".")[0]
+        total += int(self_us)
+        imported.add(package)
+        if not name.startswith(" "):
+            packages[package] += int(cumulative_us) / 1000
+    return total / 1000, dict(packages), imported
+
+
+def jibble(
+    args: list[str], env: dict[str, str], *options: str
+) -> subprocess.CompletedProcess[str]:
+    child = subprocess.run(
+        [sys.executable, *options, "-c", ENTRYPOINT, *args],
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if child.returncode:
+        sys.exit(f"jibble {' '.join(args)} failed:\n{child.stderr}")
+    return child
+
+
+def run_command(args: list[str], env: dict[str, str], repeat: int) -> dict:
+    wall, imports, packages, imported = [], [], {}, set()
+    for _ in range(repeat):
+        start = time.perf_counter()
+        jibble(args, env)
+        wall.append(time.perf_counter() - start)
+        child = jibble(args, env, "-X", "importtime")
+        total, packages, imported = parse_importtime(child.stderr)
+        imports.append(total)
+    return {
+        "wall_ms": min(wall) * 1000,
+        "import_ms": min(imports),
+        "heavy": sorted(imported.intersection(HEAVY)),
+        "packages": packages,
+    }
+
+
+def parse_budget(value: str) -> tuple[str, float]:
+    name, _, milliseconds = value.partition("=")
+    return name, float(milliseconds)
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument(
+        "--commands",
+        default=",".join(BUDGETS),
+        help=f"Comma separated subcommands (default: {','.join(BUDGETS)}).",
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=5, help="Keep the best of N runs."
+    )
+    parser.add_argument(
+        "--budget",
+        type=parse_budget,
+        action="append",
+        default=[],
+        metavar="COMMAND=MS",
+        help="Override the import time budget of a subcommand.",
+    )
+    parser.add_argument(
+        "--top", type=int, default=5, help="Show the N slowest top level imports."
+    )
+    args = parser.parse_args()
+    budgets = BUDGETS | dict(args.budget)
+
+    from mock_server import MockJibbleServer, MockOrg
+
+    org = MockOrg(20, START, START + timedelta(days=30))
+    server = MockJibbleServer(org)
+    server.start()
+    failed = False
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            env = os.environ | {
+                "JIBBLE_API_URL": server.url,
+                "JIBBLE_CLIENT_ID": "benchmark",
+                "JIBBLE_CLIENT_SECRET": "benchmark",
+                "JIBBLE_TOKEN_CACHE": "false",
+                "JIBBLE_RESPONSE_CACHE": "false",
+                "JIBBLE_CACHE_DIR": tmp,
+                "JIBBLE_REPORTS_DIR": tmp,
+            }
+            available = commands(tmp)
+            for name in args.commands.split(","):
+                result = run_command(available[name], env, args.repeat)
+                problems = []
+                if result["import_ms"] > budgets[name]:
+                    problems.append(f"over {budgets[name]:.0f} ms budget")
+                if name in QUICK and result["heavy"]:
+                    problems.append(f"imports {', '.join(result['heavy'])}")
+                failed |= bool(problems)
+                slowest = sorted(
+                    result["packages"].items(), key=lambda item: item[1], reverse=True
+                )[: args.top]
+                print(
+                    f"{name:<10}"
+                    f"  imports {result['import_ms']:7.1f} ms"
+                    f"  wall {result['wall_ms']:7.1f} ms"
+                    f"  [{', '.join(f'{pkg} {ms:.0f}' for pkg, ms in slowest)}]"
+                    + (f"  FAILED: {'; '.join(problems)}" if problems else "")
+                )
+    finally:
+        server.shutdown()
+        server.server_close()
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
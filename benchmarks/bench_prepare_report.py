@@ -0,0 +1,117 @@
+"""
+Compare the frame assembly of `prepare_attendance_report` against the
+previous per-member `.loc` implementation.
+
+    uv run python benchmarks/bench_prepare_report.py --members 1000 --days 365
+"""
+
+from argparse import ArgumentParser
+from datetime import date, timedelta
+from uuid import UUID
+import time
+
+import pandas as pd
+
+from jibble_export.frames import build_attendance_frames
+from jibble_export.models.duration import Duration
+from jibble_export.models.responses import (
+    DateValue,
+    Holidays,
+    MemberValue,
+    Subject,
+    Timeoffs,
+    TrackedTimeReport,
+)
+
+from synthetic import synthetic_org
+
+
+def legacy_build_attendance_frames(
+    duration: Duration,
+    attendance_report: TrackedTimeReport,
+    holiday_list: Holidays,
+    approved_timeoffs: Timeoffs,
+) -> tuple[pd.DataFrame, pd.Series, pd.DataFrame, dict[UUID, str]]:
+    person_ids = [value.id for value in attendance_report.value]
+    dates_in_month = pd.date_range(
+        start=duration.start_date, end=duration.end_date, freq="D"
+    )
+    tracked_time_df = pd.DataFrame(
+        index=dates_in_month, columns=person_ids, dtype="timedelta64[us]"
+    )
+    holidays = pd.Series(index=dates_in_month, dtype=str)
+    timeoffs_df = pd.DataFrame(index=dates_in_month, columns=person_ids, dtype=str)
+    id_to_name: dict[UUID, str] = {}
+    for value in attendance_report.value:
+        match value:
+            case MemberValue(
+                id=id, subject=Subject(name=name), items=[*_, DateValue()] as items
+            ):
+                id_to_name[id] = name
+                tracked_time_df.loc[
+                    pd.to_datetime([entry.id for entry in items]), id
+                ] = [entry.trackedTime for entry in items]
+            case _:
+                raise NotImplementedError()
+    for value in holiday_list.value:
+        holidays[value.date] = value.name
+    for value in approved_timeoffs.value:
+        timeoff_indices = pd.date_range(value.startDate, value.endDate, freq="D")
+        if pd.isna(timeoffs_df.loc[timeoff_indices, value.personId]).all():
+            timeoffs_df.loc[timeoff_indices, value.personId] = (
+                f"{value.policy.name}"
+                if value.duration != 0.5
+                else f"0.5 {value.policy.name}"
+            )
+        else:
+            timeoffs_df.loc[timeoff_indices, value.personId] = value.policy.name
+    return tracked_time_df, holidays, timeoffs_df, id_to_name
+
+
+def best_of(repeat: int, func, *args):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument("--members", type=int, default=1000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--timeoff-density", type=float, default=0.02)
+    args = parser.parse_args()
+
+    start = date(2025, 1, 1)
+    duration = Duration(start, start + timedelta(days=args.days - 1))
+    payloads = synthetic_org(
+        args.members,
+        duration.start_date,
+        duration.end_date,
+        timeoff_density=args.timeoff_density,
+    )
+    inputs = (
+        duration,
+        TrackedTimeReport.model_validate(payloads["attendance"]),
+        Holidays.model_validate(payloads["holidays"]),
+        Timeoffs.model_validate(payloads["timeoffs"]),
+    )
+
+    legacy_seconds, legacy = best_of(
+        args.repeat, legacy_build_attendance_frames, *inputs
+    )
+    seconds, current = best_of(args.repeat, build_attendance_frames, *inputs)
+    pd.testing.assert_frame_equal(current[0], legacy[0], check_freq=False)
+    pd.testing.assert_series_equal(current[1], legacy[1], check_freq=False)
+    pd.testing.assert_frame_equal(current[2], legacy[2], check_freq=False)
+
+    print(f"{args.members} members x {args.days} days")
+    print(f"  legacy     {legacy_seconds * 1000:10.1f} ms")
+    print(f"  vectorized {seconds * 1000:10.1f} ms  ({legacy_seconds / seconds:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,294 @@
+"""
+A local stand-in for the Jibble API, serving a synthetic organisation.
+
+    uv run python benchmarks/mock_server.py --members 1000 --days 365 --port 8080
+    JIBBLE_API_URL=http://127.0.0.1:8080 JIBBLE_TOKEN_CACHE=false \\
+        uv run jibble export --duration 2025
+
+Every route the exporter uses is imitated: /connect/token,
+/v1/TrackedTimeReport, /v1/Calendars, /v1/CalendarDays,
+/v1/TimeOffOverview and /v1/TimeEntries. Date ranges in the query are
+honoured, as are $top/$skip on the OData collections and the minimal
+`$select` of the tracked time report.
+"""
+
+from argparse import ArgumentParser
+from bisect import bisect_left, bisect_right
+from datetime import date, timedelta
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+import gzip
+import json
+import random
+import re
+import threading
+import time
+
+from synthetic import synthetic_org
+
+ISO_DATE = re.compile(r"\d{4}-\d{2}-\d{2}")
+YEAR = re.compile(r"year\(Date\) eq (\d{4})")
+MONTH = re.compile(r"month\(Date\) eq (\d{1,2})")
+DURATION = re.compile(r"PT(\d+)H(\d+)M(\d+)S")
+
+
+def _seconds(duration: str) -> int:
+    hours, minutes, seconds = map(int, DURATION.fullmatch(duration).groups())
+    return (hours * 60 + minutes) * 60 + seconds
+
+
+def _duration(seconds: int) -> str:
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    return f"PT{hours}H{minutes}M{seconds}S"
+
+
+def _day_tuple(day_name: str) -> tuple[int, int, int]:
+    day, month, year = day_name.split()
+    return int(year), MONTHS[month], int(day)
+
+
+MONTHS = {
+    name: number
+    for number, name in enumerate(
+        [
+            "January",
+            "February",
+            "March",
+            "April",
+            "May",
+            "June",
+            "July",
+            "August",
+            "September",
+            "October",
+            "November",
+            "December",
+        ],
+        start=1,
+    )
+}
+
+
+class MockOrg:
+    """
+    The payloads of `synthetic_org`, indexed by date so that any range of
+    them can be served.
+    """
+
+    def __init__(self, members: int, start: date, end: date, **options):
+        payloads = synthetic_org(members, start, end, **options)
+        self.calendars = payloads["calendars"]
+        self.members = []
+        for member in payloads["attendance"]["value"]:
+            items = member["items"]
+            days = [date(*_day_tuple(item["id"])) for item in items]
+            seconds = [_seconds(item["trackedTime"]) for item in items]
+            self.members.append((member, days, items, seconds))
+        self.holidays = payloads["holidays"]["value"]
+        self.timeoffs = payloads["timeoffs"]["value"]
+
+    def tracked_time(self, start: date, end: date, minimal: bool = False) -> dict:
+        value = []
+        for member, days, items, seconds in self.members:
+            lo, hi = bisect_left(days, start), bisect_right(days, end)
+            if minimal:
+                subject = member["subject"]
+                value.append(
+                    {
+                        "id": member["id"],
+                        "items": [
+                            {"id": item["id"], "trackedTime": item["trackedTime"]}
+                            for item in items[lo:hi]
+                        ],
+                        "subject": {
+                            "entityType": subject["entityType"],
+                            "name": subject["name"],
+                        },
+                    }
+                )
+                continue
+            total = _duration(sum(seconds[lo:hi]))
+            value.append(
+                member | {"items": items[lo:hi], "time": total, "trackedTime": total}
+            )
+        return {"@odata.context": "mock", "value": value}
+
+    def holidays_matching(self, filter: str) -> list[dict]:
+        if bounds := ISO_DATE.findall(filter):
+            start, end = bounds[0], bounds[-1]
+            return [day for day in self.holidays if start <= day["date"] <= end]
+        year = YEAR.search(filter)
+        month = MONTH.search(filter)
+        return [
+            day
+            for day in self.holidays
+            if (year is None or day["date"][:4] == year[1])
+            and (month is None or int(day["date"][5:7]) == int(month[1]))
+        ]
+
+    def timeoffs_matching(self, filter: str) -> list[dict]:
+        bounds = ISO_DATE.findall(filter)
+        if not bounds:
+            return self.timeoffs
+        start, end = bounds[0], bounds[-1]
+        return [
+            timeoff
+            for timeoff in self.timeoffs
+            if start <= timeoff["startDate"] <= end
+            or start <= timeoff["endDate"] <= end
+        ]
+
+
+def _page(values: list[dict], params: dict[str, str]) -> dict:
+    skip = int(params.get("$skip", 0))
+    top = int(params["$top"]) if "$top" in params else len(values)
+    return {
+        "@odata.context": "mock",
+        "@odata.count": len(values),
+        "value": values[skip : skip + top],
+    }
+
+
+class MockJibbleHandler(BaseHTTPRequestHandler):
+    server: MockJibbleServer
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def do_POST(self):
+        path = urlsplit(self.path).path
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        match path:
+            case "/connect/token":
+                self.respond(
+                    HTTPStatus.OK,
+                    {
+                        "access_token": "mock-token",
+                        "expires_in": 3600,
+                        "token_type": "Bearer",
+                        "scope": "api1",
+                        "organizationId": "00000000-0000-0000-0000-000000000000",
+                        "personId": "00000000-0000-0000-0000-000000000001",
+                    },
+                )
+            case "/v1/TimeEntries":
+                self.respond(HTTPStatus.CREATED, None)
+            case _:
+                self.respond(HTTPStatus.NOT_FOUND, {"error": path})
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        params = dict(parse_qsl(url.query))
+        org = self.server.org
+        match url.path:
+            case "/v1/TrackedTimeReport":
+                start = date.fromisoformat(params["from"])
+                end = date.fromisoformat(params["to"])
+                minimal = "$select" in params
+                self.respond(HTTPStatus.OK, org.tracked_time(start, end, minimal))
+            case "/v1/Calendars":
+                self.respond(HTTPStatus.OK, org.calendars)
+            case "/v1/CalendarDays":
+                holidays = org.holidays_matching(params.get("$filter", ""))
+                self.respond(HTTPStatus.OK, _page(holidays, params))
+            case "/v1/TimeOffOverview":
+                timeoffs = org.timeoffs_matching(params.get("$filter", ""))
+                self.respond(HTTPStatus.OK, _page(timeoffs, params))
+            case _:
+                self.respond(HTTPStatus.NOT_FOUND, {"error": url.path})
+
+    def respond(self, status: HTTPStatus, payload: dict | None):
+        server = self.server
+        if server.latency:
+            time.sleep(server.latency)
+        if server.fail_rate and random.random() < server.fail_rate:
+            status, payload = HTTPStatus.SERVICE_UNAVAILABLE, {"error": "mock failure"}
+            extra = {"Retry-After": "0"}
+        else:
+            extra = {}
+        body = b"" if payload is None else json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        if server.compress and "gzip" in self.headers.get("Accept-Encoding", ""):
+            body = gzip.compress(body, compresslevel=5)
+            self.send_header("Content-Encoding", "gzip")
+        for key, value in extra.items():
+            self.send_header(key, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class MockJibbleServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(
+        self,
+        org: MockOrg,
+        port: int = 0,
+        *,
+        latency: float = 0.0,
+        fail_rate: float = 0.0,
+        compress: bool = True,
+        verbose: bool = False,
+    ):
+        super().__init__(("127.0.0.1", port), MockJibbleHandler)
+        self.org = org
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.compress = compress
+        self.verbose = verbose
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> threading.Thread:
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return thread
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument("--members", type=int, default=1000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--start", type=date.fromisoformat, default=date(2025, 1, 1))
+    parser.add_argument("--timeoff-density", type=float, default=0.02)
+    parser.add_argument("--holiday-density", type=float, default=0.03)
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="Seconds per response."
+    )
+    parser.add_argument(
+        "--fail-rate", type=float, default=0.0, help="Share of 503 responses."
+    )
+    parser.add_argument("--no-compress", action="store_true")
+    args = parser.parse_args()
+
+    org = MockOrg(
+        args.members,
+        args.start,
+        args.start + timedelta(days=args.days - 1),
+        timeoff_density=args.timeoff_density,
+        holiday_density=args.holiday_density,
+    )
+    server = MockJibbleServer(
+        org,
+        args.port,
+        latency=args.latency,
+        fail_rate=args.fail_rate,
+        compress=not args.no_compress,
+        verbose=True,
+    )
+    print(f"Serving {args.members} members x {args.days} days on {server.url}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
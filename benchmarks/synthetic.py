@@ -0,0 +1,134 @@
+"""
+Synthetic Jibble organisations, shaped like the API responses.
+"""
+
+from datetime import date, timedelta
+from uuid import UUID
+import random
+
+
+def _subject(entity_type: str, id: str, name: str) -> dict:
+    return {
+        "chipColor": None,
+        "entityType": entity_type,
+        "id": id,
+        "isDeleted": False,
+        "name": name,
+    }
+
+
+def _iso_duration(seconds: int) -> str:
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    return f"PT{hours}H{minutes}M{seconds}S"
+
+
+def synthetic_org(
+    members: int,
+    start: date,
+    end: date,
+    *,
+    presence: float = 0.7,
+    timeoff_density: float = 0.02,
+    holiday_density: float = 0.03,
+    seed: int = 0,
+) -> dict[str, dict]:
+    """
+    Response payloads for `members` people over `start`..`end`.
+
+    Every member is present on a day with probability `presence`, starts a
+    1-3 day (or half-day) timeoff with probability `timeoff_density` and
+    every day is a holiday with probability `holiday_density`.
+    """
+    rng = random.Random(seed)
+    days = [start + timedelta(days=i) for i in range((end - start).days + 1)]
+    calendar_id = str(UUID(int=rng.getrandbits(128), version=4))
+    policies = [
+        {
+            "name": name,
+            "compensation": compensation,
+            "kind": "FullDay",
+            "id": str(UUID(int=i + 1)),
+        }
+        for i, (name, compensation) in enumerate(
+            [
+                ("Casual Leave", "Paid"),
+                ("Sick Leave", "Paid"),
+                ("Unpaid Leave", "Unpaid"),
+            ]
+        )
+    ]
+    people = [
+        (str(UUID(int=rng.getrandbits(128), version=4)), f"Member {i:05d}")
+        for i in range(members)
+    ]
+
+    value, timeoffs = [], []
+    for person_id, name in people:
+        items, total = [], 0
+        for day in days:
+            if rng.random() < timeoff_density:
+                half = rng.random() < 0.2
+                length = 0 if half else rng.randint(0, 2)
+                policy = rng.choice(policies)
+                timeoffs.append(
+                    {
+                        "id": str(UUID(int=rng.getrandbits(128), version=4)),
+                        "personId": person_id,
+                        "kind": "HalfDay" if half else "FullDay",
+                        "startDate": f"{day:%Y-%m-%d}",
+                        "endDate": f"{min(day + timedelta(days=length), end):%Y-%m-%d}",
+                        "status": "Approved",
+                        "note": "",
+                        "duration": 0.5 if half else length + 1,
+                        "person": {"fullName": name, "id": person_id},
+                        "policy": policy,
+                    }
+                )
+            if day.weekday() >= 5 or rng.random() >= presence:
+                continue
+            seconds = rng.randint(4 * 3600, 10 * 3600)
+            total += seconds
+            day_name = f"{day.day} {day:%B %Y}"
+            items.append(
+                {
+                    "billableAmount": 0,
+                    "id": day_name,
+                    "subject": _subject("Date", day_name, day_name),
+                    "time": _iso_duration(seconds),
+                    "trackedTime": _iso_duration(seconds),
+                }
+            )
+        value.append(
+            {
+                "billableAmount": 0,
+                "id": person_id,
+                "items": items,
+                "subject": _subject("Member", person_id, name),
+                "time": _iso_duration(total),
+                "trackedTime": _iso_duration(total),
+            }
+        )
+
+    holidays = [
+        {"calendarId": calendar_id, "date": f"{day:%Y-%m-%d}", "name": f"Holiday {i}"}
+        for i, day in enumerate(days)
+        if rng.random() < holiday_density
+    ]
+    return {
+        "attendance": {"@odata.context": "synthetic", "value": value},
+        "calendars": {
+            "@odata.context": "synthetic",
+            "value": [{"@odata.etag": 'W/"1"', "name": "Droplet", "id": calendar_id}],
+        },
+        "holidays": {
+            "@odata.context": "synthetic",
+            "@odata.count": len(holidays),
+            "value": holidays,
+        },
+        "timeoffs": {
+            "@odata.context": "synthetic",
+            "@odata.count": len(timeoffs),
+            "value": timeoffs,
+        },
+    }
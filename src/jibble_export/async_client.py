@@ -0,0 +1,425 @@
+from collections import defaultdict
+from dataclasses import asdict, dataclass, field
+from http import HTTPStatus
+from typing import Any, ClassVar, Literal
+import asyncio
+import itertools
+import json
+import logging
+import ssl
+
+from jibble_export.client import (
+    AuthResponse,
+    AuthorizedJibbleClient,
+    Credentials,
+    check_status,
+    decode_response,
+    default_token_store,
+    identity_host,
+    load_cached_auth,
+    parse_token_response,
+    token_request,
+    with_query,
+)
+from jibble_export.pool import split_origin
+from jibble_export.scheduler import (
+    IDEMPOTENT_METHODS,
+    RETRYABLE_ERRORS,
+    RequestScheduler,
+)
+from jibble_export.content_encoding import ACCEPT_ENCODING, TransferStats, decode_body
+from jibble_export.settings import setting
+from jibble_export.token_store import TokenStore
+from jibble_export.tracing import span
+
+
+READ_SIZE = 2**16
+
+
+def _framing(
+    headers: dict[str, str], status: int
+) -> Literal["empty", "chunked", "length", "eof"]:
+    """
+    How the end of a response body is found. Bodies without a length end
+    when the server closes the connection.
+    """
+    if (
+        status in (HTTPStatus.NO_CONTENT, HTTPStatus.NOT_MODIFIED)
+        or 100 <= status < 200
+    ):
+        return "empty"
+    if headers.get("transfer-encoding", "").lower() == "chunked":
+        return "chunked"
+    if "content-length" in headers:
+        return "length"
+    return "eof"
+
+
+@dataclass
+class AsyncResponse:
+    status: int
+    headers: dict[str, str]
+    body: bytes
+
+    @property
+    def will_close(self) -> bool:
+        return (
+            self.headers.get("connection", "").lower() == "close"
+            or _framing(self.headers, self.status) == "eof"
+        )
+
+
+@dataclass
+class _AsyncConnection:
+    """
+    Stream pair whose every read and write may take up to `timeout`
+    seconds, so that a slow but steady download is never cut short.
+    """
+
+    reader: asyncio.StreamReader
+    writer: asyncio.StreamWriter
+    timeout: float = 60.0
+
+    async def write(self, data: bytes):
+        self.writer.write(data)
+        await asyncio.wait_for(self.writer.drain(), self.timeout)
+
+    async def readline(self) -> bytes:
+        return await asyncio.wait_for(self.reader.readline(), self.timeout)
+
+    async def readexactly(self, n: int) -> bytes:
+        parts, left = [], n
+        while left > 0:
+            part = await asyncio.wait_for(
+                self.reader.read(min(left, READ_SIZE)), self.timeout
+            )
+            if not part:
+                raise asyncio.IncompleteReadError(b"".join(parts), n)
+            parts.append(part)
+            left -= len(part)
+        return b"".join(parts)
+
+    async def read_to_eof(self) -> bytes:
+        parts = []
+        while part := await asyncio.wait_for(self.reader.read(READ_SIZE), self.timeout):
+            parts.append(part)
+        return b"".join(parts)
+
+    def close(self):
+        self.writer.close()
+
+
+async def _read_body(
+    conn: _AsyncConnection, headers: dict[str, str], status: int
+) -> bytes:
+    match _framing(headers, status):
+        case "empty":
+            return b""
+        case "chunked":
+            chunks = []
+            while True:
+                size_line = await conn.readline()
+                size = int(size_line.split(b";", 1)[0].strip(), 16)
+                if size == 0:
+                    # skip trailers
+                    while (await conn.readline()) not in (b"\r\n", b"\n", b""):
+                        pass
+                    return b"".join(chunks)
+                chunks.append(await conn.readexactly(size))
+                await conn.readexactly(2)
+        case "length":
+            return await conn.readexactly(int(headers["content-length"]))
+        case "eof":
+            return await conn.read_to_eof()
+
+
+async def _exchange(
+    conn: _AsyncConnection,
+    host: str,
+    method: str,
+    url: str,
+    body: bytes,
+    headers: dict[str, str],
+) -> AsyncResponse:
+    tls, hostname, port = split_origin(host)
+    if port != (443 if tls else 80):
+        hostname = f"{hostname}:{port}"
+    head = [
+        f"{method} {url} HTTP/1.1",
+        f"Host: {hostname}",
+        f"Content-Length: {len(body)}",
+    ]
+    head.extend(f"{key}: {value}" for key, value in headers.items())
+    await conn.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + body)
+
+    status_line = await conn.readline()
+    if not status_line:
+        raise ConnectionResetError("connection closed by server")
+    _, status, *_ = status_line.decode("latin-1").split(" ", 2)
+    response_headers: dict[str, str] = {}
+    while (line := await conn.readline()) not in (b"\r\n", b"\n", b""):
+        key, _, value = line.decode("latin-1").partition(":")
+        response_headers[key.strip().lower()] = value.strip()
+    data = await _read_body(conn, response_headers, int(status))
+    return AsyncResponse(int(status), response_headers, data)
+
+
+@dataclass
+class AsyncConnectionPool:
+    """
+    asyncio counterpart of `ConnectionPool`, built on stdlib streams.
+
+    `timeout` bounds connecting and each read or write, not a whole
+    exchange. Connections whose body ran to EOF are closed, not pooled.
+    """
+
+    maxsize: int = 4
+    timeout: float = 60.0
+    _idle: defaultdict[str, list[_AsyncConnection]] = field(
+        init=False, repr=False, default_factory=lambda: defaultdict(list)
+    )
+    _ssl: ssl.SSLContext = field(
+        init=False, repr=False, default_factory=ssl.create_default_context
+    )
+
+    async def _connect(self, host: str) -> _AsyncConnection:
+        logging.debug("opening new async connection to %s", host)
+        tls, hostname, port = split_origin(host)
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(
+                hostname,
+                port,
+                ssl=self._ssl if tls else None,
+                server_hostname=hostname if tls else None,
+            ),
+            self.timeout,
+        )
+        return _AsyncConnection(reader, writer, self.timeout)
+
+    async def request(
+        self,
+        host: str,
+        method: str,
+        url: str,
+        body: bytes = b"",
+        headers: dict[str, str] | None = None,
+    ) -> AsyncResponse:
+        idle = self._idle[host]
+        reused = bool(idle)
+        conn = idle.pop() if reused else await self._connect(host)
+        try:
+            try:
+                res = await _exchange(conn, host, method, url, body, headers or {})
+            except ConnectionError, asyncio.IncompleteReadError:
+                if not reused:
+                    raise
+                logging.debug("stale async connection to %s, reconnecting", host)
+                conn.close()
+                conn = await self._connect(host)
+                res = await _exchange(conn, host, method, url, body, headers or {})
+        except BaseException:
+            conn.close()
+            raise
+        if res.will_close or len(idle) >= self.maxsize:
+            conn.close()
+        else:
+            idle.append(conn)
+        return res
+
+    async def aclose(self):
+        for idle in self._idle.values():
+            while idle:
+                conn = idle.pop()
+                conn.close()
+                try:
+                    await conn.writer.wait_closed()
+                except ConnectionError, ssl.SSLError:
+                    pass
+
+
+@dataclass
+class AsyncJibbleClient:
+    """
+    asyncio version of `AuthorizedJibbleClient`.
+
+    At most `max_concurrency` requests are in flight at once. The client
+    authorizes lazily on the first request and shares the on-disk token
+    cache with the blocking client.
+
+        async with AsyncJibbleClient() as client:
+            report = await aget_time_attendance(duration, client=client)
+    """
+
+    domain: ClassVar[str] = AuthorizedJibbleClient.domain
+    credentials: Credentials = field(default_factory=Credentials.from_settings)
+    max_concurrency: int = field(default_factory=lambda: setting.async_max_concurrency)
+    pool: AsyncConnectionPool = field(
+        default_factory=lambda: AsyncConnectionPool(maxsize=setting.pool_maxsize),
+        repr=False,
+    )
+    token_store: TokenStore | None = field(
+        default_factory=default_token_store, repr=False
+    )
+    scheduler: RequestScheduler = field(default_factory=RequestScheduler, repr=False)
+    transfer_stats: TransferStats = field(default_factory=TransferStats, repr=False)
+    auth: AuthResponse | None = field(init=False, default=None)
+    _semaphore: asyncio.Semaphore = field(init=False, repr=False)
+    _auth_lock: asyncio.Lock = field(
+        init=False, repr=False, default_factory=asyncio.Lock
+    )
+
+    def __post_init__(self):
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self.auth = load_cached_auth(self.token_store, self.credentials.client_id)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def aclose(self):
+        await self.pool.aclose()
+
+    async def reauthorize(self, stale_token: str | None = None):
+        async with self._auth_lock:
+            if (
+                stale_token is not None
+                and self.auth is not None
+                and self.auth.access_token != stale_token
+            ):
+                return
+            payload, headers = token_request(self.credentials)
+            logging.info("Authorizing client...")
+            res = await self.pool.request(
+                identity_host(), "POST", "/connect/token", payload.encode(), headers
+            )
+            self.auth = parse_token_response(res.status, res.body)
+            if self.token_store is not None:
+                self.token_store.save(
+                    self.credentials.client_id, identity_host(), asdict(self.auth)
+                )
+
+    async def ensure_authorized(self) -> AuthResponse:
+        auth = self.auth
+        if auth is None:
+            # no token to go stale, so concurrent first requests authorize once
+            await self.reauthorize(stale_token="")
+        elif auth.has_expired(leeway=setting.token_refresh_leeway):
+            await self.reauthorize(stale_token=auth.access_token)
+        assert self.auth is not None
+        return self.auth
+
+    def host_for(self, subdomain: str) -> str:
+        if setting.api_url:
+            return setting.api_url
+        return self.domain if not subdomain else f"{subdomain}.{self.domain}"
+
+    async def send(
+        self,
+        base_url: str,
+        method: str,
+        url: str,
+        body: bytes,
+        headers: dict[str, str],
+        idempotent: bool | None = None,
+    ) -> AsyncResponse:
+        """
+        Send an authorized request, retried as `scheduler` decides, like
+        `AuthorizedJibbleClient.request`.
+        """
+        if idempotent is None:
+            idempotent = method in IDEMPOTENT_METHODS
+        await self.ensure_authorized()
+        if setting.compression:
+            headers = headers | {"Accept-Encoding": ACCEPT_ENCODING}
+        path = url.partition("?")[0]
+        with span("http", method=method, host=base_url, path=path) as current:
+            refreshed = False
+            for attempt in itertools.count(1):
+                if (wait := self.scheduler.reserve(base_url)) > 0:
+                    await asyncio.sleep(wait)
+                assert self.auth is not None
+                token = self.auth.access_token
+                try:
+                    async with self._semaphore:
+                        res = await self.pool.request(
+                            base_url,
+                            method,
+                            url,
+                            body,
+                            headers | {"Authorization": f"Bearer {token}"},
+                        )
+                except (*RETRYABLE_ERRORS, asyncio.IncompleteReadError) as exc:
+                    delay = self.scheduler.retry_delay(
+                        base_url, attempt, idempotent, error=exc
+                    )
+                    if delay is None:
+                        raise
+                    await asyncio.sleep(delay)
+                    continue
+                if res.status == HTTPStatus.UNAUTHORIZED and not refreshed:
+                    logging.info(
+                        "Got 401 Unauthorized, refreshing token and retrying once"
+                    )
+                    await self.reauthorize(stale_token=token)
+                    refreshed = True
+                    continue
+                delay = self.scheduler.retry_delay(
+                    base_url,
+                    attempt,
+                    idempotent,
+                    status=res.status,
+                    retry_after=res.headers.get("retry-after"),
+                )
+                if delay is None:
+                    current.set(status=res.status, attempts=attempt)
+                    break
+                await asyncio.sleep(delay)
+        res.body = decode_body(
+            res.body, res.headers.get("content-encoding"), self.transfer_stats
+        )
+        return res
+
+    async def get[T](
+        self,
+        *,
+        subdomain: str,
+        relative_path: str,
+        params: dict[str, str],
+        response_model: type[T],
+        status: HTTPStatus,
+    ) -> T:
+        assert relative_path.startswith("/"), "`relative_path` must start with '/'`"
+        base_url = self.host_for(subdomain)
+        relative_path = with_query(relative_path, params)
+        logging.debug("async GET %s%s" % (base_url, relative_path))
+        res = await self.send(
+            base_url, "GET", relative_path, b"", {"Content-Type": "application/json"}
+        )
+        check_status(res.status, status, res.body)
+        return decode_response(res.body, response_model)
+
+    async def post[T](
+        self,
+        *,
+        subdomain: str,
+        relative_path: str,
+        payload: dict[str, Any],
+        response_model: type[T],
+        status: HTTPStatus,
+        idempotent: bool = False,
+    ) -> T:
+        base_url = self.host_for(subdomain)
+        body = json.dumps(payload)
+        logging.debug("async POST %s%s body = %s" % (base_url, relative_path, body))
+        res = await self.send(
+            base_url,
+            "POST",
+            relative_path,
+            body.encode(),
+            {"Accept": "application/json", "Content-Type": "application/json"},
+            idempotent,
+        )
+        check_status(res.status, status, res.body)
+        return decode_response(res.body, response_model)
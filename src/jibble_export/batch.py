@@ -0,0 +1,171 @@
+from collections.abc import Sequence
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Literal
+import logging
+import os
+import re
+import time
+import tomllib
+
+from jibble_export.client import AuthorizedJibbleClient, Credentials, set_client
+from jibble_export.models.duration import Duration
+from jibble_export.settings import setting
+
+# organisation names become directory names
+ORG_NAME = re.compile(r"[\w.-]+")
+ORG_KEYS = {"name", "client_id", "client_secret", "client_secret_env", "calendar"}
+
+
+@dataclass(frozen=True)
+class OrgJob:
+    name: str
+    credentials: Credentials
+    calendar: str = "Droplet"
+
+
+@dataclass
+class OrgResult:
+    name: str
+    seconds: float
+    paths: dict[str, str] = field(default_factory=dict)
+    error: str | None = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def org_job(entry: dict[str, Any], defaults: dict[str, Any]) -> OrgJob:
+    if unknown := set(entry) - ORG_KEYS:
+        raise ValueError(f"unknown keys {', '.join(sorted(unknown))}")
+    name = entry.get("name")
+    if not isinstance(name, str) or not ORG_NAME.fullmatch(name):
+        raise ValueError(
+            f"`name` must be letters, digits, '.', '_' or '-', got {name!r}"
+        )
+    client_id = entry.get("client_id")
+    if not client_id:
+        raise ValueError(f"{name}: `client_id` is missing")
+    if "client_secret_env" in entry:
+        client_secret = os.environ.get(entry["client_secret_env"], "")
+        if not client_secret:
+            raise ValueError(f"{name}: ${entry['client_secret_env']} is not set")
+    elif entry.get("client_secret"):
+        client_secret = entry["client_secret"]
+    else:
+        raise ValueError(f"{name}: `client_secret` or `client_secret_env` is missing")
+    calendar = entry.get("calendar", defaults.get("calendar", "Droplet"))
+    return OrgJob(name, Credentials(client_id, client_secret), calendar)
+
+
+def load_manifest(path: str | Path) -> list[OrgJob]:
+    """
+    Organisations listed in a TOML manifest:
+
+        calendar = "Droplet"  # default for every organisation
+
+        [[org]]
+        name = "acme"
+        client_id = "..."
+        client_secret_env = "ACME_JIBBLE_SECRET"  # or client_secret = "..."
+        calendar = "Acme holidays"
+    """
+    with open(path, "rb") as fh:
+        manifest = tomllib.load(fh)
+    defaults = {key: value for key, value in manifest.items() if key != "org"}
+    jobs = []
+    for number, entry in enumerate(manifest.get("org", []), start=1):
+        try:
+            jobs.append(org_job(entry, defaults))
+        except ValueError as exc:
+            raise ValueError(f"{path}: organisation {number}: {exc}") from None
+    if not jobs:
+        raise ValueError(f"{path}: no [[org]] entries")
+    names = [job.name for job in jobs]
+    if duplicates := {name for name in names if names.count(name) > 1}:
+        raise ValueError(f"{path}: duplicate names {', '.join(sorted(duplicates))}")
+    return jobs
+
+
+def export_org(
+    job: OrgJob,
+    duration: Duration,
+    filename: str,
+    formats: Sequence[str],
+    outdir: Path,
+    layout: Literal["single", "monthly"] = "single",
+) -> OrgResult:
+    """
+    Export the report of one organisation into `outdir/<name>/`, with a
+    client of its own. Runs in a worker process.
+    """
+    from jibble_export.features.reports import (
+        prepare_attendance_report,
+        report_paths,
+        write_attendance_reports,
+    )
+
+    start = time.perf_counter()
+    # one job at a time per process, so the features can use the shared client
+    set_client(AuthorizedJibbleClient(credentials=job.credentials))
+    try:
+        frames = prepare_attendance_report(duration, job.calendar)
+        (outdir / job.name).mkdir(parents=True, exist_ok=True)
+        paths = report_paths(outdir / job.name / filename, formats)
+        write_attendance_reports(*frames, paths, layout=layout)
+    except Exception as exc:
+        logging.error("%s: export failed: %s", job.name, exc)
+        logging.debug("%s: export failed", job.name, exc_info=True)
+        return OrgResult(
+            job.name, time.perf_counter() - start, error=f"{type(exc).__name__}: {exc}"
+        )
+    finally:
+        set_client(None)
+    return OrgResult(job.name, time.perf_counter() - start, paths)
+
+
+def run_batch(
+    jobs: Sequence[OrgJob],
+    duration: Duration,
+    filename: str,
+    formats: Sequence[str] = ("xlsx",),
+    outdir: Path | None = None,
+    *,
+    layout: Literal["single", "monthly"] = "single",
+    max_workers: int | None = None,
+) -> list[OrgResult]:
+    """
+    Export the report of every organisation, `max_workers` at a time in
+    separate processes. A failing organisation does not stop the others,
+    its result carries the error instead. Results are in the order of
+    `jobs`.
+    """
+    outdir = outdir if outdir is not None else setting.reports_dir
+    max_workers = min(max_workers or setting.batch_workers, len(jobs))
+    results: dict[str, OrgResult] = {}
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(
+                export_org, job, duration, filename, tuple(formats), outdir, layout
+            ): job
+            for job in jobs
+        }
+        for future in as_completed(futures):
+            job = futures[future]
+            try:
+                result = future.result()
+            except Exception as exc:
+                # e.g. the worker process died
+                result = OrgResult(job.name, 0.0, error=f"{type(exc).__name__}: {exc}")
+            results[job.name] = result
+            logging.info(
+                "[%s/%s] %s %s in %.1fs",
+                len(results),
+                len(jobs),
+                job.name,
+                "exported" if result.ok else "failed",
+                result.seconds,
+            )
+    return [results[job.name] for job in jobs]
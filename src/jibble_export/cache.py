@@ -0,0 +1,152 @@
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from hashlib import sha256
+from pathlib import Path
+import json
+import logging
+import os
+import threading
+import time
+
+from jibble_export.settings import setting
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    stores: int = 0
+    evictions: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+def normalize_url(url: str) -> str:
+    path, _, query = url.partition("?")
+    if not query:
+        return path
+    return f"{path}?{'&'.join(sorted(query.split('&')))}"
+
+
+def ttl_for_period(end_date: date) -> float:
+    """
+    Responses about a period that ended more than `cache_open_period_days`
+    ago are not expected to change anymore and can be cached for long. More
+    recent ones can still get late timesheet edits and approvals.
+    """
+    if isinstance(end_date, datetime):
+        end_date = end_date.date()
+    if end_date < date.today() - timedelta(days=setting.cache_open_period_days):
+        return setting.cache_ttl_closed
+    return setting.cache_ttl_open
+
+
+@dataclass
+class ResponseCache:
+    """
+    Size bounded on-disk cache of raw response bodies.
+
+    Every entry is one file: a JSON header line holding the expiry time,
+    followed by the body. A hit refreshes the file's mtime, and once the
+    directory grows beyond `max_bytes` the least recently used entries are
+    evicted.
+
+    Entries hold employee data, so the directory is only accessible to its
+    owner. Its size is counted as entries are stored, and the directory is
+    only scanned on the first store and whenever the count crosses
+    `max_bytes`.
+    """
+
+    directory: Path
+    max_bytes: int = 256 * 2**20
+    stats: CacheStats = field(default_factory=CacheStats)
+    _lock: threading.Lock = field(
+        init=False, repr=False, default_factory=threading.Lock
+    )
+    # bytes on disk at the last scan plus those stored since, None until then
+    _size: int | None = field(init=False, repr=False, default=None)
+
+    @staticmethod
+    def key(*parts: str) -> str:
+        return sha256("\0".join(parts).encode()).hexdigest()
+
+    def path_for(self, key: str) -> Path:
+        return self.directory / f"{key}.bin"
+
+    def get(self, key: str) -> bytes | None:
+        path = self.path_for(key)
+        try:
+            with path.open("rb") as fh:
+                header = json.loads(fh.readline())
+                if header["expires_at"] < time.time():
+                    data = None
+                else:
+                    data = fh.read()
+        except FileNotFoundError, ValueError, KeyError:
+            data = None
+        with self._lock:
+            if data is None:
+                self.stats.misses += 1
+                return None
+            self.stats.hits += 1
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        logging.debug("response cache hit %s", key)
+        return data
+
+    def put(self, key: str, data: bytes, ttl: float):
+        import tempfile
+
+        self.directory.mkdir(mode=0o700, parents=True, exist_ok=True)
+        path = self.path_for(key)
+        try:
+            replaced = path.stat().st_size
+        except FileNotFoundError:
+            replaced = 0
+        header = json.dumps({"expires_at": time.time() + ttl}).encode() + b"\n"
+        # mkstemp creates the file with 0600 permissions
+        fd, tmp = tempfile.mkstemp(dir=self.directory, prefix=".entry-")
+        try:
+            with os.fdopen(fd, "wb") as fh:
+                fh.write(header)
+                fh.write(data)
+            os.replace(tmp, path)
+        except BaseException:
+            Path(tmp).unlink(missing_ok=True)
+            raise
+        with self._lock:
+            self.stats.stores += 1
+            if self._size is not None:
+                self._size += len(header) + len(data) - replaced
+            full = self._size is None or self._size > self.max_bytes
+        if full:
+            self.evict()
+
+    def evict(self):
+        with self._lock:
+            entries = []
+            for path in self.directory.glob("*.bin"):
+                try:
+                    stat = path.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                path.unlink(missing_ok=True)
+                total -= size
+                self.stats.evictions += 1
+            self._size = total
+
+    def clear(self):
+        for path in self.directory.glob("*.bin"):
+            path.unlink(missing_ok=True)
+        with self._lock:
+            self._size = None
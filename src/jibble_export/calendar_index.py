@@ -0,0 +1,110 @@
+from dataclasses import dataclass
+from hashlib import sha256
+from pathlib import Path
+from typing import Any
+import json
+import logging
+import os
+import tempfile
+import time
+
+
+@dataclass(frozen=True)
+class IndexedCalendar:
+    id: str
+    etag: str
+
+
+@dataclass(frozen=True)
+class CalendarIndex:
+    """
+    On-disk index of the calendars of each organisation, by name, and of
+    their holidays, one file per calendar and year.
+
+    Entries are stored with the time they were fetched, and holidays with
+    the etag their calendar had then. Deciding when they are stale is left
+    to the caller. Files are replaced atomically, like the token store.
+    """
+
+    directory: Path
+
+    def organisation_dir(self, client_id: str) -> Path:
+        return self.directory / sha256(client_id.encode()).hexdigest()[:32]
+
+    def _read(self, path: Path) -> dict[str, Any] | None:
+        try:
+            return json.loads(path.read_text())
+        except FileNotFoundError:
+            return None
+        except OSError, ValueError:
+            logging.warning("Ignoring unreadable calendar index %s", path)
+            return None
+
+    def _write(self, path: Path, data: dict[str, Any]):
+        path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=".index-")
+        try:
+            with os.fdopen(fd, "w") as fh:
+                json.dump(data, fh)
+            os.replace(tmp, path)
+        except BaseException:
+            Path(tmp).unlink(missing_ok=True)
+            raise
+
+    def calendars(
+        self, client_id: str
+    ) -> tuple[float, dict[str, IndexedCalendar]] | None:
+        """
+        When the calendars were fetched, and their id and etag by name.
+        """
+        data = self._read(self.organisation_dir(client_id) / "calendars.json")
+        if data is None:
+            return None
+        try:
+            return data["fetched_at"], {
+                name: IndexedCalendar(**entry)
+                for name, entry in data["calendars"].items()
+            }
+        except KeyError, TypeError:
+            logging.warning("Ignoring malformed calendar index of %s", client_id)
+            return None
+
+    def store_calendars(self, client_id: str, calendars: dict[str, IndexedCalendar]):
+        self._write(
+            self.organisation_dir(client_id) / "calendars.json",
+            {
+                "fetched_at": time.time(),
+                "calendars": {
+                    name: {"id": entry.id, "etag": entry.etag}
+                    for name, entry in calendars.items()
+                },
+            },
+        )
+
+    def holidays_path(self, client_id: str, calendar_id: str, year: int) -> Path:
+        return (
+            self.organisation_dir(client_id) / "holidays" / calendar_id / f"{year}.json"
+        )
+
+    def holidays(
+        self, client_id: str, calendar_id: str, year: int
+    ) -> tuple[float, str, str] | None:
+        """
+        When the holidays of a year were fetched, the calendar's etag then,
+        and the holidays as a JSON `Holidays` collection.
+        """
+        data = self._read(self.holidays_path(client_id, calendar_id, year))
+        if data is None:
+            return None
+        try:
+            return data["fetched_at"], data["etag"], data["holidays"]
+        except KeyError:
+            return None
+
+    def store_holidays(
+        self, client_id: str, calendar_id: str, year: int, etag: str, holidays: str
+    ):
+        self._write(
+            self.holidays_path(client_id, calendar_id, year),
+            {"fetched_at": time.time(), "etag": etag, "holidays": holidays},
+        )
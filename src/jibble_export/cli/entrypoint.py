@@ -4,11 +4,15 @@ from jibble_export.utils import date_json_encoder
 import json
 from jibble_export.settings import setting
 import calendar
-from datetime import date
+from datetime import date, timedelta
 import inspect
+import sys
 from argparse import ArgumentParser, Namespace, RawTextHelpFormatter
+from typing import TYPE_CHECKING
+from uuid import UUID
 
-import pandas as pd
+if TYPE_CHECKING:
+    from jibble_export.models.duration import Duration
 
 
 def get_calendar_month(month_name: str) -> calendar.Month:
@@ -19,41 +23,16 @@ def get_calendar_month(month_name: str) -> calendar.Month:
     raise ValueError("Unknwon month %s" % month_name)
 
 
-def export_handler(args: Namespace):
+def parse_duration(value: str | None) -> tuple[Duration, str]:
     """
-    Export attendance report for given duration.
-
-    If duration is not provided, then report is exported for current month, year.
-
-    Outfile filename is guessed from duration.
-
-    Duration format:
-        $ jibble export --duration "2026-02-01:2026-02-28"
-        # Report successfully exported to attendance_report_2026-02-01_2026-02-28.xlsx
-        $ jibble export --duration feb
-        # Report successfully exported to attendance_report_FEBRUARY-2026.xlsx
-        $ jibble export --duration feb,2026
-        # Report successfully exported to attendance_report_FEBRUARY-2026.xlsx
-        $ jibble export --duration 2026
-        # Report successfully exported to attendance_report_2026.xlsx
-
-      Special values:
-      If LAST_ONE_MONTH report is exported on 24th Feb, 2026
-        $ jibble export --duration LAST_ONE_MONTH
-        # Report successfully exported to attendance_report_2026-01-25_2026-02-24.xlsx
-      If LAST_MONTH report is exported in Feb, 2026
-        $ jibble export --duration LAST_MONTH
-        # Report successfully exported to attendance_report_JANUARY-2026.xlsx
-
-    When date format is used, it has to be in yyyy-mm-dd format.
+    Duration named by `--duration` (see `export_handler`), and the report
+    filename guessed from it.
     """
-    from jibble_export.formatter import export_attendance_report
-    from jibble_export.features.reports import prepare_attendance_report
     from jibble_export.models.duration import Duration
 
     outfile_prefix = "attendance_report_"
     filename = outfile_prefix.removesuffix("_") + ".xlsx"
-    match args.duration:
+    match value:
         case None:
             duration = Duration.current_month()
             today = date.today()
@@ -61,6 +40,8 @@ def export_handler(args: Namespace):
                 f"{outfile_prefix}{calendar.Month(today.month).name}-{today.year}.xlsx"
             )
         case "LAST_ONE_MONTH":
+            import pandas as pd
+
             today = pd.Timestamp.today()
             end_date = (today - pd.DateOffset(days=1)).to_pydatetime().date()
             start_date = (today - pd.DateOffset(months=1)).to_pydatetime().date()
@@ -78,45 +59,151 @@ def export_handler(args: Namespace):
             filename = f"{outfile_prefix}{calendar_month.name}-{last_year}.xlsx"
         case str():
             try:
-                start, end = args.duration.split(":", maxsplit=1)
+                start, end = value.split(":", maxsplit=1)
                 duration = Duration(
                     date.strptime(start, "%Y-%m-%d"), date.strptime(end, "%Y-%m-%d")
                 )
-                filename = f"{outfile_prefix}{args.duration.replace(':', '_')}.xlsx"
+                filename = f"{outfile_prefix}{value.replace(':', '_')}.xlsx"
             except ValueError:
                 try:
-                    month_name, year = args.duration.split(",", maxsplit=1)
+                    month_name, year = value.split(",", maxsplit=1)
                     calendar_month = get_calendar_month(month_name)
                     duration = Duration.month(calendar_month, int(year))
                     filename = f"{outfile_prefix}{calendar_month.name}-{int(year)}.xlsx"
                 except ValueError:
-                    if args.duration.isnumeric():
-                        duration = Duration.year(int(args.duration))
-                        filename = f"{outfile_prefix}{args.duration}.xlsx"
+                    if value.isnumeric():
+                        duration = Duration.year(int(value))
+                        filename = f"{outfile_prefix}{value}.xlsx"
                     else:
-                        calendar_month = get_calendar_month(args.duration)
+                        calendar_month = get_calendar_month(value)
                         duration = Duration.month(calendar_month)
                         filename = f"{outfile_prefix}{calendar_month.name}-{date.today().year}.xlsx"
-    filename = setting.reports_dir / filename
+    return duration, filename
+
+
+def export_handler(args: Namespace):
+    """
+    Export attendance report for given duration.
+
+    If duration is not provided, then report is exported for current month, year.
+
+    Outfile filename is guessed from duration.
+
+    Duration format:
+        $ jibble export --duration "2026-02-01:2026-02-28"
+        # Report successfully exported to attendance_report_2026-02-01_2026-02-28.xlsx
+        $ jibble export --duration feb
+        # Report successfully exported to attendance_report_FEBRUARY-2026.xlsx
+        $ jibble export --duration feb,2026
+        # Report successfully exported to attendance_report_FEBRUARY-2026.xlsx
+        $ jibble export --duration 2026
+        # Report successfully exported to attendance_report_2026.xlsx
+
+      Special values:
+      If LAST_ONE_MONTH report is exported on 24th Feb, 2026
+        $ jibble export --duration LAST_ONE_MONTH
+        # Report successfully exported to attendance_report_2026-01-25_2026-02-24.xlsx
+      If LAST_MONTH report is exported in Feb, 2026
+        $ jibble export --duration LAST_MONTH
+        # Report successfully exported to attendance_report_JANUARY-2026.xlsx
+
+    When date format is used, it has to be in yyyy-mm-dd format.
+    """
+    from jibble_export.client import get_client
+    from jibble_export.features.reports import (
+        prepare_attendance_report,
+        report_paths,
+        write_attendance_reports,
+    )
+
+    client = get_client()
+    # set every time, the client outlives a command in `jibble serve`
+    client.cache_mode = "off" if args.no_cache else "refresh" if args.refresh else "use"
+
+    # relative paths are the caller's, `jibble serve` runs from elsewhere
+    cwd: Path = args.cwd
+    reports_dir = cwd / setting.reports_dir
+    duration, filename = parse_duration(args.duration)
+    filename = reports_dir / filename
     if args.outfile:
-        filename = args.outfile
+        filename = cwd / args.outfile
+    query = None
+    if args.person or args.group or args.fields != "full":
+        from jibble_export.features.attendance import AttendanceQuery
+
+        if args.offline:
+            raise ValueError(
+                "--person, --group and --fields need the API, not --offline"
+            )
+        query = AttendanceQuery(
+            tuple(args.person or ()), tuple(args.group or ()), args.fields
+        )
+    warehouse = None
+    if args.offline:
+        from jibble_export.client import get_client
+        from jibble_export.warehouse import Warehouse
+
+        client_id = get_client().credentials.client_id
+        warehouse = Warehouse(cwd / setting.warehouse_path, client_id)
     timetracking, holidays, timeoffs, person_ids = prepare_attendance_report(
         duration=duration,
         holiday_calendar_name=args.calendar,
+        chunk=args.chunk,
+        max_workers=args.workers,
+        warehouse=warehouse,
+        compact=args.compact,
+        stream=args.stream,
+        query=query,
     )
-    export_attendance_report(
-        timetracking, holidays, timeoffs, person_ids, str(filename)
+    formats = list(dict.fromkeys(args.format or ["xlsx"]))
+    paths = report_paths(filename, formats, exact=bool(args.outfile))
+    write_attendance_reports(
+        timetracking, holidays, timeoffs, person_ids, paths, layout=args.layout
     )
+    if client.cache is not None and client.cache_mode != "off":
+        stats = client.cache.stats
+        logging.info(
+            "Response cache: %s hits, %s misses (%.0f%% hit rate)",
+            stats.hits,
+            stats.misses,
+            100 * stats.hit_rate,
+        )
+    transfer = client.transfer_stats
+    if transfer.responses:
+        logging.info(
+            "Transfer: %.1f MiB on the wire, %.1f MiB decoded (%.1fx), "
+            "%s of %s responses compressed, %.2fs decompressing",
+            transfer.wire_bytes / 2**20,
+            transfer.body_bytes / 2**20,
+            transfer.ratio,
+            transfer.compressed,
+            transfer.responses,
+            transfer.decompress_seconds,
+        )
+    scheduled = client.scheduler.stats
+    if scheduled.retries or scheduled.throttle_waits:
+        logging.info(
+            "Scheduler: %s requests, %s retries (%s), %.1fs backing off, "
+            "%s throttled for %.1fs",
+            scheduled.requests,
+            scheduled.retries,
+            ", ".join(f"{cause}: {n}" for cause, n in scheduled.causes.items()),
+            scheduled.backoff_seconds,
+            scheduled.throttle_waits,
+            scheduled.throttle_seconds,
+        )
     if args.json:
-        setting.reports_dir.mkdir(exist_ok=True)
-        with (report_details_path := setting.reports_dir / "latest.json").open(
-            "w"
-        ) as fh:
+        reports_dir.mkdir(exist_ok=True)
+        with (report_details_path := reports_dir / "latest.json").open("w") as fh:
             json.dump(
                 {
                     "start": duration.start_date,
                     "end": duration.end_date,
-                    "path": str(Path(filename).resolve()),
+                    "path": str(Path(paths[formats[0]]).resolve()),
+                    "paths": {
+                        format: str(Path(path).resolve())
+                        for format, path in paths.items()
+                    },
                 },
                 fh,
                 default=date_json_encoder,
@@ -126,13 +213,31 @@ def export_handler(args: Namespace):
         )
 
 
+def sync_handler(args: Namespace):
+    from jibble_export.client import get_client
+    from jibble_export.warehouse import Warehouse
+
+    client = get_client()
+    # the warehouse must see fresh data, but keep the cache warm for exports
+    client.cache_mode = "refresh"
+    warehouse = Warehouse(
+        args.database or setting.warehouse_path, client.credentials.client_id
+    )
+    since = date.strptime(args.since, "%Y-%m-%d") if args.since else None
+    duration = warehouse.sync(args.calendar, since=since)
+    logging.info("Warehouse %s synced for %s", warehouse.path.resolve(), duration)
+
+
 def clockin_handler(args: Namespace):
     from jibble_export.features.clocking import clock_in
+    from jibble_export.utils import iso_duration_microseconds
 
-    td = pd.Timedelta(args.autoout if args.autoout is not None else 0)
-    if td > pd.Timedelta(days=1):
+    td = timedelta(
+        microseconds=iso_duration_microseconds(args.autoout) if args.autoout else 0
+    )
+    if td > timedelta(days=1):
         raise ValueError("Auto clock out time cannot be longer than 1 day.")
-    clock_in(auto_clock_out_after=td.to_pytimedelta())
+    clock_in(auto_clock_out_after=td)
 
 
 def clockout_handler(args: Namespace):
@@ -141,8 +246,90 @@ def clockout_handler(args: Namespace):
     clock_out()
 
 
-def main():
+def batch_handler(args: Namespace):
+    """
+    Export the report of every organisation of a manifest, each into its own
+    directory under the output directory.
+    """
+    from jibble_export.batch import load_manifest, run_batch
+
+    jobs = load_manifest(args.manifest)
+    duration, filename = parse_duration(args.duration)
+    outdir = args.outdir or setting.reports_dir
+    results = run_batch(
+        jobs,
+        duration,
+        filename,
+        list(dict.fromkeys(args.format or ["xlsx"])),
+        outdir,
+        layout=args.layout,
+        max_workers=args.workers,
+    )
+    width = max(len(result.name) for result in results)
+    for result in results:
+        logging.info(
+            "%s  %6.1fs  %s",
+            result.name.ljust(width),
+            result.seconds,
+            ", ".join(result.paths.values()) if result.ok else f"FAILED {result.error}",
+        )
+    if args.summary:
+        Path(args.summary).write_text(
+            json.dumps(
+                {
+                    "start": duration.start_date,
+                    "end": duration.end_date,
+                    "organisations": [
+                        {
+                            "name": result.name,
+                            "seconds": round(result.seconds, 3),
+                            "paths": result.paths,
+                            "error": result.error,
+                        }
+                        for result in results
+                    ],
+                },
+                indent=2,
+                default=date_json_encoder,
+            )
+        )
+        logging.info("Batch summary written to %s", Path(args.summary).resolve())
+    if failed := [result.name for result in results if not result.ok]:
+        raise ValueError(
+            f"{len(failed)} of {len(results)} organisations failed: {', '.join(failed)}"
+        )
+
+
+def serve_handler(args: Namespace):
+    from jibble_export.daemon import serve
+
+    serve(args.socket)
+
+
+def run_profiled(args: Namespace):
+    from jibble_export.tracing import profile
+
+    try:
+        with profile("jibble export", memory=args.profile_memory) as root:
+            args.func(args)
+    finally:
+        tree = json.dumps(root.to_dict(), indent=2, default=str)
+        if args.profile == "-":
+            print(tree, file=sys.stderr)
+        else:
+            Path(args.profile).write_text(tree)
+            logging.info("Profile written to %s", Path(args.profile).resolve())
+
+
+def build_parser() -> ArgumentParser:
     parser = ArgumentParser("jibble")
+    parser.add_argument(
+        "--no-daemon",
+        action="store_true",
+        help="Run the command in this process even when `jibble serve` is running.",
+    )
+    # the daemon sets the working directory of its client instead
+    parser.set_defaults(cwd=Path())
     subparsers = parser.add_subparsers()
 
     clockin_parser = subparsers.add_parser("clockin")
@@ -150,10 +337,10 @@ def main():
         "--autoout",
         help="Autoclockout after given timedelta in ISO 8601 timedelta format. e.g. `--autoout PT9H` for 9 hours.",
     )
-    clockin_parser.set_defaults(func=clockin_handler)
+    clockin_parser.set_defaults(func=clockin_handler, daemon=True)
 
     clockout_parser = subparsers.add_parser("clockout")
-    clockout_parser.set_defaults(func=clockout_handler)
+    clockout_parser.set_defaults(func=clockout_handler, daemon=True)
 
     export_parser = subparsers.add_parser(
         "export", formatter_class=RawTextHelpFormatter
@@ -163,15 +350,192 @@ def main():
     )
     export_parser.add_argument("--outfile", "-o", help="Path to the exported file")
     export_parser.add_argument("--duration", "-d", help=inspect.getdoc(export_handler))
+    export_parser.add_argument(
+        "--chunk",
+        choices=["month", "week"],
+        help="Split long durations into chunks fetched concurrently\n"
+        "(default: JIBBLE_ATTENDANCE_CHUNK, or a single request).",
+    )
+    export_parser.add_argument(
+        "--workers",
+        type=int,
+        help="Number of chunks fetched in parallel (default: 4).",
+    )
+    cache_group = export_parser.add_mutually_exclusive_group()
+    cache_group.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Neither read nor write the response cache.",
+    )
+    cache_group.add_argument(
+        "--refresh",
+        action="store_true",
+        help="Refetch everything and update the response cache.",
+    )
+    export_parser.add_argument(
+        "--format",
+        "-f",
+        action="append",
+        choices=["xlsx", "parquet", "arrow", "csv"],
+        help="Output format, repeat for several formats from one fetch (default: xlsx).\n"
+        "parquet, arrow and csv hold one row per member and day.",
+    )
+    export_parser.add_argument(
+        "--layout",
+        choices=["single", "monthly"],
+        default="single",
+        help="`monthly` writes a summary sheet and one sheet per month, when the\n"
+        "duration spans several months (default: single).",
+    )
+    export_parser.add_argument(
+        "--compact",
+        action="store_true",
+        help="Parse tracked time into compact arrays instead of pydantic models.\n"
+        "Uses a fraction of the memory on long durations.",
+    )
+    export_parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Parse tracked time member by member while it is downloaded\n"
+        "(implies --compact, bypasses the response cache).",
+    )
+    export_parser.add_argument(
+        "--person",
+        action="append",
+        type=UUID,
+        metavar="PERSON_ID",
+        help="Only export this person, repeat for several. Filtered by the API.",
+    )
+    export_parser.add_argument(
+        "--group",
+        action="append",
+        type=UUID,
+        metavar="GROUP_ID",
+        help="Only export the members of this group, repeat for several.\n"
+        "Looked up in the API, then filtered like --person.",
+    )
+    export_parser.add_argument(
+        "--fields",
+        choices=["full", "minimal"],
+        default="full",
+        help="`minimal` asks the API for member names and daily tracked time\n"
+        "only, instead of every field of every day (default: full).",
+    )
+    export_parser.add_argument(
+        "--profile",
+        nargs="?",
+        const="-",
+        metavar="FILE",
+        help="Write a JSON tree of how long each stage took to FILE\n"
+        "(default: stderr).",
+    )
+    export_parser.add_argument(
+        "--profile-memory",
+        action="store_true",
+        help="With --profile, also trace memory allocations (much slower).",
+    )
     export_parser.add_argument(
         "--json",
         action="store_true",
         help="create reports/latest.json with export information. Useful for CI.",
     )
-    export_parser.set_defaults(func=export_handler)
+    export_parser.add_argument(
+        "--offline",
+        action="store_true",
+        help="Read data from the local warehouse (see `jibble sync`) instead of the API.",
+    )
+    export_parser.set_defaults(func=export_handler, daemon=True)
+
+    sync_parser = subparsers.add_parser("sync")
+    sync_parser.add_argument(
+        "--calendar", "-c", help="Name of the calendar", default="Droplet"
+    )
+    sync_parser.add_argument(
+        "--since",
+        help="Sync from this date (yyyy-mm-dd). Defaults to the last synced day "
+        "minus a re-check window, or the start of the year on first sync.",
+    )
+    sync_parser.add_argument(
+        "--database", type=Path, help="Path to the SQLite warehouse."
+    )
+    sync_parser.set_defaults(func=sync_handler)
 
+    batch_parser = subparsers.add_parser(
+        "batch",
+        formatter_class=RawTextHelpFormatter,
+        help="Export the reports of several organisations listed in a manifest.",
+    )
+    batch_parser.add_argument(
+        "manifest",
+        type=Path,
+        help="TOML file with an [[org]] table per organisation, holding its\n"
+        "name, client_id, client_secret (or client_secret_env) and calendar.",
+    )
+    batch_parser.add_argument(
+        "--duration",
+        "-d",
+        help="As for `jibble export`, the same for every organisation.",
+    )
+    batch_parser.add_argument(
+        "--outdir",
+        "-o",
+        type=Path,
+        help="Reports go to OUTDIR/<name>/ (default: the reports directory).",
+    )
+    batch_parser.add_argument(
+        "--format",
+        "-f",
+        action="append",
+        choices=["xlsx", "parquet", "arrow", "csv"],
+        help="Output format, repeat for several formats (default: xlsx).",
+    )
+    batch_parser.add_argument(
+        "--layout", choices=["single", "monthly"], default="single"
+    )
+    batch_parser.add_argument(
+        "--workers",
+        "-w",
+        type=int,
+        help="Organisations exported in parallel, each in its own process\n"
+        "(default: 4).",
+    )
+    batch_parser.add_argument(
+        "--summary",
+        metavar="FILE",
+        help="Write the per organisation timings, paths and errors as JSON.",
+    )
+    batch_parser.set_defaults(func=batch_handler)
+
+    serve_parser = subparsers.add_parser(
+        "serve",
+        help="Answer clockin, clockout and export commands over a Unix socket.",
+    )
+    serve_parser.add_argument(
+        "--socket",
+        type=Path,
+        help="Path of the socket (default: JIBBLE_DAEMON_SOCKET, or daemon.sock "
+        "in the cache directory).",
+    )
+    serve_parser.set_defaults(func=serve_handler)
+    return parser
+
+
+def main():
+    parser = build_parser()
     args = parser.parse_args()
     try:
-        args.func(args)
+        if (
+            getattr(args, "daemon", False)
+            and not args.no_daemon
+            and not getattr(args, "profile", None)
+        ):
+            from jibble_export.daemon import call
+
+            if call(sys.argv[1:]):
+                return
+        if getattr(args, "profile", None):
+            run_profiled(args)
+        else:
+            args.func(args)
     except Exception as msg:
         parser.error(str(msg))
@@ -1,12 +1,43 @@
+from collections import deque
+from collections.abc import Iterator
+from contextvars import copy_context
 from http import HTTPStatus
-from typing import ClassVar, Any
+from typing import TYPE_CHECKING, ClassVar, Any, Literal, Protocol, Self
 import time
 import json
-from urllib.parse import urlencode, quote_plus
-from dataclasses import dataclass, field
+from urllib.parse import urlencode, quote_plus, urlsplit
+from contextlib import ExitStack, contextmanager
+from dataclasses import asdict, dataclass, field
+from functools import cache, partial
 import http.client
+import itertools
 import logging
+import threading
+
+from jibble_export.content_encoding import (
+    ACCEPT_ENCODING,
+    DecodedResponse,
+    TransferStats,
+)
+from jibble_export.pool import ConnectionPool
+from jibble_export.scheduler import (
+    IDEMPOTENT_METHODS,
+    RETRYABLE_ERRORS,
+    RequestScheduler,
+    SchedulerStats,
+)
 from jibble_export.settings import setting
+from jibble_export.tracing import span
+
+# imported where used, so that the quick commands (clockin, clockout) only
+# load what a single POST needs
+if TYPE_CHECKING:
+    from concurrent.futures import Future
+
+    from pydantic import TypeAdapter
+
+    from jibble_export.cache import ResponseCache
+    from jibble_export.token_store import TokenStore
 
 
 logging.basicConfig(
@@ -22,9 +53,32 @@ class AuthorizationExpired(Exception): ...
 class AuthorizationFailed(Exception): ...
 
 
-def load_encoded_jibble_creds():
-    client_id = setting.client_id
-    client_secret = setting.client_secret
+class UnexpectedStatus(ValueError):
+    def __init__(self, status: int, expected_status: HTTPStatus, body: bytes | str):
+        super().__init__(f"Expected status {expected_status}, got status {status}")
+        self.status = status
+        self.expected_status = expected_status
+        self.body = body
+
+
+@dataclass(frozen=True)
+class Credentials:
+    """
+    API credentials of one organisation.
+    """
+
+    client_id: str
+    client_secret: str = field(repr=False)
+
+    @classmethod
+    def from_settings(cls) -> Credentials:
+        return cls(setting.client_id, setting.client_secret)
+
+
+def load_encoded_jibble_creds(credentials: Credentials | None = None):
+    credentials = credentials or Credentials.from_settings()
+    client_id = credentials.client_id
+    client_secret = credentials.client_secret
     if client_id == "" or client_secret == "":
         logging.error(
             "client credentials not found! Please set JIBBLE_CLIENT_ID and JIBBLE_CLIENT_SECRET"
@@ -42,28 +96,50 @@ def load_encoded_jibble_creds():
     return encoded_creds
 
 
-def authorize() -> AuthResponse:
-    conn = http.client.HTTPSConnection("identity.prod.jibble.io")
-    encoded_creds = load_encoded_jibble_creds()
+IDENTITY_HOST = "identity.prod.jibble.io"
+
+
+def identity_host() -> str:
+    return setting.api_url or IDENTITY_HOST
+
+
+def token_request(
+    credentials: Credentials | None = None,
+) -> tuple[str, dict[str, str]]:
+    encoded_creds = load_encoded_jibble_creds(credentials)
     payload = f"grant_type=client_credentials&{encoded_creds}"
     headers = {
         "Accept": "application/json",
         "Content-Type": "application/x-www-form-urlencoded",
     }
-    logging.info("Authorizing client...")
-    conn.request("POST", "/connect/token", payload, headers)
-    res = conn.getresponse()
-    if res.status == http.HTTPStatus.OK:
+    return payload, headers
+
+
+def parse_token_response(status: int, data: bytes) -> AuthResponse:
+    if status == http.HTTPStatus.OK:
         logging.info("Authorization successful!")
     else:
         logging.fatal("Authorization Failed!")
         raise AuthorizationFailed()
-    data = res.read()
     logging.debug(data.decode())
     auth = AuthResponse(**json.loads(data.decode()))
     return auth
 
 
+def authorize(
+    pool: ConnectionPool | None = None, credentials: Credentials | None = None
+) -> AuthResponse:
+    pool = pool if pool is not None else ConnectionPool(maxsize=1)
+    payload, headers = token_request(credentials)
+    logging.info("Authorizing client...")
+    with span("authorize"):
+        with pool.urlopen(
+            identity_host(), "POST", "/connect/token", payload, headers
+        ) as res:
+            data = res.read()
+        return parse_token_response(res.status, data)
+
+
 @dataclass
 class AuthResponse:
     access_token: str
@@ -72,22 +148,286 @@ class AuthResponse:
     scope: str
     organizationId: str
     personId: str
+    # wall-clock, so that a token cached by one process can be checked by another
     generated_at: int | float = field(init=False)
 
     def __post_init__(self):
-        self.generated_at = time.monotonic()
+        self.generated_at = time.time()
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> AuthResponse:
+        data = dict(data)
+        generated_at = data.pop("generated_at")
+        auth = cls(**data)
+        auth.generated_at = generated_at
+        return auth
+
+    def has_expired(self, leeway: float = 0):
+        return time.time() - self.generated_at > self.expires_in - leeway
+
+
+def default_token_store() -> TokenStore | None:
+    if not setting.token_cache:
+        return None
+    from jibble_export.token_store import TokenStore
+
+    return TokenStore(setting.cache_dir / "tokens")
+
+
+def default_response_cache() -> ResponseCache | None:
+    if not setting.response_cache:
+        return None
+    from jibble_export.cache import ResponseCache
 
-    def has_expired(self):
-        return time.monotonic() - self.generated_at > self.expires_in
+    return ResponseCache(setting.cache_dir / "responses", setting.cache_max_bytes)
+
+
+def load_cached_auth(
+    token_store: TokenStore | None, client_id: str | None = None
+) -> AuthResponse | None:
+    if token_store is None:
+        return None
+    data = token_store.load(
+        client_id if client_id is not None else setting.client_id, identity_host()
+    )
+    if data is None:
+        return None
+    try:
+        auth = AuthResponse.from_dict(data)
+    except KeyError, TypeError:
+        logging.warning("Ignoring malformed cached token")
+        return None
+    if auth.has_expired(leeway=setting.token_refresh_leeway):
+        logging.debug("Cached token has expired")
+        return None
+    logging.info("Using cached authorization token")
+    return auth
+
+
+def with_query(relative_path: str, params: dict[str, str]) -> str:
+    if params:
+        relative_path += "?" + "&".join(
+            f"{key}={quote_plus(value)}" for key, value in params.items()
+        )
+    return relative_path
+
+
+def check_status(status: int, expected_status: HTTPStatus, msg: bytes | str):
+    if status != int(expected_status):
+        logging.error(
+            "Expected status %s, got status %s",
+            expected_status,
+            status,
+        )
+        if isinstance(msg, bytes):
+            msg = msg.decode(errors="replace")
+        logging.debug("Message: %s", msg)
+        raise UnexpectedStatus(status, expected_status, msg)
+
+
+@cache
+def type_adapter[T](response_model: type[T]) -> TypeAdapter[T]:
+    # pydantic is only paid for by commands that decode responses
+    from pydantic import TypeAdapter
+
+    return TypeAdapter(response_model)
+
+
+def decode_response[T](data: bytes | str, response_model: type[T]) -> T:
+    """
+    Validate the raw body straight into `response_model`, without building
+    an intermediate str or dict copy of the payload. `bytes` returns the
+    body as is, for callers parsing it themselves.
+    """
+    logging.debug("decoding %s bytes into %s", len(data), response_model.__name__)
+    if isinstance(None, response_model):
+        return response_model()
+    if response_model is bytes:
+        return data if isinstance(data, bytes) else data.encode()  # ty: ignore[invalid-return-type]
+    return type_adapter(response_model).validate_json(data)
+
+
+class ODataCollection(Protocol):
+    odata_count: int
+    odata_next_link: str | None
+    value: list[Any]
+
+    def model_copy(
+        self, *, update: dict[str, Any] | None = None, deep: bool = False
+    ) -> Self: ...
+
+
+def merge_pages[T: ODataCollection](pages: Iterator[T]) -> T:
+    first = next(pages)
+    value = list(first.value)
+    for page in pages:
+        value.extend(page.value)
+    return first.model_copy(update={"value": value, "odata_next_link": None})
 
 
 @dataclass
 class AuthorizedJibbleClient:
     domain: ClassVar[str] = "prod.jibble.io"
-    auth: AuthResponse = field(init=False, default_factory=authorize)
+    credentials: Credentials = field(default_factory=Credentials.from_settings)
+    pool: ConnectionPool = field(
+        default_factory=lambda: ConnectionPool(
+            maxsize=setting.pool_maxsize, idle_timeout=setting.pool_idle_timeout
+        ),
+        repr=False,
+    )
+    token_store: TokenStore | None = field(
+        default_factory=default_token_store, repr=False
+    )
+    cache: ResponseCache | None = field(
+        default_factory=default_response_cache, repr=False
+    )
+    # "use" serves fresh cached responses, "refresh" only stores new ones
+    cache_mode: Literal["use", "refresh", "off"] = "use"
+    scheduler: RequestScheduler = field(default_factory=RequestScheduler, repr=False)
+    transfer_stats: TransferStats = field(default_factory=TransferStats, repr=False)
+    # authorized on first use, unless a cached token is still valid
+    auth: AuthResponse | None = field(init=False, default=None)
+    _auth_lock: threading.Lock = field(
+        init=False, repr=False, default_factory=threading.Lock
+    )
+
+    def __post_init__(self):
+        self.auth = load_cached_auth(self.token_store, self.credentials.client_id)
+
+    def reauthorize(self, stale_token: str | None = None):
+        with self._auth_lock:
+            # another thread may have refreshed the token while we waited
+            if (
+                stale_token is not None
+                and self.auth is not None
+                and self.auth.access_token != stale_token
+            ):
+                return
+            self.auth = authorize(self.pool, self.credentials)
+            if self.token_store is not None:
+                self.token_store.save(
+                    self.credentials.client_id, identity_host(), asdict(self.auth)
+                )
 
-    def reauthorize(self):
-        self.auth = authorize()
+    def host_for(self, subdomain: str) -> str:
+        if setting.api_url:
+            return setting.api_url
+        return self.domain if not subdomain else f"{subdomain}.{self.domain}"
+
+    def reset_stats(self):
+        """
+        Count cache, transfer and scheduler statistics afresh, e.g. for each
+        command run by a long-lived process.
+        """
+        self.transfer_stats = TransferStats()
+        self.scheduler.stats = SchedulerStats()
+        if self.cache is not None:
+            from jibble_export.cache import CacheStats
+
+            self.cache.stats = CacheStats()
+
+    def ensure_authorized(self) -> AuthResponse:
+        auth = self.auth
+        if auth is None:
+            # no token to go stale, so concurrent first requests authorize once
+            self.reauthorize(stale_token="")
+        elif auth.has_expired(leeway=setting.token_refresh_leeway):
+            logging.info("Authorization token is about to expire, refreshing...")
+            self.reauthorize(stale_token=auth.access_token)
+        assert self.auth is not None
+        return self.auth
+
+    @contextmanager
+    def request(
+        self,
+        base_url: str,
+        method: str,
+        url: str,
+        body: str,
+        headers: dict[str, str],
+        idempotent: bool | None = None,
+        preload: bool = False,
+    ) -> Iterator[DecodedResponse]:
+        """
+        Send an authorized request and yield the response, before its body
+        is read unless `preload`. Compressed bodies are decoded as they are
+        read.
+
+        The token is refreshed once on a 401. Requests wait for their turn
+        in `scheduler`, and transient failures are retried as it decides,
+        transport errors (including while preloading the body) only when the
+        request is `idempotent`, by default when its method is.
+        """
+        if idempotent is None:
+            idempotent = method in IDEMPOTENT_METHODS
+        self.ensure_authorized()
+        if setting.compression:
+            headers = headers | {"Accept-Encoding": ACCEPT_ENCODING}
+        path = url.partition("?")[0]
+        with span("http", method=method, host=base_url, path=path) as current:
+            refreshed = False
+            for attempt in itertools.count(1):
+                if (wait := self.scheduler.reserve(base_url)) > 0:
+                    time.sleep(wait)
+                assert self.auth is not None
+                token = self.auth.access_token
+                authorized = headers | {"Authorization": f"Bearer {token}"}
+                try:
+                    with ExitStack() as stack:
+                        res = stack.enter_context(
+                            self.pool.urlopen(base_url, method, url, body, authorized)
+                        )
+                        decoded = DecodedResponse(res, self.transfer_stats)
+                        if preload:
+                            with span("download") as download:
+                                download.set(bytes=decoded.preload())
+                        # errors so far close the connection, the rest is ours
+                        stack = stack.pop_all()
+                except RETRYABLE_ERRORS as exc:
+                    delay = self.scheduler.retry_delay(
+                        base_url, attempt, idempotent, error=exc
+                    )
+                    if delay is None:
+                        raise
+                    time.sleep(delay)
+                    continue
+                with stack:
+                    if res.status == HTTPStatus.UNAUTHORIZED and not refreshed:
+                        res.read()
+                        logging.info(
+                            "Got 401 Unauthorized, refreshing token and retrying once"
+                        )
+                        self.reauthorize(stale_token=token)
+                        refreshed = True
+                        continue
+                    delay = self.scheduler.retry_delay(
+                        base_url,
+                        attempt,
+                        idempotent,
+                        status=res.status,
+                        retry_after=res.getheader("Retry-After"),
+                    )
+                    if delay is None:
+                        current.set(status=res.status, attempts=attempt)
+                        yield decoded
+                        return
+                    res.read()
+                time.sleep(delay)
+
+    def send(
+        self,
+        base_url: str,
+        method: str,
+        url: str,
+        body: str,
+        headers: dict[str, str],
+        idempotent: bool | None = None,
+    ) -> tuple[DecodedResponse, bytes]:
+        with self.request(
+            base_url, method, url, body, headers, idempotent, preload=True
+        ) as res:
+            data = res.read()
+        return res, data
 
     def get[T](
         self,
@@ -97,35 +437,187 @@ class AuthorizedJibbleClient:
         params: dict[str, str],
         response_model: type[T],
         status: HTTPStatus,
+        cache_ttl: float | None = None,
     ) -> T:
+        """
+        GET `relative_path` on `subdomain`. Pass `cache_ttl` (seconds) to
+        allow the response to be served from, and stored in, the response
+        cache.
+        """
         assert relative_path.startswith("/"), "`relative_path` must start with '/'`"
-        if self.auth.has_expired():
-            expired_at = self.auth.generated_at + self.auth.expires_in
-            raise AuthorizationExpired(
-                f"Authorization token expired {time.monotonic() - expired_at} seconds ago. Please generate a new one!"
-            )
-        base_url = self.domain if not subdomain else f"{subdomain}.{self.domain}"
+        base_url = self.host_for(subdomain)
+        relative_path = with_query(relative_path, params)
+        return self.get_url(base_url, relative_path, response_model, status, cache_ttl)
+
+    def get_url[T](
+        self,
+        base_url: str,
+        url: str,
+        response_model: type[T],
+        status: HTTPStatus,
+        cache_ttl: float | None = None,
+    ) -> T:
         logging.debug("base_url = %s" % base_url)
-        conn = http.client.HTTPSConnection(base_url)
+        cache_key = None
+        if cache_ttl and self.cache is not None and self.cache_mode != "off":
+            from jibble_export.cache import normalize_url
+
+            cache_key = self.cache.key(
+                self.credentials.client_id, base_url, normalize_url(url)
+            )
+            if self.cache_mode == "use":
+                cached = self.cache.get(cache_key)
+                if cached is not None:
+                    with span("decode", model=response_model.__name__, cached=True):
+                        return decode_response(cached, response_model)
         payload = ""
         headers = {
             "Content-Type": "application/json",
-            "Authorization": f"Bearer {self.auth.access_token}",
         }
-        if params:
-            relative_path += "?" + "&".join(
-                f"{key}={quote_plus(value)}" for key, value in params.items()
+        logging.debug("relative path = %s" % url)
+        res, raw = self.send(base_url, "GET", url, payload, headers)
+        self.assert_status(res, status, raw)
+        if cache_key is not None and self.cache is not None and cache_ttl:
+            self.cache.put(cache_key, raw, cache_ttl)
+        with span("decode", model=response_model.__name__):
+            return decode_response(raw, response_model)
+
+    def stream[T](
+        self,
+        *,
+        subdomain: str,
+        relative_path: str,
+        params: dict[str, str],
+        item_model: type[T],
+        status: HTTPStatus,
+        key: str = "value",
+        chunk_size: int = 2**16,
+    ) -> Iterator[T]:
+        """
+        GET a collection and yield the items of its `key` array, validated
+        as `item_model`, while the body is still being received.
+
+        Only one item is decoded at a time, so memory stays bounded by the
+        largest item instead of the whole response. The response cache is
+        not used.
+        """
+        from jibble_export.streaming import iter_array_items
+
+        assert relative_path.startswith("/"), "`relative_path` must start with '/'`"
+        base_url = self.host_for(subdomain)
+        url = with_query(relative_path, params)
+        logging.debug("streaming %s%s" % (base_url, url))
+        adapter = type_adapter(item_model)
+        headers = {"Content-Type": "application/json"}
+        with self.request(base_url, "GET", url, "", headers) as res:
+            if res.status != int(status):
+                self.assert_status(res, status, res.read())
+            chunks = iter(partial(res.read, chunk_size), b"")
+            for item in iter_array_items(chunks, key):
+                yield adapter.validate_python(item)
+            # read up to the end, so that the connection can be reused
+            res.read()
+
+    def iter_pages[T: ODataCollection](
+        self,
+        *,
+        subdomain: str,
+        relative_path: str,
+        params: dict[str, str],
+        response_model: type[T],
+        status: HTTPStatus,
+        page_size: int | None = None,
+        max_workers: int | None = None,
+        cache_ttl: float | None = None,
+    ) -> Iterator[T]:
+        """
+        Lazily yield every page of an OData collection, in order.
+
+        When the first page carries `@odata.count`, the remaining pages are
+        fetched in parallel with `$top`/`$skip`, keeping at most
+        `max_workers` pages in flight. Otherwise `@odata.nextLink` is
+        followed page by page.
+        """
+        page_size = page_size if page_size is not None else setting.page_size
+        max_workers = max_workers or setting.page_workers
+        params = params | {"$count": "true"}
+        if page_size:
+            params["$top"] = str(page_size)
+        first = self.get(
+            subdomain=subdomain,
+            relative_path=relative_path,
+            params=params,
+            response_model=response_model,
+            status=status,
+            cache_ttl=cache_ttl,
+        )
+        yield first
+
+        fetched = len(first.value)
+        if first.odata_next_link is None and fetched >= first.odata_count:
+            return
+        if fetched == 0:
+            logging.warning(
+                "Empty first page but @odata.count=%s for %s",
+                first.odata_count,
+                relative_path,
+            )
+            return
+        if page_size is None or (fetched < page_size and first.odata_next_link is None):
+            page_size = fetched
+        if fetched < page_size:
+            # the server decided on its own page size, follow its links
+            next_link = first.odata_next_link
+            while next_link is not None:
+                parts = urlsplit(next_link)
+                url = parts.path + (f"?{parts.query}" if parts.query else "")
+                host = parts.netloc if parts.netloc and not setting.api_url else None
+                page = self.get_url(
+                    host or self.host_for(subdomain),
+                    url,
+                    response_model,
+                    status,
+                    cache_ttl,
+                )
+                yield page
+                next_link = page.odata_next_link
+            return
+
+        logging.debug(
+            "Fetching %s items of %s in pages of %s",
+            first.odata_count,
+            relative_path,
+            page_size,
+        )
+
+        def fetch(skip: int) -> T:
+            return self.get(
+                subdomain=subdomain,
+                relative_path=relative_path,
+                params=params | {"$top": str(page_size), "$skip": str(skip)},
+                response_model=response_model,
+                status=status,
+                cache_ttl=cache_ttl,
             )
-        logging.debug("relative path = %s" % relative_path)
-        conn.request("GET", relative_path, payload, headers)
-        res = conn.getresponse()
-        self.assert_status(res, status)
-        data = res.read().decode()
-        logging.debug("decoded response = %s" % data)
-        if isinstance(None, response_model):
-            return response_model()
-        response = response_model(**json.loads(data))
-        return response
+
+        from concurrent.futures import ThreadPoolExecutor
+
+        skips = iter(range(fetched, first.odata_count, page_size))
+
+        def submit(skip: int) -> Future[T]:
+            # pages are traced under the span iterating them
+            context = copy_context()
+            return executor.submit(lambda: context.run(fetch, skip))
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            in_flight: deque[Future[T]] = deque(
+                submit(skip) for _, skip in zip(range(max_workers), skips)
+            )
+            while in_flight:
+                page = in_flight.popleft().result()
+                if (skip := next(skips, None)) is not None:
+                    in_flight.append(submit(skip))
+                yield page
 
     def post[T](
         self,
@@ -135,44 +627,67 @@ class AuthorizedJibbleClient:
         payload: dict[str, Any],
         response_model: type[T],
         status: HTTPStatus,
+        idempotent: bool = False,
     ) -> T:
-        if self.auth.has_expired():
-            raise AuthorizationExpired()
-        base_url = self.domain if not subdomain else f"{subdomain}.{self.domain}"
+        """
+        POST `payload` as JSON. Pass `idempotent` when sending it twice is
+        harmless, e.g. because it carries its own id, so that it is retried
+        on transient failures too.
+        """
+        base_url = self.host_for(subdomain)
         logging.debug("base_url = %s" % base_url)
-        conn = http.client.HTTPSConnection(base_url)
         body = json.dumps(payload)
         logging.debug("body = %s" % body)
         headers = {
             "Accept": "application/json",
             "Content-Type": "application/json",
-            "Authorization": f"Bearer {self.auth.access_token}",
         }
         logging.debug("relative path = %s" % relative_path)
-        conn.request("POST", relative_path, body, headers)
-        res = conn.getresponse()
-        self.assert_status(res, status)
-        data = res.read().decode()
-        logging.debug("decoded response = %s" % data)
-        if isinstance(None, response_model):
-            return response_model()
-        response = response_model(**json.loads(data))
-        return response
+        res, raw = self.send(base_url, "POST", relative_path, body, headers, idempotent)
+        self.assert_status(res, status, raw)
+        with span("decode", model=response_model.__name__):
+            return decode_response(raw, response_model)
 
     def assert_status(
-        self, response: http.client.HTTPResponse, expected_status: HTTPStatus
+        self,
+        response: DecodedResponse,
+        expected_status: HTTPStatus,
+        msg: bytes | str,
     ):
-        if response.status != int(expected_status):
-            msg = response.read().decode()
-            logging.error(
-                "Expected status %s, got status %s",
-                expected_status,
-                response.status,
-            )
-            logging.debug("Message: %s", msg)
-            raise ValueError(
-                f"Expected status {expected_status}, got status {response.status}"
-            )
+        check_status(response.status, expected_status, msg)
+
+
+_client: AuthorizedJibbleClient | None = None
+_client_lock = threading.Lock()
+
+
+def set_client(client: AuthorizedJibbleClient | None):
+    """
+    Make `client` the one used by the features, e.g. to export for another
+    organisation. `None` goes back to a client from the settings.
+    """
+    global _client
+    with _client_lock:
+        previous, _client = _client, client
+    if previous is not None and previous is not client:
+        previous.pool.close()
+
+
+def get_client() -> AuthorizedJibbleClient:
+    """
+    The shared client, created on first use. Creating it does not touch
+    the network, authorization waits for the first request.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = AuthorizedJibbleClient()
+    return _client
 
 
-client = AuthorizedJibbleClient()
+def __getattr__(name: str) -> Any:
+    # `from jibble_export.client import client` keeps working
+    if name == "client":
+        return get_client()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
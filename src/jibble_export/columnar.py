@@ -0,0 +1,98 @@
+from pathlib import Path
+from typing import Literal, cast, get_args
+import logging
+
+import pandas as pd
+
+from jibble_export.tracing import traced
+
+ExportFormat = Literal["xlsx", "parquet", "arrow", "csv"]
+PYARROW_HINT = (
+    "Parquet and Arrow exports need pyarrow, install the `columnar` extra"
+    " with `uv sync --extra columnar` or `uv pip install 'jibble-export[columnar]'`"
+)
+
+
+def export_format(value: str) -> ExportFormat:
+    if value not in get_args(ExportFormat):
+        raise ValueError(f"Unsupported export format {value!r}")
+    return cast(ExportFormat, value)
+
+
+def _pyarrow():
+    try:
+        import pyarrow as pa
+    except ImportError as exc:
+        raise ImportError(PYARROW_HINT) from exc
+    return pa
+
+
+def _parquet():
+    try:
+        import pyarrow.parquet as pq
+    except ImportError as exc:
+        raise ImportError(PYARROW_HINT) from exc
+    return pq
+
+
+def records_table(records: pd.DataFrame):
+    pa = _pyarrow()
+    schema = pa.schema(
+        [
+            ("member_id", pa.string()),
+            ("name", pa.string()),
+            ("date", pa.date32()),
+            ("tracked_time", pa.duration("us")),
+            ("status", pa.string()),
+            ("holiday", pa.string()),
+            ("timeoff", pa.string()),
+        ]
+    )
+    return pa.Table.from_pandas(records, schema=schema, preserve_index=False)
+
+
+def write_parquet(records: pd.DataFrame, filename: str):
+    pq = _parquet()
+    pq.write_table(records_table(records), filename)
+
+
+def write_arrow(records: pd.DataFrame, filename: str):
+    pa = _pyarrow()
+    table = records_table(records)
+    with (
+        pa.OSFile(filename, "wb") as sink,
+        pa.ipc.new_file(sink, table.schema) as writer,
+    ):
+        writer.write_table(table)
+
+
+def write_csv(records: pd.DataFrame, filename: str, chunk_rows: int = 2**16):
+    """
+    Stream the records to CSV in blocks of `chunk_rows`, so the text of the
+    whole file is never held in memory. Tracked time is written in seconds.
+    """
+    with open(filename, "w", newline="", encoding="utf-8") as fh:
+        for start in range(0, max(len(records), 1), chunk_rows):
+            chunk = records.iloc[start : start + chunk_rows]
+            chunk = chunk.assign(
+                date=chunk["date"].dt.strftime("%Y-%m-%d"),
+                tracked_time=chunk["tracked_time"].dt.total_seconds(),
+            )
+            chunk.to_csv(fh, header=start == 0, index=False)
+
+
+@traced("export_attendance_records")
+def export_attendance_records(
+    records: pd.DataFrame, filename: str, format: ExportFormat
+):
+    Path(filename).parent.mkdir(parents=True, exist_ok=True)
+    match format:
+        case "parquet":
+            write_parquet(records, filename)
+        case "arrow":
+            write_arrow(records, filename)
+        case "csv":
+            write_csv(records, filename)
+        case _:
+            raise ValueError(f"Unsupported columnar format {format!r}")
+    logging.info(f"Records successfully exported to {Path(filename).resolve()}")
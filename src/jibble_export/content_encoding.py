@@ -0,0 +1,213 @@
+from dataclasses import dataclass, field
+from typing import Protocol
+import http.client
+import threading
+import time
+import zlib
+
+try:
+    from compression import zstd
+
+    HAVE_ZSTD = True
+except ImportError:  # Python < 3.14, or built without libzstd
+    HAVE_ZSTD = False
+
+
+SUPPORTED_ENCODINGS = ("zstd", "gzip", "deflate") if HAVE_ZSTD else ("gzip", "deflate")
+ACCEPT_ENCODING = ", ".join(SUPPORTED_ENCODINGS)
+
+
+@dataclass
+class TransferStats:
+    """
+    Response body bytes as received on the wire and after decoding, and the
+    time spent decompressing them, summed over all responses.
+    """
+
+    responses: int = 0
+    compressed: int = 0
+    wire_bytes: int = 0
+    body_bytes: int = 0
+    decompress_seconds: float = 0.0
+    _lock: threading.Lock = field(
+        init=False, repr=False, default_factory=threading.Lock
+    )
+
+    def record(self, wire_bytes: int, body_bytes: int, seconds: float):
+        with self._lock:
+            self.wire_bytes += wire_bytes
+            self.body_bytes += body_bytes
+            self.decompress_seconds += seconds
+
+    def finish(self, compressed: bool):
+        with self._lock:
+            self.responses += 1
+            self.compressed += compressed
+
+    @property
+    def ratio(self) -> float:
+        return self.body_bytes / self.wire_bytes if self.wire_bytes else 1.0
+
+
+class Decoder(Protocol):
+    def decompress(self, data: bytes) -> bytes: ...
+
+    def flush(self) -> bytes: ...
+
+
+class ZlibDecoder:
+    """
+    gzip, or deflate. The latter is meant to be zlib wrapped, but some
+    servers send a raw deflate stream, which is detected on the first chunk.
+    """
+
+    def __init__(self, encoding: str):
+        self.raw_fallback = encoding == "deflate"
+        wbits = zlib.MAX_WBITS | (16 if encoding == "gzip" else 0)
+        self._decompressor = zlib.decompressobj(wbits)
+
+    def decompress(self, data: bytes) -> bytes:
+        try:
+            result = self._decompressor.decompress(data)
+        except zlib.error:
+            if not self.raw_fallback:
+                raise
+            self.raw_fallback = False
+            self._decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+            return self._decompressor.decompress(data)
+        if data:
+            self.raw_fallback = False
+        return result
+
+    def flush(self) -> bytes:
+        result = self._decompressor.flush()
+        if not self._decompressor.eof:
+            raise ValueError("Truncated compressed response body")
+        return result
+
+
+class ZstdDecoder:
+    """
+    zstd, possibly made of several frames.
+    """
+
+    def __init__(self):
+        self._decompressor = zstd.ZstdDecompressor()
+        self._in_frame = False
+
+    def decompress(self, data: bytes) -> bytes:
+        parts = []
+        while data:
+            self._in_frame = True
+            parts.append(self._decompressor.decompress(data))
+            if not self._decompressor.eof:
+                break
+            data = self._decompressor.unused_data
+            self._decompressor = zstd.ZstdDecompressor()
+            self._in_frame = False
+        return b"".join(parts)
+
+    def flush(self) -> bytes:
+        if self._in_frame:
+            raise ValueError("Truncated compressed response body")
+        return b""
+
+
+def content_encodings(header: str | None) -> list[str]:
+    """
+    The codings of a Content-Encoding header, in the order they were
+    applied. "identity" is dropped.
+    """
+    if not header:
+        return []
+    encodings = [part.strip().lower() for part in header.split(",")]
+    return [encoding for encoding in encodings if encoding and encoding != "identity"]
+
+
+def decoder_for(encoding: str) -> Decoder:
+    if encoding in ("gzip", "x-gzip"):
+        return ZlibDecoder("gzip")
+    if encoding == "deflate":
+        return ZlibDecoder("deflate")
+    if encoding == "zstd" and HAVE_ZSTD:
+        return ZstdDecoder()
+    raise ValueError(f"Unsupported Content-Encoding {encoding!r}")
+
+
+class BodyDecoder:
+    """
+    Incrementally undo the Content-Encoding of a body, recording what went
+    through it in `stats`.
+    """
+
+    def __init__(self, content_encoding: str | None, stats: TransferStats):
+        # codings are undone in the reverse order of application
+        encodings = content_encodings(content_encoding)
+        self.decoders = [decoder_for(encoding) for encoding in reversed(encodings)]
+        self.stats = stats
+        self.finished = False
+        self._wire_bytes = 0
+
+    def feed(self, data: bytes, final: bool = False) -> bytes:
+        start = time.perf_counter()
+        self._wire_bytes += len(data)
+        body = data
+        for decoder in self.decoders:
+            body = decoder.decompress(body)
+            # bodiless responses (HEAD, 204, 304) may still name an encoding
+            if final and self._wire_bytes:
+                body += decoder.flush()
+        seconds = time.perf_counter() - start if self.decoders else 0.0
+        self.stats.record(len(data), len(body), seconds)
+        if final and not self.finished:
+            self.finished = True
+            self.stats.finish(compressed=bool(self.decoders))
+        return body
+
+
+def decode_body(
+    data: bytes, content_encoding: str | None, stats: TransferStats
+) -> bytes:
+    return BodyDecoder(content_encoding, stats).feed(data, final=True)
+
+
+class DecodedResponse:
+    """
+    An `http.client.HTTPResponse` whose body is decoded while it is read,
+    so `read(amt)` can be used to stream a compressed body.
+    """
+
+    def __init__(self, response: http.client.HTTPResponse, stats: TransferStats):
+        self.response = response
+        self.status = response.status
+        self.reason = response.reason
+        self._body = BodyDecoder(response.getheader("Content-Encoding"), stats)
+        self._preloaded = b""
+
+    def preload(self) -> int:
+        """
+        Read the whole body now, for `read` to return it later. Returns its
+        decoded length.
+        """
+        self._preloaded = self.read()
+        return len(self._preloaded)
+
+    def getheader(self, name: str, default: str | None = None) -> str | None:
+        return self.response.getheader(name, default)
+
+    def read(self, amt: int | None = None) -> bytes:
+        """
+        Read and decode up to `amt` bytes of the wire body, or all of it.
+        The decoded result may be longer or shorter than `amt`, but is only
+        empty at the end of the body.
+        """
+        if self._preloaded:
+            data, self._preloaded = self._preloaded, b""
+            return data
+        while not self._body.finished:
+            data = self.response.read() if amt is None else self.response.read(amt)
+            final = amt is None or not data
+            body = self._body.feed(data, final=final)
+            if body or final:
+                return body
+        return b""
@@ -0,0 +1,259 @@
+from collections.abc import Callable
+from dataclasses import fields
+from hashlib import sha256
+from pathlib import Path
+from typing import Any
+import hmac
+import json
+import logging
+import os
+import signal
+import socket
+import socketserver
+import sys
+import threading
+
+from jibble_export.settings import Settings, setting
+
+# seconds to wait for a running daemon to accept a connection
+CONNECT_TIMEOUT = 1.0
+LOG_FORMAT = "%(asctime)s - %(levelname)s - %(name)s - %(message)s"
+LOG_DATEFMT = "%Y-%m-%d %H:%M:%S"
+
+
+class DaemonError(Exception): ...
+
+
+def supported() -> bool:
+    # Unix domain sockets are missing on some platforms, notably Windows
+    return hasattr(socket, "AF_UNIX")
+
+
+def socket_path() -> Path:
+    return setting.daemon_socket or setting.cache_dir / "daemon.sock"
+
+
+def settings_digest(key: bytes, settings: Settings = setting) -> str:
+    """
+    Fingerprint of the effective settings, credentials included, as read
+    from the environment and `.env` of the process.
+
+    Keyed with the random key of the daemon, so that the digest of the
+    credentials cannot be checked against guesses without it.
+    """
+    values = {
+        field.name: str(getattr(settings, field.name)) for field in fields(settings)
+    }
+    return hmac.new(
+        key, json.dumps(values, sort_keys=True).encode(), sha256
+    ).hexdigest()
+
+
+def call(argv: list[str], path: Path | None = None) -> bool:
+    """
+    Run a `jibble` command line in the running daemon, printing its log to
+    stderr as it goes.
+
+    Returns False, without running anything, when no daemon is listening or
+    it runs with other settings than this process, e.g. the credentials of
+    another organisation, so that the caller can run the command itself.
+    Raises DaemonError when the command fails in the daemon.
+    """
+    if not supported():
+        return False
+    path = path or socket_path()
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(CONNECT_TIMEOUT)
+        try:
+            sock.connect(str(path))
+        except OSError:
+            # no socket, or a stale one left behind by a daemon that died
+            return False
+        sock.settimeout(None)
+        with sock.makefile("rb") as replies:
+            try:
+                key = bytes.fromhex(json.loads(replies.readline())["key"])
+            except ValueError, KeyError, TypeError:
+                raise DaemonError("The daemon did not send its key")
+            request = {
+                "argv": argv,
+                "cwd": os.getcwd(),
+                "settings": settings_digest(key),
+            }
+            sock.sendall(json.dumps(request).encode() + b"\n")
+            for line in replies:
+                reply = json.loads(line)
+                if "log" in reply:
+                    print(reply["log"], file=sys.stderr)
+                elif "error" in reply:
+                    raise DaemonError(reply["error"])
+                elif "fallback" in reply:
+                    # logging is not set up before the client is imported
+                    print(
+                        f"{reply['fallback']}, running in this process", file=sys.stderr
+                    )
+                    return False
+                else:
+                    return True
+    raise DaemonError("The daemon closed the connection before the command finished")
+
+
+class ForwardingHandler(logging.Handler):
+    """
+    Log handler sending every record to the client of the current command.
+    """
+
+    def __init__(self, send: Callable[[dict[str, Any]], None]):
+        super().__init__()
+        self.send = send
+        self.setFormatter(logging.Formatter(LOG_FORMAT, LOG_DATEFMT))
+
+    def emit(self, record: logging.LogRecord):
+        try:
+            self.send({"log": self.format(record)})
+        except OSError:
+            # the client hung up, the command carries on regardless
+            pass
+
+
+class CommandHandler(socketserver.StreamRequestHandler):
+    server: JibbleDaemon
+
+    def setup(self):
+        super().setup()
+        self._write_lock = threading.Lock()
+
+    def send(self, reply: dict[str, Any]):
+        # records can be logged from worker threads of the command
+        with self._write_lock:
+            self.wfile.write(json.dumps(reply).encode() + b"\n")
+            self.wfile.flush()
+
+    def handle(self):
+        try:
+            self.send({"key": self.server.key.hex()})
+            line = self.rfile.readline()
+        except OSError:
+            # probed by `jibble serve`, or a client that gave up
+            return
+        if not line:
+            return
+        try:
+            request = json.loads(line)
+            argv, cwd = list(request["argv"]), str(request["cwd"])
+        except ValueError, KeyError, TypeError:
+            self.send({"error": "Malformed request"})
+            return
+        digest = settings_digest(self.server.key)
+        if not hmac.compare_digest(str(request.get("settings")), digest):
+            self.send({"fallback": "The daemon runs with other JIBBLE_* settings"})
+            return
+        reply = self.server.run(argv, cwd, self.send)
+        try:
+            self.send(reply)
+        except OSError:
+            logging.warning("Client left before `jibble %s` finished", " ".join(argv))
+
+
+def run_command(
+    argv: list[str], cwd: str, send: Callable[[dict[str, Any]], None]
+) -> dict[str, Any]:
+    """
+    Parse and run a command line as the CLI would, resolving relative
+    paths against the client's working directory, forwarding the log to
+    the client.
+    """
+    from jibble_export.cli.entrypoint import build_parser
+    from jibble_export.client import get_client
+
+    parser = build_parser()
+    try:
+        args = parser.parse_args(argv)
+    except SystemExit:
+        return {"error": f"Invalid arguments: {' '.join(argv)}"}
+    if not getattr(args, "daemon", False):
+        return {"error": f"`jibble {' '.join(argv)}` cannot run in the daemon"}
+    logging.info("Running `jibble %s` in %s", " ".join(argv), cwd)
+    args.cwd = Path(cwd)
+    get_client().reset_stats()
+    handler = ForwardingHandler(send)
+    root = logging.getLogger()
+    root.addHandler(handler)
+    try:
+        args.func(args)
+    except Exception as exc:
+        logging.debug("`jibble %s` failed", " ".join(argv), exc_info=True)
+        return {"error": str(exc)}
+    finally:
+        root.removeHandler(handler)
+    return {"ok": True}
+
+
+if supported():
+
+    class JibbleDaemon(socketserver.ThreadingUnixStreamServer):
+        """
+        Runs commands sent over a Unix socket, one at a time: they share the
+        client, whose cache mode they set, and the log handlers.
+        """
+
+        daemon_threads = True
+
+        def __init__(self, path: Path):
+            # only the owner may connect, and so run commands as them
+            umask = os.umask(0o177)
+            try:
+                super().__init__(str(path), CommandHandler)
+            finally:
+                os.umask(umask)
+            self.path = path
+            self.key = os.urandom(32)
+            self.lock = threading.Lock()
+
+        def run(
+            self, argv: list[str], cwd: str, send: Callable[[dict[str, Any]], None]
+        ) -> dict[str, Any]:
+            with self.lock:
+                return run_command(argv, cwd, send)
+
+
+def warm_up():
+    """
+    Import what exports need and authorize, so that the first command is as
+    quick as the following ones.
+    """
+    from jibble_export.client import get_client
+    import jibble_export.features.reports  # noqa: F401
+    import jibble_export.formatter  # noqa: F401
+
+    get_client().ensure_authorized()
+
+
+def serve(path: Path | None = None):
+    """
+    Serve `jibble` commands on a Unix socket until interrupted.
+    """
+    if not supported():
+        raise DaemonError("`jibble serve` needs Unix domain sockets (AF_UNIX)")
+    path = path or socket_path()
+    if path.exists():
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            try:
+                sock.connect(str(path))
+            except OSError:
+                logging.info("Removing stale socket %s", path)
+                path.unlink()
+            else:
+                raise DaemonError(f"A daemon is already listening on {path}")
+    path.parent.mkdir(parents=True, exist_ok=True, mode=0o700)
+    warm_up()
+    # stop cleanly, removing the socket, when stopped by a service manager
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    with JibbleDaemon(path) as server:
+        logging.info("Listening on %s", path)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            path.unlink(missing_ok=True)
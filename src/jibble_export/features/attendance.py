@@ -1,28 +1,269 @@
-from jibble_export.models.duration import Duration
+from collections.abc import Callable, Iterator, Sequence
+from dataclasses import dataclass, replace
+from functools import partial
+from typing import TYPE_CHECKING, Literal, Self
+from uuid import UUID
+from jibble_export.models.duration import ChunkFrequency, Duration
 import http
-from jibble_export.client import client
+import logging
+from jibble_export.cache import ttl_for_period
+from jibble_export.client import get_client
+from jibble_export.features.people import any_of, iter_group_members
+from jibble_export.models.compact import CompactTrackedTime
 from jibble_export.models.responses import (
+    MemberValue,
+    MinimalMemberValue,
+    MinimalTrackedTimeReport,
     TrackedTimeReport,
 )
+from jibble_export.settings import setting
+from jibble_export.tracing import span
+from jibble_export.utils import run_concurrently
 
+if TYPE_CHECKING:
+    from jibble_export.async_client import AsyncJibbleClient
 
-def get_time_attendance(duration: Duration) -> TrackedTimeReport:
+
+AttendanceFields = Literal["full", "minimal"]
+
+
+@dataclass(frozen=True)
+class AttendanceQuery:
+    """
+    What the server puts in the tracked time report: only the given people,
+    when any, and with `minimal` fields only what the export reads, i.e.
+    member names and the tracked time of each day, without the `Subject` of
+    every day item.
+
+    The report cannot be filtered by group, `with_group_members` adds the
+    members of `group_ids` to `person_ids` first.
+    """
+
+    person_ids: tuple[UUID, ...] = ()
+    group_ids: tuple[UUID, ...] = ()
+    fields: AttendanceFields = "full"
+
+    def with_group_members(self) -> Self:
+        if not self.group_ids:
+            return self
+        members = [person.id for person in iter_group_members(self.group_ids)]
+        if not members:
+            # an empty filter would export the whole organization
+            raise ValueError(f"No person found in the groups {self.group_ids}!")
+        person_ids = tuple(dict.fromkeys([*self.person_ids, *members]))
+        return replace(self, person_ids=person_ids, group_ids=())
+
+    def params(self) -> dict[str, str]:
+        if self.group_ids:
+            raise ValueError("Resolve the groups with `with_group_members` first")
+        params = {}
+        if self.fields == "minimal":
+            params["$select"] = "id,items,subject"
+            params["$expand"] = (
+                "Subject($select=entityType,name),Items($select=id,trackedTime)"
+            )
+        else:
+            params["$expand"] = "Subject,Items($expand=Subject)"
+        if self.person_ids:
+            params["$filter"] = any_of("personId", self.person_ids)
+        return params
+
+
+def time_attendance_params(
+    duration: Duration, query: AttendanceQuery | None = None
+) -> dict[str, str]:
     from_date, to_date = duration.start_date, duration.end_date
     assert to_date >= from_date, "to_date cannot be older than from_date"
-    resp = client.get(
+    return {
+        "from": from_date.strftime("%Y-%m-%d"),
+        "to": to_date.strftime("%Y-%m-%d"),
+        "groupBy": "Member",
+        "subGroupBy": "Date",
+    } | (query or AttendanceQuery()).params()
+
+
+def report_model(
+    query: AttendanceQuery | None,
+) -> type[TrackedTimeReport | MinimalTrackedTimeReport]:
+    """
+    Model of the report as projected by `query`. Only minimal reports are
+    validated against `MinimalTrackedTimeReport`, anything else must carry
+    every field of `TrackedTimeReport`.
+    """
+    if query is not None and query.fields == "minimal":
+        return MinimalTrackedTimeReport
+    return TrackedTimeReport
+
+
+def as_report(
+    report: TrackedTimeReport | MinimalTrackedTimeReport,
+) -> TrackedTimeReport:
+    if isinstance(report, MinimalTrackedTimeReport):
+        return report.to_report()
+    return report
+
+
+def fetch_time_attendance(
+    duration: Duration, query: AttendanceQuery | None = None
+) -> TrackedTimeReport:
+    resp = get_client().get(
+        subdomain="time-attendance",
+        relative_path="/v1/TrackedTimeReport",
+        params=time_attendance_params(duration, query),
+        response_model=report_model(query),
+        status=http.HTTPStatus.OK,
+        cache_ttl=ttl_for_period(duration.end_date),
+    )
+    return as_report(resp)
+
+
+def iter_time_attendance(
+    duration: Duration, query: AttendanceQuery | None = None
+) -> Iterator[MemberValue]:
+    """
+    Yield the members of the tracked time report one at a time, as they are
+    received.
+    """
+    if query is not None and query.fields == "minimal":
+        members = get_client().stream(
+            subdomain="time-attendance",
+            relative_path="/v1/TrackedTimeReport",
+            params=time_attendance_params(duration, query),
+            item_model=MinimalMemberValue,
+            status=http.HTTPStatus.OK,
+        )
+        return (member.to_member_value() for member in members)
+    return get_client().stream(
+        subdomain="time-attendance",
+        relative_path="/v1/TrackedTimeReport",
+        params=time_attendance_params(duration, query),
+        item_model=MemberValue,
+        status=http.HTTPStatus.OK,
+    )
+
+
+def fetch_compact_time_attendance(
+    duration: Duration, stream: bool = False, query: AttendanceQuery | None = None
+) -> CompactTrackedTime:
+    if stream:
+        with span("stream"):
+            return CompactTrackedTime.from_members(
+                iter_time_attendance(duration, query)
+            )
+    raw = get_client().get(
+        subdomain="time-attendance",
+        relative_path="/v1/TrackedTimeReport",
+        params=time_attendance_params(duration, query),
+        response_model=bytes,
+        status=http.HTTPStatus.OK,
+        cache_ttl=ttl_for_period(duration.end_date),
+    )
+    return CompactTrackedTime.from_json(raw)
+
+
+def merge_time_attendance(reports: Sequence[TrackedTimeReport]) -> TrackedTimeReport:
+    """
+    Merge reports of consecutive durations into the report of their union.
+
+    Day items are concatenated in chunk order and member totals are summed.
+    Members keep the order in which they first appear.
+    """
+    members: dict[UUID, MemberValue] = {}
+    for report in reports:
+        for member in report.value:
+            assert isinstance(member, MemberValue)
+            merged = members.get(member.id)
+            if merged is None:
+                members[member.id] = member.model_copy(
+                    update={"items": list(member.items or [])}
+                )
+                continue
+            assert merged.items is not None
+            merged.items.extend(member.items or [])
+            merged.time += member.time
+            merged.trackedTime += member.trackedTime
+            merged.billableAmount += member.billableAmount
+    return reports[0].model_copy(update={"value": list(members.values())})
+
+
+def get_time_attendance(
+    duration: Duration,
+    chunk: ChunkFrequency | None = None,
+    max_workers: int | None = None,
+    query: AttendanceQuery | None = None,
+) -> TrackedTimeReport:
+    """
+    Fetch the tracked time report of `duration`, filtered and projected by
+    `query` on the server.
+
+    Long durations are split by `chunk` (defaults to the `attendance_chunk`
+    setting) and the chunks are fetched concurrently, then merged.
+    """
+    reports = fetch_in_chunks(
+        partial(fetch_time_attendance, query=query), duration, chunk, max_workers
+    )
+    if len(reports) == 1:
+        return reports[0]
+    with span("merge", chunks=len(reports)):
+        return merge_time_attendance(reports)
+
+
+def get_compact_time_attendance(
+    duration: Duration,
+    chunk: ChunkFrequency | None = None,
+    max_workers: int | None = None,
+    stream: bool = False,
+    query: AttendanceQuery | None = None,
+) -> CompactTrackedTime:
+    """
+    `get_time_attendance`, parsed into a `CompactTrackedTime` instead of
+    pydantic models. With `stream`, members are parsed one by one off the
+    socket, so only one of them is ever held in memory.
+    """
+    reports = fetch_in_chunks(
+        partial(fetch_compact_time_attendance, stream=stream, query=query),
+        duration,
+        chunk,
+        max_workers,
+    )
+    if len(reports) == 1:
+        return reports[0]
+    with span("merge", chunks=len(reports)):
+        return CompactTrackedTime.concat(reports)
+
+
+def fetch_in_chunks[T](
+    fetch: Callable[[Duration], T],
+    duration: Duration,
+    chunk: ChunkFrequency | None = None,
+    max_workers: int | None = None,
+) -> list[T]:
+    chunk = chunk if chunk is not None else setting.attendance_chunk
+    chunks = duration.split(chunk) if chunk is not None else [duration]
+    if len(chunks) <= 1:
+        return [fetch(duration)]
+    logging.debug("Fetching %s in %s chunks of one %s", duration, len(chunks), chunk)
+    reports, _ = run_concurrently(
+        {f"{part.start_date}:{part.end_date}": partial(fetch, part) for part in chunks},
+        max_workers=max_workers or setting.attendance_workers,
+    )
+    return list(reports.values())
+
+
+async def aget_time_attendance(
+    duration: Duration,
+    *,
+    client: AsyncJibbleClient,
+    query: AttendanceQuery | None = None,
+) -> TrackedTimeReport:
+    resp = await client.get(
         subdomain="time-attendance",
         relative_path="/v1/TrackedTimeReport",
-        params={
-            "from": from_date.strftime("%Y-%m-%d"),
-            "to": to_date.strftime("%Y-%m-%d"),
-            "groupBy": "Member",
-            "subGroupBy": "Date",
-            "$expand": "Subject,Items($expand=Subject)",
-        },
-        response_model=TrackedTimeReport,
+        params=time_attendance_params(duration, query),
+        response_model=report_model(query),
         status=http.HTTPStatus.OK,
     )
-    return resp
+    return as_report(resp)
 
 
 if __name__ == "__main__":
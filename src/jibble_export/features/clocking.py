@@ -1,10 +1,14 @@
 import logging
 import http
 import datetime as dt
-from jibble_export.client import client
+from typing import TYPE_CHECKING, Any
+from jibble_export.client import get_client
 from pprint import pprint
 from uuid import uuid4
 
+if TYPE_CHECKING:
+    from jibble_export.async_client import AsyncJibbleClient
+
 
 def get_utc_offset() -> str:
     delta = dt.datetime.now().astimezone().utcoffset()
@@ -20,10 +24,12 @@ def get_utc_offset() -> str:
 UTC_OFFSET = get_utc_offset()
 
 
-def clock_in(*, auto_clock_out_after: dt.timedelta = dt.timedelta(0)) -> None:
+def clock_in_payload(
+    person_id: str, auto_clock_out_after: dt.timedelta = dt.timedelta(0)
+) -> tuple[dict[str, Any], str]:
     payload = {
         "type": "In",
-        "personId": client.auth.personId,
+        "personId": person_id,
         "clientType": "Web",
         "offset": UTC_OFFSET,
         "time": dt.datetime.now(dt.UTC).strftime("%Y-%m-%dT%H:%M:%S.000Z"),
@@ -43,36 +49,85 @@ def clock_in(*, auto_clock_out_after: dt.timedelta = dt.timedelta(0)) -> None:
             timespec="milliseconds"
         )
         success_msg += f" Auto clock out set after {auto_clock_out_after}!"
+    return payload, success_msg
+
+
+def clock_out_payload(person_id: str) -> dict[str, Any]:
+    return {
+        "type": "Out",
+        "personId": person_id,
+        "clientType": "Web",
+        "offset": UTC_OFFSET,
+        "platform": {
+            "deviceName": "Firefox",
+            "deviceModel": None,
+            "clientVersion": "147.0",
+            "os": "Linux",
+        },
+        "id": str(uuid4()),
+    }
+
+
+def clock_in(*, auto_clock_out_after: dt.timedelta = dt.timedelta(0)) -> None:
+    client = get_client()
+    auth = client.ensure_authorized()
+    payload, success_msg = clock_in_payload(auth.personId, auto_clock_out_after)
     resp = client.post(
         subdomain="time-tracking",
         relative_path="/v1/TimeEntries",
         payload=payload,
         response_model=type(None),
         status=http.HTTPStatus.CREATED,
+        # the entry carries its own id, so a retry cannot clock twice
+        idempotent=True,
     )
     logging.info(success_msg)
     return resp
 
 
 def clock_out() -> None:
+    client = get_client()
+    auth = client.ensure_authorized()
     resp = client.post(
         subdomain="time-tracking",
         relative_path="/v1/TimeEntries",
-        payload={
-            "type": "Out",
-            "personId": client.auth.personId,
-            "clientType": "Web",
-            "offset": UTC_OFFSET,
-            "platform": {
-                "deviceName": "Firefox",
-                "deviceModel": None,
-                "clientVersion": "147.0",
-                "os": "Linux",
-            },
-            "id": str(uuid4()),
-        },
+        payload=clock_out_payload(auth.personId),
+        response_model=type(None),
+        status=http.HTTPStatus.CREATED,
+        idempotent=True,
+    )
+    logging.info("Successfully Jibbled out!")
+    return resp
+
+
+async def aclock_in(
+    *,
+    auto_clock_out_after: dt.timedelta = dt.timedelta(0),
+    client: AsyncJibbleClient,
+) -> None:
+    auth = await client.ensure_authorized()
+    payload, success_msg = clock_in_payload(auth.personId, auto_clock_out_after)
+    resp = await client.post(
+        subdomain="time-tracking",
+        relative_path="/v1/TimeEntries",
+        payload=payload,
+        response_model=type(None),
+        status=http.HTTPStatus.CREATED,
+        idempotent=True,
+    )
+    logging.info(success_msg)
+    return resp
+
+
+async def aclock_out(*, client: AsyncJibbleClient) -> None:
+    auth = await client.ensure_authorized()
+    resp = await client.post(
+        subdomain="time-tracking",
+        relative_path="/v1/TimeEntries",
+        payload=clock_out_payload(auth.personId),
         response_model=type(None),
         status=http.HTTPStatus.CREATED,
+        idempotent=True,
     )
     logging.info("Successfully Jibbled out!")
     return resp
@@ -1,20 +1,30 @@
 import calendar
 import http
 import logging
+from collections.abc import Iterator
 from datetime import date
+from typing import TYPE_CHECKING
+import time
 
-from jibble_export.client import client
-from jibble_export.models.duration import Duration
-from jibble_export.models.responses import Calendars, Holidays
+from jibble_export.cache import ttl_for_period
+from jibble_export.calendar_index import CalendarIndex, IndexedCalendar
+from jibble_export.client import get_client, merge_pages
+from jibble_export.models.duration import Duration, as_date
+from jibble_export.models.responses import Calendars, HolidayEntry, Holidays
+from jibble_export.settings import setting
 
+if TYPE_CHECKING:
+    from jibble_export.async_client import AsyncJibbleClient
 
-def get_calendars() -> Calendars:
-    resp = client.get(
+
+def get_calendars(use_cache: bool = True) -> Calendars:
+    resp = get_client().get(
         subdomain="workspace",
         relative_path="/v1/Calendars",
         params={"$select": "id,name"},
         response_model=Calendars,
         status=http.HTTPStatus.OK,
+        cache_ttl=setting.cache_ttl_calendars if use_cache else None,
     )
     return resp
 
@@ -22,52 +32,172 @@ def get_calendars() -> Calendars:
 def get_holidays_for_year(
     calendar_id: str,
     year: int,
+    use_cache: bool = True,
 ) -> Holidays:
     query = f"(year(Date) eq {year} and calendarId eq {calendar_id})"
-    resp = client.get(
+    pages = get_client().iter_pages(
         subdomain="workspace",
         relative_path="/v1/CalendarDays",
         params={"$filter": query, "$count": "true"},
         response_model=Holidays,
         status=http.HTTPStatus.OK,
+        cache_ttl=ttl_for_period(date(year, 12, 31)) if use_cache else None,
     )
-    return resp
+    return merge_pages(pages)
 
 
-def get_holidays(
+def holidays_params(
     calendar_id: str,
     duration: calendar.Month | Duration,
-) -> Holidays:
+) -> dict[str, str]:
     query = f"(calendarId eq {calendar_id})"
     if isinstance(duration, Duration):
         query = f"({query} and (Date ge {duration.start_date:%Y-%m-%d} and Date le {duration.end_date:%Y-%m-%d}))"
     else:
         query = f"({query} and month(Date) eq {duration.value} and year(Date) eq {date.today().year})"
-    resp = client.get(
+    return {"$filter": query, "$count": "true"}
+
+
+def iter_holiday_pages(
+    calendar_id: str,
+    duration: calendar.Month | Duration,
+) -> Iterator[Holidays]:
+    period = duration if isinstance(duration, Duration) else Duration.month(duration)
+    return get_client().iter_pages(
         subdomain="workspace",
         relative_path="/v1/CalendarDays",
-        params={"$filter": query, "$count": "true"},
+        params=holidays_params(calendar_id, duration),
+        response_model=Holidays,
+        status=http.HTTPStatus.OK,
+        cache_ttl=ttl_for_period(period.end_date),
+    )
+
+
+def iter_holidays(
+    calendar_id: str,
+    duration: calendar.Month | Duration,
+) -> Iterator[HolidayEntry]:
+    for page in iter_holiday_pages(calendar_id, duration):
+        yield from page.value
+
+
+def get_holidays(
+    calendar_id: str,
+    duration: calendar.Month | Duration,
+) -> Holidays:
+    return merge_pages(iter_holiday_pages(calendar_id, duration))
+
+
+async def aget_holidays(
+    calendar_id: str,
+    duration: calendar.Month | Duration,
+    *,
+    client: AsyncJibbleClient,
+) -> Holidays:
+    resp = await client.get(
+        subdomain="workspace",
+        relative_path="/v1/CalendarDays",
+        params=holidays_params(calendar_id, duration),
         response_model=Holidays,
         status=http.HTTPStatus.OK,
     )
     return resp
 
 
+def calendar_index() -> CalendarIndex | None:
+    """
+    The calendar index, unless disabled or the client's cache is off.
+    """
+    if not setting.calendar_index or get_client().cache_mode == "off":
+        return None
+    return CalendarIndex(setting.cache_dir / "calendars")
+
+
+def find_calendar(calendar_name: str) -> IndexedCalendar:
+    """
+    Id and etag of the calendar called `calendar_name`, from the calendar
+    index while it is younger than `cache_ttl_calendars`. A name missing
+    from the index refetches the calendars before giving up.
+    """
+    client = get_client()
+    client_id = client.credentials.client_id
+    index = calendar_index()
+    if index is not None and client.cache_mode == "use":
+        if (cached := index.calendars(client_id)) is not None:
+            fetched_at, calendars = cached
+            fresh = time.time() - fetched_at <= setting.cache_ttl_calendars
+            if fresh and calendar_name in calendars:
+                return calendars[calendar_name]
+    # the index is the cache now, a stale response must not be served
+    calendars = {
+        entry.name: IndexedCalendar(str(entry.id), entry.odata_etag)
+        for entry in get_calendars(use_cache=index is None).value
+    }
+    if index is not None:
+        index.store_calendars(client_id, calendars)
+    try:
+        return calendars[calendar_name]
+    except KeyError:
+        logging.error("Could not find calendar name: %s" % calendar_name)
+        raise NameError(f"Calendar name {calendar_name} not found")
+
+
+def holidays_ttl(year: int) -> float:
+    if year < date.today().year:
+        return setting.cache_ttl_closed
+    return setting.cache_ttl_holidays
+
+
+def get_indexed_holidays(calendar: IndexedCalendar, year: int) -> Holidays:
+    """
+    Holidays of a calendar in a year, from the calendar index unless they
+    are older than `holidays_ttl` or the calendar's etag changed since.
+    """
+    client = get_client()
+    client_id = client.credentials.client_id
+    index = calendar_index()
+    if index is not None and client.cache_mode == "use":
+        if (cached := index.holidays(client_id, calendar.id, year)) is not None:
+            fetched_at, etag, raw = cached
+            if etag == calendar.etag and time.time() - fetched_at <= holidays_ttl(year):
+                logging.debug("Holidays of %s in %s from the index", calendar.id, year)
+                return Holidays.model_validate_json(raw)
+    holidays = get_holidays_for_year(calendar.id, year, use_cache=index is None)
+    if index is not None:
+        index.store_holidays(
+            client_id,
+            calendar.id,
+            year,
+            calendar.etag,
+            holidays.model_dump_json(by_alias=True),
+        )
+    return holidays
+
+
 def get_holidays_by_name(
     calendar_name: str,
     duration: Duration,
 ) -> Holidays:
-    calendars = get_calendars()
-    try:
-        calendar_id = next(
-            str(calendar.id)
-            for calendar in calendars.value
-            if calendar.name == calendar_name
-        )
-    except StopIteration:
-        logging.error("Could not find calendar name: %s" % calendar_name)
-        raise NameError(f"Calendar name {calendar_name} not found")
-    return get_holidays(calendar_id, duration)
+    """
+    Holidays of the calendar called `calendar_name` within `duration`.
+
+    They are fetched a whole year at a time and kept in the calendar index,
+    so that later exports of any period of those years do no holiday I/O.
+    """
+    calendar = find_calendar(calendar_name)
+    start, end = as_date(duration.start_date), as_date(duration.end_date)
+    years = [
+        get_indexed_holidays(calendar, year) for year in range(start.year, end.year + 1)
+    ]
+    value = [
+        entry
+        for holidays in years
+        for entry in holidays.value
+        if start <= entry.date <= end
+    ]
+    return years[0].model_copy(
+        update={"value": value, "odata_count": len(value), "odata_next_link": None}
+    )
 
 
 if __name__ == "__main__":
@@ -0,0 +1,35 @@
+from collections.abc import Iterable, Iterator, Sequence
+from uuid import UUID
+import http
+
+from jibble_export.client import get_client
+from jibble_export.models.responses import People, PersonEntry
+
+
+def any_of(field: str, ids: Iterable[UUID]) -> str:
+    """
+    OData condition matching `field` against any of `ids`.
+    """
+    return "(" + " or ".join(f"{field} eq {id}" for id in ids) + ")"
+
+
+def group_members_params(group_ids: Sequence[UUID]) -> dict[str, str]:
+    assert group_ids, "group_ids cannot be empty"
+    return {
+        "$count": "true",
+        "$filter": any_of("groupId", group_ids),
+        "$orderby": "fullName",
+        "$select": "id,fullName,groupId",
+    }
+
+
+def iter_group_members(group_ids: Sequence[UUID]) -> Iterator[PersonEntry]:
+    pages = get_client().iter_pages(
+        subdomain="workspace",
+        relative_path="/v1/People",
+        params=group_members_params(group_ids),
+        response_model=People,
+        status=http.HTTPStatus.OK,
+    )
+    for page in pages:
+        yield from page.value
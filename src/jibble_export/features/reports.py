@@ -1,5 +1,10 @@
 import logging
+from collections.abc import Sequence
+from dataclasses import dataclass
 from datetime import date
+from functools import partial
+from pathlib import Path
+from typing import TYPE_CHECKING, Literal
 from jibble_export.formatter import export_attendance_report
 import calendar
 from uuid import UUID
@@ -7,80 +12,175 @@ from uuid import UUID
 import pandas as pd
 
 from jibble_export.features.attendance import (
+    AttendanceQuery,
+    get_compact_time_attendance,
     get_time_attendance,
 )
 from jibble_export.features.holidays import get_holidays_by_name
 from jibble_export.features.timeoffs import get_timeoffs
-from jibble_export.models.duration import Duration
+from jibble_export.models.compact import CompactTrackedTime
+from jibble_export.models.duration import ChunkFrequency, Duration
+from jibble_export.frames import build_attendance_frames
 from jibble_export.models.responses import (
-    DateValue,
-    MemberValue,
-    Subject,
+    Holidays,
+    Timeoffs,
+    TrackedTimeReport,
 )
+from jibble_export.tracing import span, traced
+from jibble_export.utils import run_concurrently
 
+if TYPE_CHECKING:
+    from jibble_export.warehouse import Warehouse
 
+
+@dataclass(frozen=True)
+class ReportInputs:
+    attendance_report: TrackedTimeReport | CompactTrackedTime
+    holiday_list: Holidays
+    approved_timeoffs: Timeoffs
+    latencies: dict[str, float]
+
+
+def fetch_report_inputs(
+    duration: Duration,
+    holiday_calendar_name: str,
+    *,
+    chunk: ChunkFrequency | None = None,
+    max_workers: int | None = None,
+    compact: bool = False,
+    stream: bool = False,
+    query: AttendanceQuery | None = None,
+) -> ReportInputs:
+    """
+    Fetch everything a report needs concurrently. `stream` parses tracked
+    time off the socket member by member, into the compact representation.
+    `query` filters and projects tracked time on the server, and filters
+    time offs to the same people.
+    """
+    if query is not None:
+        query = query.with_group_members()
+    if compact or stream:
+        get_attendance = partial(get_compact_time_attendance, stream=stream)
+    else:
+        get_attendance = get_time_attendance
+    results, latencies = run_concurrently(
+        {
+            "attendance": partial(
+                get_attendance,
+                duration,
+                chunk=chunk,
+                max_workers=max_workers,
+                query=query,
+            ),
+            "holidays": partial(get_holidays_by_name, holiday_calendar_name, duration),
+            "timeoffs": partial(
+                get_timeoffs,
+                duration,
+                status="Approved",
+                person_ids=query.person_ids if query else (),
+            ),
+        }
+    )
+    for name, seconds in latencies.items():
+        logging.info("Fetched %s in %.3fs", name, seconds)
+    return ReportInputs(
+        attendance_report=results["attendance"],
+        holiday_list=results["holidays"],
+        approved_timeoffs=results["timeoffs"],
+        latencies=latencies,
+    )
+
+
+@traced("prepare_attendance_report")
 def prepare_attendance_report(
-    duration: Duration, holiday_calendar_name: str
+    duration: Duration,
+    holiday_calendar_name: str,
+    *,
+    chunk: ChunkFrequency | None = None,
+    max_workers: int | None = None,
+    warehouse: Warehouse | None = None,
+    compact: bool = False,
+    stream: bool = False,
+    query: AttendanceQuery | None = None,
 ) -> tuple[pd.DataFrame, pd.Series, pd.DataFrame, dict[UUID, str]]:
-    attendance_report = get_time_attendance(duration)
-    holiday_list = get_holidays_by_name(holiday_calendar_name, duration)
-    approved_timeoffs = get_timeoffs(duration, status="Approved")
-    person_ids = [value.id for value in attendance_report.value]
-    if not person_ids:
+    if warehouse is not None:
+        with span("load"):
+            inputs = warehouse.load_report_inputs(duration, holiday_calendar_name)
+    else:
+        if query is not None:
+            query = query.with_group_members()
+        with span("fetch"):
+            inputs = fetch_report_inputs(
+                duration,
+                holiday_calendar_name,
+                chunk=chunk,
+                max_workers=max_workers,
+                compact=compact,
+                stream=stream,
+                query=query,
+            )
+    report = inputs.attendance_report
+    if isinstance(report, CompactTrackedTime):
+        logging.debug("Compact tracked time takes %s bytes", report.nbytes)
+    if not (
+        report.member_ids if isinstance(report, CompactTrackedTime) else report.value
+    ):
         logging.error(
             "No person found! duration=%s, calendar=%s", duration, holiday_calendar_name
         )
         raise ValueError(
             f"No person found in the organization during given time period: {duration}!"
         )
-    dates_in_month = pd.date_range(
-        start=duration.start_date,
-        end=duration.end_date,
-        freq="D",
-    )
-    tracked_time_df = pd.DataFrame(
-        index=dates_in_month,
-        columns=person_ids,
-        dtype="timedelta64[us]",
-    )
-    holidays = pd.Series(
-        index=dates_in_month,
-        dtype=str,
-    )
-    timeoffs_df = pd.DataFrame(
-        index=dates_in_month,
-        columns=person_ids,
-        dtype=str,
-    )
-    id_to_name: dict[UUID, str] = {}
-    for value in attendance_report.value:
-        match value:
-            case MemberValue(
-                id=id,
-                subject=Subject(name=name),
-                items=[*_, DateValue()] as items,
-            ):
-                id_to_name[id] = name
-                tracked_time_df.loc[
-                    pd.to_datetime([entry.id for entry in items]), id
-                ] = [entry.trackedTime for entry in items]
-            case _:
-                raise NotImplementedError()
-
-    for value in holiday_list.value:
-        holidays[value.date] = value.name
-
-    for value in approved_timeoffs.value:
-        timeoff_indices = pd.date_range(value.startDate, value.endDate, freq="D")
-        if pd.isna(timeoffs_df.loc[timeoff_indices, value.personId]).all():
-            timeoffs_df.loc[timeoff_indices, value.personId] = (
-                f"{value.policy.name}"
-                if value.duration != 0.5
-                else f"0.5 {value.policy.name}"
-            )
-        else:
-            timeoffs_df.loc[timeoff_indices, value.personId] = value.policy.name
-    return tracked_time_df, holidays, timeoffs_df, id_to_name
+    with span("frames"):
+        return build_attendance_frames(
+            duration,
+            inputs.attendance_report,
+            inputs.holiday_list,
+            inputs.approved_timeoffs,
+            members=query.person_ids if query and query.person_ids else None,
+        )
+
+
+def report_paths(
+    filename: str | Path, formats: Sequence[str], exact: bool = False
+) -> dict[str, str]:
+    """
+    Path of the report in each format: `filename` with the suffix of the
+    format, or as is when `exact` and there is a single format.
+    """
+    paths = {}
+    for format in formats:
+        path = Path(filename)
+        if not (exact and len(formats) == 1):
+            path = path.with_suffix(f".{format}")
+        paths[format] = str(path)
+    return paths
+
+
+def write_attendance_reports(
+    timetracking: pd.DataFrame,
+    holidays: pd.Series,
+    timeoffs: pd.DataFrame,
+    person_ids: dict[UUID, str],
+    paths: dict[str, str],
+    *,
+    layout: Literal["single", "monthly"] = "single",
+):
+    """
+    Write the frames of `prepare_attendance_report` in every format of
+    `paths`: the xlsx report, and one row per member and day otherwise.
+    """
+    if "xlsx" in paths:
+        export_attendance_report(
+            timetracking, holidays, timeoffs, person_ids, paths["xlsx"], layout=layout
+        )
+    if columnar_formats := [format for format in paths if format != "xlsx"]:
+        from jibble_export.columnar import export_attendance_records, export_format
+        from jibble_export.frames import attendance_records
+
+        records = attendance_records(timetracking, holidays, timeoffs, person_ids)
+        for format in columnar_formats:
+            export_attendance_records(records, paths[format], export_format(format))
 
 
 if __name__ == "__main__":
@@ -1,35 +1,92 @@
+from collections.abc import Iterator, Sequence
 from jibble_export.models.duration import Duration
-from typing import Literal
+from typing import TYPE_CHECKING, Literal
 from uuid import UUID
 import http
-from jibble_export.models.responses import Timeoffs
-from jibble_export.client import client
+from jibble_export.models.responses import TimeoffEntry, Timeoffs
+from jibble_export.cache import ttl_for_period
+from jibble_export.client import get_client, merge_pages
+from jibble_export.features.people import any_of
 
+if TYPE_CHECKING:
+    from jibble_export.async_client import AsyncJibbleClient
 
-def get_timeoffs(
+TimeoffStatus = Literal["Approved", "Rejected", "Pending", "Cancelled"]
+
+
+def timeoffs_params(
     duration: Duration,
     person_id: UUID | None = None,
-    status: Literal["Approved", "Rejected", "Pending", "Cancelled"] | None = None,
-) -> Timeoffs:
+    status: TimeoffStatus | None = None,
+    person_ids: Sequence[UUID] = (),
+) -> dict[str, str]:
     from_date, to_date = duration.start_date, duration.end_date
     conditions = (
         f"((startDate ge {from_date:%Y-%m-%d} and startDate le {to_date:%Y-%m-%d})"
         f"or (endDate ge {from_date:%Y-%m-%d} and endDate le {to_date:%Y-%m-%d}))"
     )
-    if person_id is not None:
-        conditions += f" and (personId eq {person_id})"
+    people = [person_id] if person_id is not None else []
+    people.extend(person_ids)
+    if people:
+        conditions += f" and {any_of('personId', people)}"
     if status is not None:
         conditions += f" and (status eq '{status}')"
-    resp = client.get(
+    return {
+        "$count": "true",
+        "$expand": "person($select=fullName,id),policy($select=name,compensation,kind,id)",
+        "$filter": f"({conditions})",
+        "$orderby": "startDate",
+        "$select": "id,personId,kind,startDate,endDate,status,note,duration,person,policy",
+    }
+
+
+def iter_timeoff_pages(
+    duration: Duration,
+    person_id: UUID | None = None,
+    status: TimeoffStatus | None = None,
+    person_ids: Sequence[UUID] = (),
+) -> Iterator[Timeoffs]:
+    return get_client().iter_pages(
+        subdomain="time-tracking",
+        relative_path="/v1/TimeOffOverview",
+        params=timeoffs_params(duration, person_id, status, person_ids),
+        response_model=Timeoffs,
+        status=http.HTTPStatus.OK,
+        cache_ttl=ttl_for_period(duration.end_date),
+    )
+
+
+def iter_timeoffs(
+    duration: Duration,
+    person_id: UUID | None = None,
+    status: TimeoffStatus | None = None,
+    person_ids: Sequence[UUID] = (),
+) -> Iterator[TimeoffEntry]:
+    for page in iter_timeoff_pages(duration, person_id, status, person_ids):
+        yield from page.value
+
+
+def get_timeoffs(
+    duration: Duration,
+    person_id: UUID | None = None,
+    status: TimeoffStatus | None = None,
+    person_ids: Sequence[UUID] = (),
+) -> Timeoffs:
+    return merge_pages(iter_timeoff_pages(duration, person_id, status, person_ids))
+
+
+async def aget_timeoffs(
+    duration: Duration,
+    person_id: UUID | None = None,
+    status: TimeoffStatus | None = None,
+    person_ids: Sequence[UUID] = (),
+    *,
+    client: AsyncJibbleClient,
+) -> Timeoffs:
+    resp = await client.get(
         subdomain="time-tracking",
         relative_path="/v1/TimeOffOverview",
-        params={
-            "$count": "true",
-            "$expand": "person($select=fullName,id),policy($select=name,compensation,kind,id)",
-            "$filter": f"({conditions})",
-            "$orderby": "startDate",
-            "$select": "id,personId,kind,startDate,endDate,status,note,duration,person,policy",
-        },
+        params=timeoffs_params(duration, person_id, status, person_ids),
         response_model=Timeoffs,
         status=http.HTTPStatus.OK,
     )
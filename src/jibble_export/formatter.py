@@ -1,12 +1,19 @@
+from dataclasses import dataclass
 from pathlib import Path
+from typing import Any, BinaryIO, Literal, NamedTuple
 from uuid import UUID
 import logging
 from itertools import chain
 
 import pandas as pd
-from openpyxl.styles import Font, PatternFill
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, NamedStyle, PatternFill
 from openpyxl.utils import get_column_letter
 
+from jibble_export.frames import attendance_status_grid
+from jibble_export.tracing import span, traced
+
 
 colorfills = {
     "Casual Leave": PatternFill(
@@ -42,35 +49,62 @@ colorfills = {
 }
 
 
+def fill_key(status: str) -> str | None:
+    if pd.isna(status):
+        return None
+    elif status.endswith("Casual Leave"):
+        return "Casual Leave"
+    elif status.endswith("Sick Leave"):
+        return "Sick Leave"
+    elif status.endswith("Unpaid Leave"):
+        return "Unpaid Leave"
+    elif status == "Present":
+        return "Present"
+    elif status == "W/Off":
+        return "W/Off"
+    else:
+        return "Holidays"
+
+
+@traced("export_attendance_report")
 def export_attendance_report(
     tracked_time_report: pd.DataFrame,
     holidays: pd.Series,
     timeoffs: pd.DataFrame,
     id_person_map: dict[UUID, str],
     filename: str,
+    writer: Literal["fast", "standard"] = "fast",
+    layout: Literal["single", "monthly"] = "single",
 ):
-    attendance_report = pd.DataFrame(
-        index=tracked_time_report.index,
-        columns=tracked_time_report.columns,
-        dtype=object,
-    )
-    notnull_holidays = holidays.dropna()
-    for person_id in timeoffs.columns:
-        attendance_report.loc[notnull_holidays.index, person_id] = notnull_holidays
-    attendance_report[tracked_time_report.notnull()] = "Present"
-    attendance_report.loc[attendance_report.index.weekday >= 5, :] = "W/Off"  # ty: ignore[unresolved-attribute]
-    for person_id in timeoffs.columns:
-        notnull_timeoffs = timeoffs[person_id].dropna()
-        attendance_report.loc[notnull_timeoffs.index, person_id] = notnull_timeoffs
-    attendance_report = attendance_report.T
+    with span("status_grid"):
+        attendance_report = attendance_status_grid(
+            tracked_time_report, holidays, timeoffs, id_person_map
+        )
+    Path(filename).parent.mkdir(parents=True, exist_ok=True)
+    if (
+        layout == "monthly"
+        and pd.DatetimeIndex(attendance_report.columns).to_period("M").nunique() > 1
+    ):
+        write_attendance_workbook_by_month(attendance_report, id_person_map, filename)
+        logging.info(f"Report successfully exported to {Path(filename).resolve()}")
+        return
+    with span("write", writer=writer):
+        match writer:
+            case "fast":
+                write_attendance_sheet_fast(attendance_report, id_person_map, filename)
+            case "standard":
+                write_attendance_sheet(attendance_report, id_person_map, filename)
+    logging.info(f"Report successfully exported to {Path(filename).resolve()}")
+
 
+def write_attendance_sheet(
+    attendance_report: pd.DataFrame,
+    id_person_map: dict[UUID, str],
+    filename: str,
+):
     longest_name_chars = max(map(len, id_person_map.values()), default=2)
 
-    Path(filename).parent.mkdir(parents=True, exist_ok=True)
     with pd.ExcelWriter(filename, engine="openpyxl") as writer:
-        attendance_report = attendance_report.reindex(
-            sorted(attendance_report.index, key=id_person_map.get)  # ty: ignore[no-matching-overload]
-        )
         attendance_report.to_excel(writer, startrow=1, startcol=1, index=False)
         worksheet = writer.sheets["Sheet1"]
         worksheet.sheet_format.defaultColWidth = 15
@@ -85,20 +119,8 @@ def export_attendance_report(
         ):  # start=2 because col A is index
             col_letter = get_column_letter(col_idx)
             for i, entry in enumerate(attendance_report[date], start=3):
-                if pd.isna(entry):
-                    continue
-                elif entry.endswith("Casual Leave"):
-                    worksheet[f"{col_letter}{i}"].fill = colorfills["Casual Leave"]
-                elif entry.endswith("Sick Leave"):
-                    worksheet[f"{col_letter}{i}"].fill = colorfills["Sick Leave"]
-                elif entry.endswith("Unpaid Leave"):
-                    worksheet[f"{col_letter}{i}"].fill = colorfills["Unpaid Leave"]
-                elif entry == "Present":
-                    worksheet[f"{col_letter}{i}"].fill = colorfills["Present"]
-                elif entry == "W/Off":
-                    worksheet[f"{col_letter}{i}"].fill = colorfills["W/Off"]
-                else:
-                    worksheet[f"{col_letter}{i}"].fill = colorfills["Holidays"]
+                if (key := fill_key(entry)) is not None:
+                    worksheet[f"{col_letter}{i}"].fill = colorfills[key]
 
             worksheet[f"{col_letter}1"] = date.strftime("%a")  # weekday name
             worksheet[f"{col_letter}2"] = date.strftime("%d")  # day number
@@ -120,4 +142,206 @@ def export_attendance_report(
         for cell in chain(worksheet[1], worksheet[2], worksheet[start]):
             cell.font = Font(bold=True)
 
-    logging.info(f"Report successfully exported to {Path(filename).resolve()}")
+
+class Styled(NamedTuple):
+    """
+    A cell value and the name of its style, one of `named_styles()`.
+    """
+
+    value: Any
+    style: str
+
+
+BOLD = "Attendance Bold"
+# left over from the datetime header `to_excel` writes first
+HEADER = "Attendance Header"
+
+
+def fill_style(key: str) -> str:
+    return f"Attendance {key}"
+
+
+def named_styles() -> list[NamedStyle]:
+    """
+    Every style of the attendance sheets. They are added to each workbook as
+    named styles, which cells then share by name.
+    """
+    bold = Font(bold=True)
+    return [
+        NamedStyle(BOLD, font=bold),
+        NamedStyle(HEADER, font=bold, number_format="YYYY-MM-DD HH:MM:SS"),
+        *(NamedStyle(fill_style(key), fill=fill) for key, fill in colorfills.items()),
+    ]
+
+
+@dataclass(frozen=True)
+class SheetLayout:
+    """
+    Rows and column widths of a sheet, as plain data so that they can be
+    laid out in a worker process and written by another. Styled cells are
+    `Styled` values.
+    """
+
+    rows: list[list[Any]]
+    column_widths: dict[str, float]
+    default_column_width: float = 15
+
+
+def attendance_sheet_layout(
+    attendance_report: pd.DataFrame, id_person_map: dict[UUID, str]
+) -> SheetLayout:
+    """
+    The status grid and the "Working Days" block.
+
+    Each distinct status is mapped to its fill once, and every cell with
+    that status reuses the same `Styled` value.
+    """
+    dates = attendance_report.columns
+    max_column = max(len(dates) + 1, 7)
+    column_widths = _name_column_width(id_person_map)
+    for col_idx, date in enumerate(dates, start=2):
+        if date.weekday() >= 5:
+            column_widths[get_column_letter(col_idx)] = 6
+
+    def bold_row(values: list[Any], style: str) -> list[Styled]:
+        values = values + [None] * (max_column - len(values))
+        return [
+            Styled(value, BOLD if i == 0 or i > len(dates) else style)
+            for i, value in enumerate(values)
+        ]
+
+    rows: list[list[Any]] = [
+        bold_row([None] + [date.strftime("%a") for date in dates], BOLD),
+        bold_row([None] + [date.strftime("%d") for date in dates], HEADER),
+    ]
+
+    statuses = attendance_report.to_numpy(dtype=object)
+    codes, uniques = pd.factorize(statuses.ravel(), use_na_sentinel=False)
+    codes = codes.reshape(statuses.shape)
+    # code -> value written by to_excel, styled with its fill when it has one
+    cells: list[Any] = []
+    for status in uniques:
+        value = "" if pd.isna(status) else status
+        key = fill_key(status)
+        cells.append(value if key is None else Styled(value, fill_style(key)))
+
+    for person_id, row_codes in zip(attendance_report.index, codes):
+        rows.append(
+            [id_person_map.get(person_id, "N/A")]
+            + [cells[code] for code in row_codes.tolist()]
+        )
+
+    rows.extend(
+        [] for _ in range(len(id_person_map) + 1 - len(attendance_report.index))
+    )
+    rows.extend(_working_days_rows(attendance_report, id_person_map, max_column))
+    return SheetLayout(rows, column_widths)
+
+
+def summary_sheet_layout(
+    attendance_report: pd.DataFrame, id_person_map: dict[UUID, str]
+) -> SheetLayout:
+    return SheetLayout(
+        _working_days_rows(attendance_report, id_person_map, 7),
+        _name_column_width(id_person_map),
+    )
+
+
+def _name_column_width(id_person_map: dict[UUID, str]) -> dict[str, float]:
+    longest_name_chars = max(map(len, id_person_map.values()), default=2)
+    return {"A": longest_name_chars + 2}
+
+
+def _working_days_rows(
+    attendance_report: pd.DataFrame,
+    id_person_map: dict[UUID, str],
+    max_column: int,
+) -> list[list[Any]]:
+    """
+    Days in the report, present days per person and the colour legend.
+    """
+    head = ["Working Days:", f"{len(attendance_report.columns)}"]
+    head += [None, None, None, "Color", "Represents"]
+    head += [None] * (max_column - len(head))
+    rows: list[list[Any]] = [[Styled(value, BOLD) for value in head]]
+    present_days = (attendance_report.to_numpy(dtype=object) == "Present").sum(axis=1)
+    legend = list(colorfills)
+    for i in range(max(len(attendance_report.index), len(legend))):
+        row: list[Any] = [None] * 7
+        if i < len(attendance_report.index):
+            row[0] = id_person_map[attendance_report.index[i]]
+            row[1] = int(present_days[i])
+        if i < len(legend):
+            row[5] = Styled(None, fill_style(legend[i]))
+            row[6] = legend[i]
+        rows.append(row)
+    return rows
+
+
+def styled_workbook() -> Workbook:
+    workbook = Workbook(write_only=True)
+    for style in named_styles():
+        workbook.add_named_style(style)
+    return workbook
+
+
+def write_sheet(workbook: Workbook, title: str, layout: SheetLayout):
+    """
+    Append `layout` to a new sheet of a `styled_workbook`, row by row.
+    """
+    worksheet = workbook.create_sheet(title)
+    worksheet.sheet_format.defaultColWidth = layout.default_column_width
+    for column, width in layout.column_widths.items():
+        worksheet.column_dimensions[column].width = width
+
+    def cell(value: Any) -> Any:
+        if not isinstance(value, Styled):
+            return value
+        cell = WriteOnlyCell(worksheet, value.value)
+        cell.style = value.style
+        return cell
+
+    for row in layout.rows:
+        worksheet.append([cell(value) for value in row])
+
+
+def write_attendance_sheet_fast(
+    attendance_report: pd.DataFrame,
+    id_person_map: dict[UUID, str],
+    filename: str | BinaryIO,
+):
+    """
+    Write the same sheet as `write_attendance_sheet`, streaming every row
+    once through openpyxl's write-only mode.
+    """
+    workbook = styled_workbook()
+    with span("render"):
+        layout = attendance_sheet_layout(attendance_report, id_person_map)
+        write_sheet(workbook, "Sheet1", layout)
+    with span("save"):
+        workbook.save(filename)
+
+
+def write_attendance_workbook_by_month(
+    attendance_report: pd.DataFrame,
+    id_person_map: dict[UUID, str],
+    filename: str,
+):
+    """
+    Write a "Summary" sheet followed by one sheet per month, each streamed
+    through the same write-only workbook.
+    """
+    months = pd.DatetimeIndex(attendance_report.columns).to_period("M")
+    parts = {"Summary": attendance_report} | {
+        month.strftime("%B %Y"): attendance_report.loc[:, months == month]
+        for month in months.unique()
+    }
+    workbook = styled_workbook()
+    with span("render", sheets=len(parts)):
+        for title, part in parts.items():
+            layout = (
+                summary_sheet_layout if title == "Summary" else attendance_sheet_layout
+            )
+            write_sheet(workbook, title, layout(part, id_person_map))
+    with span("save"):
+        workbook.save(filename)
@@ -0,0 +1,275 @@
+from collections.abc import Collection
+from datetime import timedelta
+from uuid import UUID
+import logging
+
+import numpy as np
+import pandas as pd
+
+from jibble_export.models.compact import CompactTrackedTime
+from jibble_export.models.duration import Duration, as_date
+from jibble_export.models.responses import (
+    DateValue,
+    Holidays,
+    MemberValue,
+    Subject,
+    Timeoffs,
+    TrackedTimeReport,
+)
+
+
+def date_positions(days: list, duration: Duration) -> np.ndarray:
+    """
+    Row position of every day in the daily index of `duration`.
+    """
+    start = np.datetime64(as_date(duration.start_date), "D")
+    return (np.array(days, dtype="datetime64[D]") - start).astype(np.int64)
+
+
+def tracked_time_frame(
+    attendance_report: TrackedTimeReport,
+    dates: pd.DatetimeIndex,
+    duration: Duration,
+) -> tuple[pd.DataFrame, dict[UUID, str]]:
+    """
+    Day x member frame of tracked time, NaT where nothing was tracked.
+
+    The report is flattened into (member, day, tracked time) columns in one
+    pass and scattered into a preallocated array, instead of one `.loc`
+    assignment per member.
+    """
+    person_ids = [value.id for value in attendance_report.value]
+    id_to_name: dict[UUID, str] = {}
+    columns: list[int] = []
+    days: list = []
+    tracked: list[timedelta] = []
+    for column, value in enumerate(attendance_report.value):
+        match value:
+            case MemberValue(
+                id=id,
+                subject=Subject(name=name),
+                items=[*_, DateValue()] as items,
+            ):
+                id_to_name[id] = name
+                columns.extend([column] * len(items))
+                days.extend(entry.id for entry in items)
+                tracked.extend(entry.trackedTime for entry in items)
+            case _:
+                raise NotImplementedError()
+
+    values = np.full((len(dates), len(person_ids)), np.timedelta64("NaT"), "m8[us]")
+    rows = date_positions(days, duration)
+    in_range = (rows >= 0) & (rows < len(dates))
+    values[rows[in_range], np.array(columns, dtype=np.int64)[in_range]] = np.array(
+        tracked, dtype="m8[us]"
+    )[in_range]
+    return pd.DataFrame(values, index=dates, columns=person_ids), id_to_name
+
+
+def compact_tracked_time_frame(
+    attendance_report: CompactTrackedTime,
+    dates: pd.DatetimeIndex,
+    duration: Duration,
+) -> tuple[pd.DataFrame, dict[UUID, str]]:
+    """
+    Same frame as `tracked_time_frame`, scattered straight from the arrays.
+    """
+    person_ids = attendance_report.member_ids
+    start = np.datetime64(as_date(duration.start_date), "D").astype(np.int64)
+    rows = attendance_report.day - start
+    in_range = (rows >= 0) & (rows < len(dates))
+    values = np.full((len(dates), len(person_ids)), np.timedelta64("NaT"), "m8[us]")
+    values[rows[in_range], attendance_report.member[in_range]] = (
+        attendance_report.tracked_us[in_range].view("m8[us]")
+    )
+    id_to_name = dict(zip(person_ids, attendance_report.member_names))
+    return pd.DataFrame(values, index=dates, columns=person_ids), id_to_name
+
+
+def holidays_series(holiday_list: Holidays, dates: pd.DatetimeIndex) -> pd.Series:
+    holidays = pd.Series(
+        [value.name for value in holiday_list.value],
+        index=pd.DatetimeIndex([value.date for value in holiday_list.value]),
+        dtype=str,
+    )
+    holidays = holidays[~holidays.index.duplicated(keep="last")]
+    return holidays.reindex(dates)
+
+
+def timeoffs_frame(
+    approved_timeoffs: Timeoffs,
+    dates: pd.DatetimeIndex,
+    person_ids: list[UUID],
+    duration: Duration,
+) -> pd.DataFrame:
+    """
+    Day x member frame of timeoff labels.
+
+    All timeoff intervals are expanded into cells at once (repeat plus
+    offsets). A cell covered by a single timeoff gets its label, prefixed
+    with "0.5" for half days. A cell covered by several timeoffs gets the
+    bare policy name of the one starting last (input order breaks ties),
+    since overlapping half days add up to a full day off.
+    """
+    column_of = {person_id: column for column, person_id in enumerate(person_ids)}
+    entries = [
+        value for value in approved_timeoffs.value if value.personId in column_of
+    ]
+    if len(entries) != len(approved_timeoffs.value):
+        logging.debug("Skipping timeoffs of persons missing from the attendance report")
+    labels = np.full(len(dates) * len(person_ids), None, dtype=object)
+
+    starts = date_positions([value.startDate for value in entries], duration)
+    ends = date_positions(
+        [value.endDate or value.startDate for value in entries], duration
+    )
+    # later starting timeoffs win overlaps
+    rank = np.empty(len(entries), dtype=np.int64)
+    rank[np.argsort(starts, kind="stable")] = np.arange(len(entries))
+    starts = starts.clip(0)
+    lengths = (ends.clip(max=len(dates) - 1) - starts + 1).clip(0)
+    total = int(lengths.sum())
+    if total:
+        entry_of_cell = np.repeat(np.arange(len(entries)), lengths)
+        offsets = np.arange(total) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        rows = np.repeat(starts, lengths) + offsets
+        columns = np.array([column_of[value.personId] for value in entries])
+        cells = rows * len(person_ids) + columns[entry_of_cell]
+
+        order = np.lexsort((rank[entry_of_cell], cells))
+        cells, entry_of_cell = cells[order], entry_of_cell[order]
+        boundary = cells[1:] != cells[:-1]
+        is_first = np.concatenate(([True], boundary))
+        is_last = np.concatenate((boundary, [True]))
+
+        names = np.array([value.policy.name for value in entries], dtype=object)
+        single_labels = np.array(
+            [
+                f"{value.policy.name}"
+                if value.duration != 0.5
+                else f"0.5 {value.policy.name}"
+                for value in entries
+            ],
+            dtype=object,
+        )
+        winners = entry_of_cell[is_last]
+        labels[cells[is_last]] = np.where(
+            is_first[is_last], single_labels[winners], names[winners]
+        )
+    return pd.DataFrame(
+        labels.reshape(len(dates), len(person_ids)),
+        index=dates,
+        columns=person_ids,
+        dtype=str,
+    )
+
+
+def attendance_status_grid(
+    tracked_time_report: pd.DataFrame,
+    holidays: pd.Series,
+    timeoffs: pd.DataFrame,
+    id_person_map: dict[UUID, str],
+) -> pd.DataFrame:
+    """
+    Member x day frame of statuses, sorted by member name.
+
+    Holidays are overridden by presence, presence by weekends and
+    everything by timeoffs.
+    """
+    attendance_report = pd.DataFrame(
+        index=tracked_time_report.index,
+        columns=tracked_time_report.columns,
+        dtype=object,
+    )
+    notnull_holidays = holidays.dropna()
+    for person_id in timeoffs.columns:
+        attendance_report.loc[notnull_holidays.index, person_id] = notnull_holidays
+    attendance_report[tracked_time_report.notnull()] = "Present"
+    attendance_report.loc[attendance_report.index.weekday >= 5, :] = "W/Off"  # ty: ignore[unresolved-attribute]
+    for person_id in timeoffs.columns:
+        notnull_timeoffs = timeoffs[person_id].dropna()
+        attendance_report.loc[notnull_timeoffs.index, person_id] = notnull_timeoffs
+    attendance_report = attendance_report.T
+    return attendance_report.reindex(
+        sorted(attendance_report.index, key=id_person_map.get)  # ty: ignore[no-matching-overload]
+    )
+
+
+def attendance_records(
+    tracked_time_report: pd.DataFrame,
+    holidays: pd.Series,
+    timeoffs: pd.DataFrame,
+    id_person_map: dict[UUID, str],
+) -> pd.DataFrame:
+    """
+    Long form of the report: one row per member and day, ordered like the
+    sheet, keeping the tracked time that the sheet reduces to "Present".
+    """
+    statuses = attendance_status_grid(
+        tracked_time_report, holidays, timeoffs, id_person_map
+    )
+    members = list(statuses.index)
+    n_dates = len(tracked_time_report.index)
+    return pd.DataFrame(
+        {
+            "member_id": pd.array(
+                np.repeat([str(member) for member in members], n_dates), dtype=str
+            ),
+            "name": pd.array(
+                np.repeat(
+                    [id_person_map.get(member, "N/A") for member in members], n_dates
+                ),
+                dtype=str,
+            ),
+            "date": np.tile(tracked_time_report.index.to_numpy(), len(members)),
+            "tracked_time": tracked_time_report[members].to_numpy().T.ravel(),
+            "status": pd.array(statuses.to_numpy(dtype=object).ravel(), dtype=str),
+            "holiday": pd.array(
+                np.tile(holidays.to_numpy(dtype=object), len(members)), dtype=str
+            ),
+            "timeoff": pd.array(
+                timeoffs[members].to_numpy(dtype=object).T.ravel(), dtype=str
+            ),
+        }
+    )
+
+
+def build_attendance_frames(
+    duration: Duration,
+    attendance_report: TrackedTimeReport | CompactTrackedTime,
+    holiday_list: Holidays,
+    approved_timeoffs: Timeoffs,
+    members: Collection[UUID] | None = None,
+) -> tuple[pd.DataFrame, pd.Series, pd.DataFrame, dict[UUID, str]]:
+    """
+    Day x member frames of the report. With `members`, anyone else in the
+    tracked time report is left out, in case the API ignored the filter.
+    """
+    dates = pd.date_range(
+        start=duration.start_date,
+        end=duration.end_date,
+        freq="D",
+    )
+    if isinstance(attendance_report, CompactTrackedTime):
+        tracked_time_df, id_to_name = compact_tracked_time_frame(
+            attendance_report, dates, duration
+        )
+    else:
+        tracked_time_df, id_to_name = tracked_time_frame(
+            attendance_report, dates, duration
+        )
+    if members is not None:
+        wanted = set(members)
+        columns = [id for id in tracked_time_df.columns if id in wanted]
+        if len(columns) < len(tracked_time_df.columns):
+            logging.warning(
+                "Dropping %s members the API returned outside the person filter",
+                len(tracked_time_df.columns) - len(columns),
+            )
+            tracked_time_df = tracked_time_df[columns]
+            id_to_name = {id: id_to_name[id] for id in columns}
+    holidays = holidays_series(holiday_list, dates)
+    timeoffs_df = timeoffs_frame(
+        approved_timeoffs, dates, list(tracked_time_df.columns), duration
+    )
+    return tracked_time_df, holidays, timeoffs_df, id_to_name
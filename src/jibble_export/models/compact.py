@@ -0,0 +1,180 @@
+from collections.abc import Iterable, Sequence
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Any, Self
+from uuid import UUID
+import json
+
+import numpy as np
+import pandas as pd
+
+from jibble_export.models.responses import (
+    DateValue,
+    MemberValue,
+    TrackedTimeReport,
+    TrackedTimeReportValue,
+    parse_custom_date,
+)
+from jibble_export.utils import iso_duration_microseconds
+
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+MICROSECOND = timedelta(microseconds=1)
+
+
+def entity_type_of(value: dict[str, Any], id: str) -> str:
+    """
+    Entity type of a member or day item whose subject was reduced to an
+    (entity type, name) pair, guessed from the id when the subject, or its
+    entity type, was projected away.
+    """
+    subject = value.get("subject")
+    if isinstance(subject, tuple) and subject[0] is not None:
+        return subject[0]
+    # members are keyed by UUID, days by their name
+    return "Member" if len(id) == 36 and id.count("-") == 4 else "Date"
+
+
+@dataclass(frozen=True)
+class CompactTrackedTime:
+    """
+    Member x day tracked time of a TrackedTimeReport as flat arrays.
+
+    Entry `i` says member `member_ids[member[i]]` tracked `tracked_us[i]`
+    microseconds on day `day[i]`, counted in days since 1970-01-01. This
+    takes a few bytes per entry instead of a `DateValue` with its `Subject`.
+    """
+
+    member_ids: list[UUID]
+    member_names: list[str]
+    member: np.ndarray
+    day: np.ndarray
+    tracked_us: np.ndarray
+
+    @classmethod
+    def from_json(cls, data: bytes | str) -> Self:
+        """
+        Build the arrays while parsing: every day item is reduced to a
+        (day, microseconds) pair as soon as it is decoded, so the day dicts
+        never pile up.
+        """
+        member_ids: list[UUID] = []
+        member_names: list[str] = []
+        members: list[np.ndarray] = []
+        entries: list[tuple[int, int]] = []
+
+        def day(id: str, tracked: str) -> tuple[int, int]:
+            return (
+                parse_custom_date(id).toordinal() - EPOCH_ORDINAL,
+                iso_duration_microseconds(tracked),
+            )
+
+        def member(id: str, name: str, items: list[Any] | None) -> None:
+            items = items or []
+            if not all(isinstance(item, tuple) for item in items):
+                raise NotImplementedError("Only Member/Date reports are supported")
+            members.append(np.full(len(items), len(member_ids), dtype=np.int32))
+            member_ids.append(UUID(id))
+            member_names.append(name)
+            entries.extend(items)
+
+        def reduce(obj: dict[str, Any]) -> Any:
+            match obj:
+                case {"entityType": "Member" | "Date" as entity_type, "name": name}:
+                    # a subject
+                    return entity_type, name
+                case {"subject": ("Date", _), "id": id, "trackedTime": tracked}:
+                    return day(id, tracked)
+                case {"subject": ("Member", name), "id": id}:
+                    return member(id, name, obj.get("items"))
+                case {"name": str() as name} if "trackedTime" not in obj:
+                    # a subject projected to its name
+                    return None, name
+                case {"id": str() as id, "trackedTime": tracked} if (
+                    entity_type_of(obj, id) == "Date"
+                ):
+                    return day(id, tracked)
+                case {"subject": (_, name), "id": id}:
+                    return member(id, name, obj.get("items"))
+            return obj
+
+        json.loads(data, object_hook=reduce)
+        days, tracked = np.array(entries, dtype=np.int64).reshape(-1, 2).T.copy()
+        return cls(
+            member_ids=member_ids,
+            member_names=member_names,
+            member=np.concatenate(members) if members else np.empty(0, np.int32),
+            day=days,
+            tracked_us=tracked,
+        )
+
+    @classmethod
+    def from_report(cls, report: TrackedTimeReport) -> Self:
+        return cls.from_members(report.value)
+
+    @classmethod
+    def from_members(cls, members: Iterable[TrackedTimeReportValue]) -> Self:
+        """
+        Build the arrays from members, e.g. streamed one by one by
+        `iter_time_attendance`, keeping only their day entries.
+        """
+        member_ids, member_names, codes, days, tracked = [], [], [], [], []
+        for index, value in enumerate(members):
+            assert isinstance(value, MemberValue)
+            member_ids.append(value.id)
+            member_names.append(value.subject.name)
+            for item in value.items or []:
+                assert isinstance(item, DateValue)
+                codes.append(index)
+                days.append(item.id.toordinal() - EPOCH_ORDINAL)
+                tracked.append(item.trackedTime // MICROSECOND)
+        return cls(
+            member_ids=member_ids,
+            member_names=member_names,
+            member=np.array(codes, dtype=np.int32),
+            day=np.array(days, dtype=np.int64),
+            tracked_us=np.array(tracked, dtype=np.int64),
+        )
+
+    @classmethod
+    def concat(cls, parts: Sequence[Self]) -> Self:
+        """
+        Combine the reports of consecutive durations. Members keep the order
+        in which they first appear.
+        """
+        index: dict[UUID, int] = {}
+        member_names: list[str] = []
+        members = []
+        for part in parts:
+            for member_id, name in zip(part.member_ids, part.member_names):
+                if member_id not in index:
+                    index[member_id] = len(index)
+                    member_names.append(name)
+            codes = np.array(
+                [index[member_id] for member_id in part.member_ids], dtype=np.int32
+            )
+            members.append(codes[part.member])
+        return cls(
+            member_ids=list(index),
+            member_names=member_names,
+            member=np.concatenate(members) if members else np.empty(0, np.int32),
+            day=np.concatenate([part.day for part in parts]),
+            tracked_us=np.concatenate([part.tracked_us for part in parts]),
+        )
+
+    @property
+    def nbytes(self) -> int:
+        return self.member.nbytes + self.day.nbytes + self.tracked_us.nbytes
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        Long frame of (member, day, tracked_time). `member` and
+        `tracked_time` are views of the arrays, not copies.
+        """
+        return pd.DataFrame(
+            {
+                "member": self.member,
+                "day": self.day,
+                "tracked_time": self.tracked_us.view("m8[us]"),
+            },
+            copy=False,
+        )
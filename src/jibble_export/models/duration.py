@@ -1,11 +1,17 @@
-from typing import Self
+from typing import Literal, Self
 from functools import cached_property
-from datetime import date, timedelta
+from datetime import date, datetime, timedelta
 import calendar
 from dataclasses import dataclass
 
 import pandas as pd
 
+ChunkFrequency = Literal["month", "week"]
+
+
+def as_date(value: date) -> date:
+    return value.date() if isinstance(value, datetime) else value
+
 
 @dataclass(frozen=True)
 class Duration:
@@ -39,5 +45,26 @@ class Duration:
     def year(cls, year: int) -> Self:
         return cls(date(year, 1, 1), date(year, 12, 31))
 
+    def split(self, freq: ChunkFrequency) -> list[Self]:
+        """
+        Split into consecutive calendar months or ISO weeks (Monday to
+        Sunday). The first and last chunk are clipped to this duration.
+        """
+        start, end_date = as_date(self.start_date), as_date(self.end_date)
+        chunks = []
+        while start <= end_date:
+            match freq:
+                case "month":
+                    days_in_month = calendar.monthrange(start.year, start.month)[1]
+                    end = start.replace(day=days_in_month)
+                case "week":
+                    end = start + timedelta(days=6 - start.weekday())
+                case _:
+                    raise ValueError(f"Unsupported chunk frequency {freq!r}")
+            end = min(end, end_date)
+            chunks.append(type(self)(start, end))
+            start = end + timedelta(days=1)
+        return chunks
+
     def __str__(self):
         return f"{type(self).__name__}(start_date={self.start_date:%Y-%m-%d}, end_date={self.end_date:%Y-%m-%d})"
@@ -1,3 +1,4 @@
+import calendar
 import logging
 from datetime import datetime, date
 from uuid import UUID
@@ -32,9 +33,17 @@ class MemberValue(BaseModel):
     trackedTime: timedelta
 
 
+MONTHS = {name: number for number, name in enumerate(calendar.month_name) if name}
+
+
 def parse_custom_date(v: Any) -> date:
     if isinstance(v, str):
-        return datetime.strptime(v, "%d %B %Y").date()
+        # "1 January 2026", split by hand as strptime dominates decoding
+        try:
+            day, month, year = v.split(" ")
+            return date(int(year), MONTHS[month], int(day))
+        except KeyError, ValueError:
+            return datetime.strptime(v, "%d %B %Y").date()
     return v
 
 
@@ -55,12 +64,18 @@ class TrackedTimeReport(BaseModel):
     value: list[TrackedTimeReportValue]
 
 
-def get_entity_type(d: dict) -> EntityType:
-    id = d["id"]
+def get_entity_type(v: Any) -> EntityType:
+    match v:
+        case {"subject": {"entityType": "Member" | "Date" as entity_type}}:
+            return entity_type
+        case MemberValue() | DateValue():
+            return v.subject.entityType
+    # no usable subject, members are the ones keyed by UUID
+    id = v["id"] if isinstance(v, dict) else v.id
     try:
         UUID(str(id))
         return "Member"
-    except Exception:
+    except ValueError:
         return "Date"
 
 
@@ -70,6 +85,73 @@ TrackedTimeReportValue = Annotated[
 ]
 
 
+# The tracked time report as projected by `AttendanceQuery(fields="minimal")`:
+# member names and the tracked time of each day, grouped by member and date.
+
+
+class MinimalSubject(BaseModel):
+    entityType: EntityType | None = None
+    name: str
+
+
+class MinimalDateValue(BaseModel):
+    id: CustomDate
+    trackedTime: timedelta
+
+    def to_date_value(self) -> DateValue:
+        # the subject of a day is named like its id, "1 January 2026"
+        name = f"{self.id.day} {self.id:%B %Y}"
+        return DateValue.model_construct(
+            billableAmount=0,
+            id=self.id,
+            items=None,
+            subject=Subject.model_construct(
+                chipColor=None, entityType="Date", id=name, isDeleted=False, name=name
+            ),
+            time=timedelta(0),
+            trackedTime=self.trackedTime,
+        )
+
+
+class MinimalMemberValue(BaseModel):
+    id: UUID
+    items: list[MinimalDateValue] | None = None
+    subject: MinimalSubject
+
+    def to_member_value(self) -> MemberValue:
+        """
+        The member as a `MemberValue`, with the fields projected away zeroed
+        and its tracked time summed from its days. Everything was validated
+        here already, so it is built with `model_construct`.
+        """
+        items = [item.to_date_value() for item in self.items or []]
+        return MemberValue.model_construct(
+            billableAmount=0,
+            id=self.id,
+            items=items,
+            subject=Subject.model_construct(
+                chipColor=None,
+                entityType="Member",
+                id=str(self.id),
+                isDeleted=False,
+                name=self.subject.name,
+            ),
+            time=timedelta(0),
+            trackedTime=sum((item.trackedTime for item in items), timedelta(0)),
+        )
+
+
+class MinimalTrackedTimeReport(BaseModel):
+    odata_context: str = Field(alias="@odata.context")
+    value: list[MinimalMemberValue]
+
+    def to_report(self) -> TrackedTimeReport:
+        return TrackedTimeReport.model_construct(
+            odata_context=self.odata_context,
+            value=[member.to_member_value() for member in self.value],
+        )
+
+
 class Calendars(BaseModel):
     odata_context: str = Field(alias="@odata.context")
     value: list[CalendarEntry]
@@ -84,6 +166,7 @@ class CalendarEntry(BaseModel):
 class Holidays(BaseModel):
     odata_context: str = Field(alias="@odata.context")
     odata_count: int = Field(alias="@odata.count")
+    odata_next_link: str | None = Field(default=None, alias="@odata.nextLink")
     value: list[HolidayEntry]
 
 
@@ -96,6 +179,7 @@ class HolidayEntry(BaseModel):
 class Timeoffs(BaseModel):
     odata_context: str = Field(alias="@odata.context")
     odata_count: int = Field(alias="@odata.count")
+    odata_next_link: str | None = Field(default=None, alias="@odata.nextLink")
     value: list[TimeoffEntry]
 
 
@@ -135,3 +219,16 @@ class Policy(BaseModel):
     compensation: Literal["Paid", "Unpaid"]
     kind: Literal["FullDay", "HalfDay"]
     id: UUID
+
+
+class People(BaseModel):
+    odata_context: str = Field(alias="@odata.context")
+    odata_count: int = Field(alias="@odata.count")
+    odata_next_link: str | None = Field(default=None, alias="@odata.nextLink")
+    value: list[PersonEntry]
+
+
+class PersonEntry(BaseModel):
+    id: UUID
+    fullName: str
+    groupId: UUID | None
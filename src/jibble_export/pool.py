@@ -0,0 +1,173 @@
+from collections import defaultdict, deque
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+import http.client
+import logging
+import threading
+import time
+
+from jibble_export.tracing import span
+
+
+# errors raised by `http.client` when a kept-alive socket was closed by the
+# server while it sat idle in the pool
+STALE_CONNECTION_ERRORS = (
+    http.client.RemoteDisconnected,
+    http.client.CannotSendRequest,
+    http.client.BadStatusLine,
+    ConnectionResetError,
+    ConnectionAbortedError,
+    BrokenPipeError,
+)
+
+
+def split_origin(origin: str) -> tuple[bool, str, int]:
+    """
+    (TLS, host, port) of `origin`, either a bare host name, reached over
+    HTTPS, or a URL such as "http://127.0.0.1:8080".
+    """
+    scheme, sep, netloc = origin.partition("://")
+    if not sep:
+        scheme, netloc = "https", origin
+    tls = scheme == "https"
+    host, _, port = netloc.rstrip("/").rpartition(":")
+    if not host or not port.isdigit():
+        return tls, netloc.rstrip("/"), 443 if tls else 80
+    return tls, host, int(port)
+
+
+def new_connection(origin: str, timeout: float) -> http.client.HTTPConnection:
+    tls, host, port = split_origin(origin)
+    if tls:
+        return http.client.HTTPSConnection(host, port, timeout=timeout)
+    return http.client.HTTPConnection(host, port, timeout=timeout)
+
+
+@dataclass
+class PoolStats:
+    hits: int = 0
+    misses: int = 0
+    stale: int = 0
+    discarded: int = 0
+
+
+@dataclass
+class _IdleConnection:
+    conn: http.client.HTTPConnection
+    released_at: float
+
+
+@dataclass
+class ConnectionPool:
+    """
+    Per-host pool of keep-alive HTTPS connections. Hosts may also be given
+    as "http://host:port" origins, e.g. for a local test server.
+
+    Connections are handed out LIFO, so the most recently used (and most
+    likely still open) socket is reused first. At most `maxsize` idle
+    connections are kept per host, anything beyond that is closed on release.
+    """
+
+    maxsize: int = 4
+    idle_timeout: float = 30.0
+    timeout: float = 60.0
+    stats: PoolStats = field(default_factory=PoolStats)
+    _idle: defaultdict[str, deque[_IdleConnection]] = field(
+        init=False, repr=False, default_factory=lambda: defaultdict(deque)
+    )
+    _lock: threading.Lock = field(
+        init=False, repr=False, default_factory=threading.Lock
+    )
+
+    def acquire(self, host: str) -> tuple[http.client.HTTPConnection, bool]:
+        now = time.monotonic()
+        with self._lock:
+            idle = self._idle[host]
+            while idle:
+                entry = idle.pop()
+                if now - entry.released_at <= self.idle_timeout:
+                    self.stats.hits += 1
+                    return entry.conn, True
+                self.stats.discarded += 1
+                entry.conn.close()
+            self.stats.misses += 1
+        logging.debug("opening new connection to %s", host)
+        return new_connection(host, self.timeout), False
+
+    def release(self, host: str, conn: http.client.HTTPConnection):
+        with self._lock:
+            idle = self._idle[host]
+            if len(idle) < self.maxsize:
+                idle.append(_IdleConnection(conn, time.monotonic()))
+                return
+            self.stats.discarded += 1
+        conn.close()
+
+    @staticmethod
+    def _exchange(
+        conn: http.client.HTTPConnection,
+        reused: bool,
+        method: str,
+        url: str,
+        body: str | bytes | None,
+        headers: dict[str, str] | None,
+    ) -> http.client.HTTPResponse:
+        if not reused:
+            with span("connect", host=conn.host):
+                conn.connect()
+        # until the status line and headers are in
+        with span("first_byte"):
+            conn.request(method, url, body, headers or {})
+            return conn.getresponse()
+
+    @contextmanager
+    def urlopen(
+        self,
+        host: str,
+        method: str,
+        url: str,
+        body: str | bytes | None = None,
+        headers: dict[str, str] | None = None,
+    ) -> Iterator[http.client.HTTPResponse]:
+        """
+        Send a request over a pooled connection and yield the response.
+
+        The connection goes back to the pool only if the response was read
+        to the end and the server did not ask to close it. A reused socket
+        that turns out to be stale is replaced by a fresh one, once.
+        """
+        conn, reused = self.acquire(host)
+        try:
+            try:
+                res = self._exchange(conn, reused, method, url, body, headers)
+            except STALE_CONNECTION_ERRORS:
+                if not reused:
+                    raise
+                logging.debug("stale connection to %s, reconnecting", host)
+                with self._lock:
+                    self.stats.stale += 1
+                conn.close()
+                conn = new_connection(host, self.timeout)
+                res = self._exchange(conn, False, method, url, body, headers)
+        except BaseException:
+            conn.close()
+            raise
+
+        try:
+            yield res
+        except BaseException:
+            conn.close()
+            raise
+        if res.isclosed() and not res.will_close:
+            self.release(host, conn)
+        else:
+            with self._lock:
+                self.stats.discarded += 1
+            conn.close()
+
+    def close(self):
+        with self._lock:
+            for idle in self._idle.values():
+                while idle:
+                    idle.pop().conn.close()
@@ -0,0 +1,198 @@
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from http import HTTPStatus
+import http.client
+import logging
+import random
+import threading
+import time
+
+from jibble_export.settings import setting
+
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+
+RETRYABLE_STATUSES = frozenset(
+    {
+        HTTPStatus.REQUEST_TIMEOUT,
+        HTTPStatus.TOO_MANY_REQUESTS,
+        HTTPStatus.INTERNAL_SERVER_ERROR,
+        HTTPStatus.BAD_GATEWAY,
+        HTTPStatus.SERVICE_UNAVAILABLE,
+        HTTPStatus.GATEWAY_TIMEOUT,
+    }
+)
+
+# transport failures after which the request may or may not have been
+# processed, retried only for idempotent requests
+RETRYABLE_ERRORS = (ConnectionError, TimeoutError, http.client.HTTPException)
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    """
+    Seconds to wait according to a Retry-After header, given either as
+    seconds or as an HTTP date.
+    """
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = parsedate_to_datetime(value)
+    except TypeError, ValueError:
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+@dataclass
+class SchedulerStats:
+    requests: int = 0
+    retries: int = 0
+    gave_up: int = 0
+    throttle_waits: int = 0
+    throttle_seconds: float = 0.0
+    backoff_seconds: float = 0.0
+    # retries by status code or exception name
+    causes: Counter[str] = field(default_factory=Counter)
+
+
+@dataclass
+class TokenBucket:
+    """
+    Allows `rate` requests per second on average, in bursts of at most
+    `capacity`.
+    """
+
+    rate: float
+    capacity: float
+    tokens: float = field(init=False)
+    updated: float = field(init=False, default_factory=time.monotonic)
+
+    def __post_init__(self):
+        self.tokens = self.capacity
+
+    def reserve(self, now: float) -> float:
+        """
+        Take a token, possibly one that is yet to be refilled, and return
+        how long to wait until it is.
+        """
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        return max(0.0, -self.tokens / self.rate)
+
+
+@dataclass
+class RequestScheduler:
+    """
+    Decides when requests may go out and whether failed ones are retried.
+
+    Each host gets a token bucket of `rate` requests per second (unlimited
+    when None). A 429 or 503 carrying Retry-After pauses the whole host for
+    that long. Other retryable failures back off exponentially with full
+    jitter. The scheduler only computes delays; callers sleep on them, so
+    it serves the blocking and the async client alike.
+    """
+
+    rate: float | None = field(default_factory=lambda: setting.rate_limit)
+    burst: int = field(default_factory=lambda: setting.rate_burst)
+    max_attempts: int = field(default_factory=lambda: setting.retry_attempts)
+    backoff: float = field(default_factory=lambda: setting.retry_backoff)
+    max_backoff: float = field(default_factory=lambda: setting.retry_backoff_max)
+    max_retry_after: float = field(default_factory=lambda: setting.retry_after_max)
+    stats: SchedulerStats = field(default_factory=SchedulerStats)
+    _buckets: dict[str, TokenBucket] = field(
+        init=False, repr=False, default_factory=dict
+    )
+    _paused_until: dict[str, float] = field(
+        init=False, repr=False, default_factory=dict
+    )
+    _lock: threading.Lock = field(
+        init=False, repr=False, default_factory=threading.Lock
+    )
+
+    def reserve(self, host: str) -> float:
+        """
+        Register a request to `host` and return how long it has to wait
+        before being sent.
+        """
+        now = time.monotonic()
+        with self._lock:
+            self.stats.requests += 1
+            delay = max(0.0, self._paused_until.get(host, now) - now)
+            if self.rate:
+                bucket = self._buckets.get(host)
+                if bucket is None:
+                    bucket = self._buckets[host] = TokenBucket(self.rate, self.burst)
+                delay = max(delay, bucket.reserve(now))
+            if delay > 0:
+                self.stats.throttle_waits += 1
+                self.stats.throttle_seconds += delay
+        return delay
+
+    def retry_delay(
+        self,
+        host: str,
+        attempt: int,
+        idempotent: bool,
+        status: int | None = None,
+        retry_after: str | None = None,
+        error: BaseException | None = None,
+    ) -> float | None:
+        """
+        How long to wait before retrying a request that failed with `status`
+        or `error` on its `attempt`-th try, or None if it must not be.
+
+        Requests that are not idempotent are only retried on 429, which
+        tells that they were not processed.
+        """
+        if error is not None:
+            cause = type(error).__name__
+            retryable = idempotent
+        else:
+            assert status is not None
+            if status not in RETRYABLE_STATUSES:
+                return None
+            cause = str(status)
+            retryable = idempotent or status == HTTPStatus.TOO_MANY_REQUESTS
+        if not retryable:
+            return None
+        if attempt >= self.max_attempts:
+            with self._lock:
+                self.stats.gave_up += 1
+            return None
+
+        wait = parse_retry_after(retry_after)
+        if wait is not None and wait > self.max_retry_after:
+            logging.warning(
+                "%s asks to retry after %.0fs, giving up instead", host, wait
+            )
+            with self._lock:
+                self.stats.gave_up += 1
+            return None
+        if wait is None:
+            ceiling = min(self.max_backoff, self.backoff * 2 ** (attempt - 1))
+            delay = random.uniform(0, ceiling)
+        else:
+            # spread the clients paused together over a short window
+            delay = wait + random.uniform(0, self.backoff)
+        with self._lock:
+            self.stats.retries += 1
+            self.stats.causes[cause] += 1
+            self.stats.backoff_seconds += delay
+            if wait is not None:
+                until = time.monotonic() + delay
+                self._paused_until[host] = max(self._paused_until.get(host, 0.0), until)
+        logging.warning(
+            "%s from %s (attempt %s of %s), retrying in %.2fs",
+            cause,
+            host,
+            attempt,
+            self.max_attempts,
+            delay,
+        )
+        return delay
@@ -1,13 +1,133 @@
+from dataclasses import dataclass, fields
 from pathlib import Path
-from pydantic_settings import BaseSettings, SettingsConfigDict
+from types import NoneType, UnionType
+from typing import Any, Literal, Self, Union, get_args, get_origin, get_type_hints
+import os
 
+ENV_PREFIX = "JIBBLE_"
+ENV_FILE = ".env"
+
+TRUE = frozenset({"1", "true", "t", "yes", "y", "on"})
+FALSE = frozenset({"0", "false", "f", "no", "n", "off"})
+
+
+def read_env_file(path: str | Path) -> dict[str, str]:
+    """
+    KEY=VALUE lines of a dotenv file, ignoring comments and `export`.
+    """
+    try:
+        lines = Path(path).read_text().splitlines()
+    except FileNotFoundError:
+        return {}
+    values = {}
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith("#") or "=" not in line:
+            continue
+        key, _, value = line.removeprefix("export ").partition("=")
+        value = value.strip()
+        if len(value) >= 2 and value[0] == value[-1] and value[0] in "'\"":
+            value = value[1:-1]
+        values[key.strip()] = value
+    return values
+
+
+def coerce(value: str, annotation: Any) -> Any:
+    """
+    Parse an environment string as `annotation`: str, int, float, bool,
+    Path, a Literal of strings, or an optional one of those.
+    """
+    origin = get_origin(annotation)
+    if origin in (Union, UnionType):
+        options = [arg for arg in get_args(annotation) if arg is not NoneType]
+        if value.strip().lower() in ("", "none", "null"):
+            return None
+        (annotation,) = options
+        return coerce(value, annotation)
+    if origin is Literal:
+        if value not in get_args(annotation):
+            raise ValueError(f"expected one of {get_args(annotation)}")
+        return value
+    if annotation is bool:
+        if value.strip().lower() in TRUE:
+            return True
+        if value.strip().lower() in FALSE:
+            return False
+        raise ValueError("expected a boolean")
+    return annotation(value)
+
+
+@dataclass
+class Settings:
+    """
+    Configuration, overridable with `JIBBLE_<NAME>` environment variables
+    or entries of a `.env` file, the former taking precedence.
+
+    Parsed with the standard library only, so that quick commands such as
+    `jibble clockin` do not pay for importing pydantic.
+    """
 
-class Settings(BaseSettings):
-    model_config = SettingsConfigDict(env_file=".env", env_prefix="JIBBLE_")
     client_id: str = ""
     client_secret: str = ""
     environment: str = "prod"
+    # send every request to this origin instead, e.g. "http://127.0.0.1:8080"
+    api_url: str | None = None
     reports_dir: Path = Path("./reports")
+    pool_maxsize: int = 4
+    pool_idle_timeout: float = 30.0
+    compression: bool = True
+    # requests per second to each host, opt-in: unthrottled when None
+    rate_limit: float | None = None
+    rate_burst: int = 10
+    retry_attempts: int = 5
+    retry_backoff: float = 0.5
+    retry_backoff_max: float = 30.0
+    retry_after_max: float = 120.0
+    async_max_concurrency: int = 16
+    page_size: int | None = None
+    page_workers: int = 4
+    attendance_chunk: Literal["month", "week"] | None = None
+    attendance_workers: int = 4
+    batch_workers: int = 4
+    warehouse_path: Path = Path("./jibble.sqlite3")
+    warehouse_recheck_days: int = 7
+    cache_dir: Path = Path.home() / ".cache" / "jibble-export"
+    token_cache: bool = True
+    token_refresh_leeway: float = 60.0
+    response_cache: bool = True
+    cache_max_bytes: int = 256 * 2**20
+    cache_ttl_open: float = 5 * 60
+    # periods that ended within this many days still count as open
+    cache_open_period_days: int = 7
+    cache_ttl_closed: float = 30 * 24 * 60 * 60
+    cache_ttl_calendars: float = 24 * 60 * 60
+    # calendar index and per year holidays, see features/holidays.py
+    calendar_index: bool = True
+    cache_ttl_holidays: float = 24 * 60 * 60
+    # where `jibble serve` listens, by default <cache_dir>/daemon.sock
+    daemon_socket: Path | None = None
+
+    @classmethod
+    def from_env(
+        cls,
+        environ: dict[str, str] | None = None,
+        env_file: str | Path | None = ENV_FILE,
+    ) -> Self:
+        values = read_env_file(env_file) if env_file is not None else {}
+        values |= os.environ if environ is None else environ
+        # names are matched case-insensitively
+        values = {key.upper(): value for key, value in values.items()}
+        hints = get_type_hints(cls)
+        overrides = {}
+        for field in fields(cls):
+            name = f"{ENV_PREFIX}{field.name.upper()}"
+            if name not in values:
+                continue
+            try:
+                overrides[field.name] = coerce(values[name], hints[field.name])
+            except (TypeError, ValueError) as exc:
+                raise ValueError(f"Invalid {name}={values[name]!r}: {exc}") from None
+        return cls(**overrides)
 
 
-setting = Settings()
+setting = Settings.from_env()
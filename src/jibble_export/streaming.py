@@ -0,0 +1,108 @@
+from collections.abc import Iterable, Iterator
+from typing import Any
+import codecs
+import json
+
+_WHITESPACE = " \t\n\r"
+_decoder = json.JSONDecoder()
+
+
+class _TextBuffer:
+    """
+    Decoded text of a byte stream, of which only the part after `pos` is
+    kept around.
+    """
+
+    def __init__(self, chunks: Iterable[bytes]):
+        self._chunks = iter(chunks)
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self.text = ""
+        self.pos = 0
+        self.eof = False
+
+    def fill(self, count: int = 1):
+        parts = [self.text[self.pos :]]
+        for _ in range(count):
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                self.eof = True
+                parts.append(self._decoder.decode(b"", final=True))
+                break
+            parts.append(self._decoder.decode(chunk))
+        self.text = "".join(parts)
+        self.pos = 0
+
+    def peek(self) -> str:
+        while True:
+            while self.pos < len(self.text) and self.text[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.text):
+                return self.text[self.pos]
+            if self.eof:
+                raise ValueError("Unexpected end of JSON stream")
+            self.fill()
+
+    def expect(self, char: str):
+        if (found := self.peek()) != char:
+            raise ValueError(f"Expected {char!r} in JSON stream, found {found!r}")
+        self.pos += 1
+
+    def value(self) -> Any:
+        """
+        Decode the next complete value, reading more of the stream until it
+        is all there. Each retry reads twice as many chunks as the previous
+        one, so large values are not re-parsed chunk by chunk.
+        """
+        self.peek()
+        count = 1
+        while True:
+            try:
+                obj, end = _decoder.raw_decode(self.text, self.pos)
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            else:
+                # a number at the very end of the buffer may continue
+                if end < len(self.text) or self.eof:
+                    self.pos = end
+                    return obj
+            self.fill(count)
+            count *= 2
+
+
+def iter_array_items(chunks: Iterable[bytes], key: str = "value") -> Iterator[Any]:
+    """
+    Yield the items of the `key` array of a JSON object one by one, while
+    `chunks` of its UTF-8 body are still coming in.
+
+    Only one item (plus a chunk of look-ahead) is held in memory at a time.
+    Other members of the object are decoded and dropped.
+    """
+    buffer = _TextBuffer(chunks)
+    found = False
+    buffer.expect("{")
+    while buffer.peek() != "}":
+        name = buffer.value()
+        buffer.expect(":")
+        if name != key:
+            buffer.value()
+        else:
+            found = True
+            buffer.expect("[")
+            if buffer.peek() == "]":
+                buffer.pos += 1
+            else:
+                while True:
+                    yield buffer.value()
+                    separator = buffer.peek()
+                    buffer.pos += 1
+                    if separator == "]":
+                        break
+                    if separator != ",":
+                        raise ValueError(
+                            f"Expected ',' or ']' in JSON stream, found {separator!r}"
+                        )
+        if buffer.peek() == ",":
+            buffer.pos += 1
+    if not found:
+        raise ValueError(f"No {key!r} array in JSON stream")
@@ -0,0 +1,58 @@
+from dataclasses import dataclass
+from hashlib import sha256
+from pathlib import Path
+from typing import Any
+import json
+import logging
+import os
+
+
+@dataclass(frozen=True)
+class TokenStore:
+    """
+    On-disk store of access tokens, one file per client_id and identity
+    host, so that a token is never sent to a server that did not issue it.
+
+    Files are created with 0600 permissions inside a 0700 directory and are
+    replaced atomically, so concurrent CLI processes never observe a
+    half-written token.
+    """
+
+    directory: Path
+
+    def path_for(self, client_id: str, host: str) -> Path:
+        digest = sha256(f"{host}\0{client_id}".encode()).hexdigest()[:32]
+        return self.directory / f"{digest}.json"
+
+    def load(self, client_id: str, host: str) -> dict[str, Any] | None:
+        path = self.path_for(client_id, host)
+        try:
+            data = json.loads(path.read_text())
+        except FileNotFoundError:
+            return None
+        except OSError, ValueError:
+            logging.warning("Ignoring unreadable token cache %s", path)
+            return None
+        if data.get("client_id") != client_id or data.get("host") != host:
+            return None
+        logging.debug("Loaded cached token from %s", path)
+        return data["token"]
+
+    def save(self, client_id: str, host: str, token: dict[str, Any]):
+        import tempfile
+
+        self.directory.mkdir(mode=0o700, parents=True, exist_ok=True)
+        path = self.path_for(client_id, host)
+        # mkstemp creates the file with 0600 permissions
+        fd, tmp = tempfile.mkstemp(dir=self.directory, prefix=".token-")
+        try:
+            with os.fdopen(fd, "w") as fh:
+                json.dump({"client_id": client_id, "host": host, "token": token}, fh)
+            os.replace(tmp, path)
+        except BaseException:
+            Path(tmp).unlink(missing_ok=True)
+            raise
+        logging.debug("Token cached at %s", path)
+
+    def clear(self, client_id: str, host: str):
+        self.path_for(client_id, host).unlink(missing_ok=True)
@@ -0,0 +1,151 @@
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from functools import partial, wraps
+from typing import Any
+import logging
+import threading
+import sys
+import time
+
+_current: ContextVar[Span | None] = ContextVar("jibble_export_span", default=None)
+_listeners: list[Callable[[Span], None]] = []
+_lock = threading.Lock()
+
+
+@dataclass
+class Span:
+    """
+    A timed stage of work. Spans opened while another one is current, in
+    the same thread or in a context copied from it, become its children.
+    """
+
+    name: str
+    attributes: dict[str, Any] = field(default_factory=dict)
+    parent: Span | None = field(default=None, repr=False)
+    children: list[Span] = field(default_factory=list, repr=False)
+    start: float = field(default_factory=time.perf_counter)
+    end: float | None = None
+    # net traced memory allocated while open, when tracemalloc is tracing
+    memory: int | None = None
+
+    @property
+    def seconds(self) -> float:
+        return (self.end if self.end is not None else time.perf_counter()) - self.start
+
+    def set(self, **attributes: Any):
+        self.attributes.update(attributes)
+
+    def to_dict(self) -> dict[str, Any]:
+        tree: dict[str, Any] = {"name": self.name, "seconds": round(self.seconds, 6)}
+        if self.attributes:
+            tree["attributes"] = self.attributes
+        if self.memory is not None:
+            tree["memory"] = self.memory
+        if self.children:
+            with _lock:
+                children = sorted(self.children, key=lambda child: child.start)
+            tree["children"] = [child.to_dict() for child in children]
+        return tree
+
+
+def current_span() -> Span | None:
+    return _current.get()
+
+
+def add_listener(listener: Callable[[Span], None]):
+    """
+    Call `listener` with every span as it ends, e.g. to forward timings to
+    a metrics system.
+    """
+    _listeners.append(listener)
+
+
+def remove_listener(listener: Callable[[Span], None]):
+    _listeners.remove(listener)
+
+
+def _traced_memory() -> int | None:
+    """
+    Memory traced by tracemalloc, None unless it is tracing. Only
+    `profile(memory=True)` starts it, and imports it, so quick commands
+    don't pay for the import.
+    """
+    tracemalloc = sys.modules.get("tracemalloc")
+    if tracemalloc is None or not tracemalloc.is_tracing():
+        return None
+    return tracemalloc.get_traced_memory()[0]
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Span]:
+    """
+    Time the enclosed block as a child of the current span.
+
+        with span("decode", bytes=len(raw)) as current:
+            ...
+            current.set(items=len(items))
+    """
+    parent = _current.get()
+    memory_start = _traced_memory()
+    current = Span(name, attributes, parent)
+    token = _current.set(current)
+    try:
+        yield current
+    except BaseException as exc:
+        current.set(error=type(exc).__name__)
+        raise
+    finally:
+        current.end = time.perf_counter()
+        try:
+            _current.reset(token)
+        except ValueError:
+            # a generator holding the span was closed from another context
+            _current.set(parent)
+        if memory_start is not None:
+            current.memory = (_traced_memory() or 0) - memory_start
+        if parent is not None:
+            with _lock:
+                parent.children.append(current)
+        for listener in list(_listeners):
+            try:
+                listener(current)
+            except Exception:
+                logging.exception("span listener %r failed", listener)
+
+
+@contextmanager
+def profile(name: str, memory: bool = False) -> Iterator[Span]:
+    """
+    Root span of a profiled run. With `memory`, tracemalloc traces the run,
+    every span records its net allocations and the root its peak.
+    """
+    import tracemalloc
+
+    if memory:
+        tracemalloc.start()
+    try:
+        with span(name) as root:
+            yield root
+            if memory:
+                root.set(peak_memory=tracemalloc.get_traced_memory()[1])
+    finally:
+        if memory:
+            tracemalloc.stop()
+
+
+def _traced[**P, R](name: str, func: Callable[P, R]) -> Callable[P, R]:
+    @wraps(func)
+    def wrapper(*args: P.args, **kwargs: P.kwargs) -> R:
+        with span(name):
+            return func(*args, **kwargs)
+
+    return wrapper
+
+
+def traced[**P, R](name: str) -> Callable[[Callable[P, R]], Callable[P, R]]:
+    """
+    Run every call of the decorated function in a span called `name`.
+    """
+    return partial(_traced, name)
@@ -1,7 +1,84 @@
-from datetime import date
+from collections.abc import Callable, Mapping
+from contextvars import copy_context
+from datetime import date, timedelta
+from typing import Any
+import logging
+import re
+import time
+
+from jibble_export.tracing import span
+
+ISO_DURATION = re.compile(
+    r"(?P<sign>-)?P(?:(?P<days>\d+)D)?"
+    r"(?:T(?:(?P<hours>\d+)H)?(?:(?P<minutes>\d+)M)?"
+    r"(?:(?P<seconds>\d+)(?:\.(?P<fraction>\d+))?S)?)?"
+)
 
 
 def date_json_encoder(obj):
     if isinstance(obj, date):
         return f"{obj:%Y-%m-%d}"
     raise TypeError(f"Cannot serialize object of {type(obj)}")
+
+
+def iso_duration_microseconds(value: str) -> int:
+    """
+    Length of an ISO 8601 duration such as "PT8H30M12.5S", the format
+    Jibble uses for tracked time, in whole microseconds.
+
+    Anything else is left to pydantic's timedelta parsing.
+    """
+    match = ISO_DURATION.fullmatch(value)
+    if match is None or value in ("P", "PT", "-P", "-PT"):
+        from pydantic import TypeAdapter
+
+        return TypeAdapter(timedelta).validate_python(value) // timedelta(
+            microseconds=1
+        )
+    days, hours, minutes, seconds = (
+        int(match[unit] or 0) for unit in ("days", "hours", "minutes", "seconds")
+    )
+    microseconds = int((match["fraction"] or "")[:6].ljust(6, "0"))
+    total = (((days * 24 + hours) * 60 + minutes) * 60 + seconds) * 1_000_000
+    total += microseconds
+    return -total if match["sign"] else total
+
+
+def _timed[T](name: str, call: Callable[[], T]) -> tuple[T, float]:
+    start = time.perf_counter()
+    with span(name):
+        result = call()
+    return result, time.perf_counter() - start
+
+
+def run_concurrently(
+    calls: Mapping[str, Callable[[], Any]],
+    max_workers: int | None = None,
+) -> tuple[dict[str, Any], dict[str, float]]:
+    """
+    Run independent calls on a thread pool.
+
+    Returns the results and the latency (seconds) of each call, keyed like
+    `calls`. Every call is waited for; if any of them failed, the exception
+    of the first failing call (in `calls` order) is raised. Each call runs
+    in a copy of the caller's context, in a span named after its key.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    results: dict[str, Any] = {}
+    latencies: dict[str, float] = {}
+    errors: list[BaseException] = []
+    with ThreadPoolExecutor(max_workers=max_workers or len(calls) or 1) as executor:
+        futures = {
+            name: executor.submit(copy_context().run, _timed, name, call)
+            for name, call in calls.items()
+        }
+        for name, future in futures.items():
+            try:
+                results[name], latencies[name] = future.result()
+            except Exception as exc:
+                logging.error("%s failed: %s", name, exc)
+                errors.append(exc)
+    if errors:
+        raise errors[0]
+    return results, latencies
@@ -0,0 +1,315 @@
+from contextlib import closing
+from dataclasses import dataclass
+from datetime import date, timedelta
+from pathlib import Path
+from uuid import UUID
+import logging
+import sqlite3
+
+from jibble_export.features.reports import ReportInputs, fetch_report_inputs
+from jibble_export.models.duration import Duration, as_date
+from jibble_export.models.responses import (
+    DateValue,
+    HolidayEntry,
+    Holidays,
+    MemberValue,
+    Subject,
+    TimeoffEntry,
+    Timeoffs,
+    TrackedTimeReport,
+)
+from jibble_export.settings import setting
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS members (
+    client_id TEXT NOT NULL,
+    id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    subject TEXT NOT NULL,
+    PRIMARY KEY (client_id, id)
+);
+CREATE TABLE IF NOT EXISTS tracked_time (
+    client_id TEXT NOT NULL,
+    member_id TEXT NOT NULL,
+    date TEXT NOT NULL,
+    tracked_us INTEGER NOT NULL,
+    time_us INTEGER NOT NULL,
+    billable_amount INTEGER NOT NULL,
+    PRIMARY KEY (client_id, member_id, date),
+    FOREIGN KEY (client_id, member_id) REFERENCES members (client_id, id)
+);
+CREATE INDEX IF NOT EXISTS tracked_time_date ON tracked_time (client_id, date);
+CREATE TABLE IF NOT EXISTS holidays (
+    client_id TEXT NOT NULL,
+    calendar_name TEXT NOT NULL,
+    calendar_id TEXT NOT NULL,
+    date TEXT NOT NULL,
+    name TEXT NOT NULL,
+    PRIMARY KEY (client_id, calendar_name, date, name)
+);
+CREATE TABLE IF NOT EXISTS timeoffs (
+    client_id TEXT NOT NULL,
+    id TEXT NOT NULL,
+    person_id TEXT NOT NULL,
+    start_date TEXT NOT NULL,
+    end_date TEXT NOT NULL,
+    entry TEXT NOT NULL,
+    PRIMARY KEY (client_id, id)
+);
+CREATE INDEX IF NOT EXISTS timeoffs_dates
+    ON timeoffs (client_id, start_date, end_date);
+CREATE TABLE IF NOT EXISTS sync_state (
+    client_id TEXT NOT NULL,
+    calendar_name TEXT NOT NULL,
+    synced_until TEXT NOT NULL,
+    PRIMARY KEY (client_id, calendar_name)
+);
+"""
+
+MICROSECOND = timedelta(microseconds=1)
+
+
+def _subject_name(day: date) -> str:
+    return f"{day.day} {day:%B %Y}"
+
+
+@dataclass(frozen=True)
+class Warehouse:
+    """
+    Local SQLite copy of tracked time, holidays and approved timeoffs.
+
+    `sync` only fetches the days after the stored high-water mark, plus a
+    trailing `recheck_days` window for late edits. `load_report_inputs`
+    rebuilds the API response models, so the report can be prepared
+    without touching the network.
+
+    Every row belongs to the organisation of `client_id`, so several
+    organisations can share one database without seeing each other's data.
+    """
+
+    path: Path
+    client_id: str
+
+    def connect(self) -> sqlite3.Connection:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self.path)
+        conn.executescript(SCHEMA)
+        return conn
+
+    def synced_until(self, calendar_name: str) -> date | None:
+        with closing(self.connect()) as conn:
+            row = conn.execute(
+                "SELECT synced_until FROM sync_state"
+                " WHERE client_id = ? AND calendar_name = ?",
+                (self.client_id, calendar_name),
+            ).fetchone()
+        return date.fromisoformat(row[0]) if row else None
+
+    def sync(
+        self,
+        calendar_name: str,
+        since: date | None = None,
+        until: date | None = None,
+        recheck_days: int | None = None,
+    ) -> Duration:
+        until = until or date.today()
+        recheck_days = (
+            recheck_days if recheck_days is not None else setting.warehouse_recheck_days
+        )
+        high_water_mark = self.synced_until(calendar_name)
+        if since is None:
+            since = (
+                until.replace(month=1, day=1)
+                if high_water_mark is None
+                else high_water_mark - timedelta(days=recheck_days)
+            )
+        duration = Duration(since, until)
+        logging.info("Syncing warehouse %s for %s", self.path, duration)
+        inputs = fetch_report_inputs(duration, calendar_name)
+        self.store(calendar_name, duration, inputs)
+        return duration
+
+    def store(self, calendar_name: str, duration: Duration, inputs: ReportInputs):
+        start, end = f"{duration.start_date:%Y-%m-%d}", f"{duration.end_date:%Y-%m-%d}"
+        report = inputs.attendance_report
+        # fetch_report_inputs only returns compact reports when asked to
+        assert isinstance(report, TrackedTimeReport)
+        client_id = self.client_id
+        members, days = [], []
+        for member in report.value:
+            assert isinstance(member, MemberValue)
+            members.append(
+                (
+                    client_id,
+                    str(member.id),
+                    member.subject.name,
+                    member.subject.model_dump_json(),
+                )
+            )
+            for item in member.items or []:
+                assert isinstance(item, DateValue)
+                days.append(
+                    (
+                        client_id,
+                        str(member.id),
+                        f"{item.id:%Y-%m-%d}",
+                        item.trackedTime // MICROSECOND,
+                        item.time // MICROSECOND,
+                        item.billableAmount,
+                    )
+                )
+        holidays = [
+            (
+                client_id,
+                calendar_name,
+                str(entry.calendarId),
+                f"{entry.date:%Y-%m-%d}",
+                entry.name,
+            )
+            for entry in inputs.holiday_list.value
+        ]
+        timeoffs = [
+            (
+                client_id,
+                str(entry.id),
+                str(entry.personId),
+                f"{entry.startDate:%Y-%m-%d}",
+                f"{entry.endDate or entry.startDate:%Y-%m-%d}",
+                entry.model_dump_json(by_alias=True),
+            )
+            for entry in inputs.approved_timeoffs.value
+        ]
+        with closing(self.connect()) as conn, conn:
+            conn.executemany(
+                "INSERT INTO members VALUES (?, ?, ?, ?) ON CONFLICT (client_id, id)"
+                " DO UPDATE SET name = excluded.name, subject = excluded.subject",
+                members,
+            )
+            conn.execute(
+                "DELETE FROM tracked_time WHERE client_id = ? AND date BETWEEN ? AND ?",
+                (client_id, start, end),
+            )
+            conn.executemany("INSERT INTO tracked_time VALUES (?, ?, ?, ?, ?, ?)", days)
+            conn.execute(
+                "DELETE FROM holidays WHERE client_id = ? AND calendar_name = ?"
+                " AND date BETWEEN ? AND ?",
+                (client_id, calendar_name, start, end),
+            )
+            conn.executemany(
+                "INSERT OR REPLACE INTO holidays VALUES (?, ?, ?, ?, ?)", holidays
+            )
+            # same overlap condition as the TimeOffOverview filter
+            conn.execute(
+                "DELETE FROM timeoffs WHERE client_id = ?1"
+                " AND (start_date BETWEEN ?2 AND ?3 OR end_date BETWEEN ?2 AND ?3)",
+                (client_id, start, end),
+            )
+            conn.executemany(
+                "INSERT OR REPLACE INTO timeoffs VALUES (?, ?, ?, ?, ?, ?)", timeoffs
+            )
+            conn.execute(
+                "INSERT INTO sync_state VALUES (?, ?, ?)"
+                " ON CONFLICT (client_id, calendar_name)"
+                " DO UPDATE SET synced_until = max(synced_until, excluded.synced_until)",
+                (client_id, calendar_name, end),
+            )
+        logging.info(
+            "Stored %s days of %s members, %s holidays and %s timeoffs",
+            len(days),
+            len(members),
+            len(holidays),
+            len(timeoffs),
+        )
+
+    def load_report_inputs(
+        self, duration: Duration, holiday_calendar_name: str
+    ) -> ReportInputs:
+        start, end = f"{duration.start_date:%Y-%m-%d}", f"{duration.end_date:%Y-%m-%d}"
+        synced_until = self.synced_until(holiday_calendar_name)
+        if synced_until is None or synced_until < as_date(duration.end_date):
+            logging.warning(
+                "Warehouse %s is only synced until %s, report may be incomplete",
+                self.path,
+                synced_until,
+            )
+        with closing(self.connect()) as conn:
+            days = conn.execute(
+                "SELECT t.member_id, m.subject, t.date, t.tracked_us, t.time_us,"
+                " t.billable_amount FROM tracked_time t JOIN members m"
+                " ON m.client_id = t.client_id AND m.id = t.member_id"
+                " WHERE t.client_id = ? AND t.date BETWEEN ? AND ?"
+                " ORDER BY m.name, t.member_id, t.date",
+                (self.client_id, start, end),
+            ).fetchall()
+            holidays = conn.execute(
+                "SELECT calendar_id, date, name FROM holidays WHERE client_id = ?"
+                " AND calendar_name = ? AND date BETWEEN ? AND ? ORDER BY date",
+                (self.client_id, holiday_calendar_name, start, end),
+            ).fetchall()
+            timeoffs = conn.execute(
+                "SELECT entry FROM timeoffs WHERE client_id = ?1"
+                " AND (start_date BETWEEN ?2 AND ?3 OR end_date BETWEEN ?2 AND ?3)"
+                " ORDER BY start_date",
+                (self.client_id, start, end),
+            ).fetchall()
+
+        members: dict[str, MemberValue] = {}
+        for member_id, subject, day, tracked_us, time_us, billable_amount in days:
+            tracked, time = tracked_us * MICROSECOND, time_us * MICROSECOND
+            member = members.get(member_id)
+            if member is None:
+                member = members[member_id] = MemberValue(
+                    billableAmount=0,
+                    id=UUID(member_id),
+                    items=[],
+                    subject=Subject.model_validate_json(subject),
+                    time=timedelta(0),
+                    trackedTime=timedelta(0),
+                )
+            day = date.fromisoformat(day)
+            assert member.items is not None
+            member.items.append(
+                DateValue(
+                    billableAmount=billable_amount,
+                    id=day,
+                    subject=Subject(
+                        chipColor=None,
+                        entityType="Date",
+                        id=_subject_name(day),
+                        isDeleted=False,
+                        name=_subject_name(day),
+                    ),
+                    time=time,
+                    trackedTime=tracked,
+                )
+            )
+            member.billableAmount += billable_amount
+            member.time += time
+            member.trackedTime += tracked
+
+        return ReportInputs(
+            # already validated above
+            attendance_report=TrackedTimeReport.model_construct(
+                odata_context="warehouse", value=list(members.values())
+            ),
+            holiday_list=Holidays.model_validate(
+                {
+                    "@odata.context": "warehouse",
+                    "@odata.count": len(holidays),
+                    "value": [
+                        HolidayEntry(calendarId=UUID(calendar_id), date=day, name=name)
+                        for calendar_id, day, name in holidays
+                    ],
+                }
+            ),
+            approved_timeoffs=Timeoffs.model_validate(
+                {
+                    "@odata.context": "warehouse",
+                    "@odata.count": len(timeoffs),
+                    "value": [
+                        TimeoffEntry.model_validate_json(entry) for (entry,) in timeoffs
+                    ],
+                }
+            ),
+            latencies={},
+        )